@@ -4,6 +4,7 @@ Django settings for config project.
 
 import os
 import sys
+import tempfile
 from pathlib import Path
 from dotenv import load_dotenv
 from datetime import timedelta
@@ -52,6 +53,7 @@ INSTALLED_APPS = [
 MIDDLEWARE = [
     "corsheaders.middleware.CorsMiddleware",  
     "django.middleware.security.SecurityMiddleware",
+    "gestion_prep.api.middleware.CompressionMiddleware",
     "django.contrib.sessions.middleware.SessionMiddleware",
     "django.middleware.common.CommonMiddleware",
     # "django.middleware.csrf.CsrfViewMiddleware",  
@@ -85,17 +87,24 @@ SIMPLE_JWT = {
     'USER_ID_CLAIM': 'user_id',
     'AUTH_TOKEN_CLASSES': ('rest_framework_simplejwt.tokens.AccessToken',),
     'TOKEN_TYPE_CLAIM': 'token_type',
+    # Claims de rôle dans les jetons : aucune requête pour authentifier
+    'TOKEN_USER_CLASS': 'user_auth.tokens.RoleTokenUser',
+    'TOKEN_OBTAIN_SERIALIZER': 'user_auth.serializers.RoleTokenObtainPairSerializer',
+    'TOKEN_REFRESH_SERIALIZER': 'user_auth.serializers.RoleTokenRefreshSerializer',
 }
 
+# Délai (s) avant qu'une révocation faite par un autre processus soit prise en compte
+JWT_BLACKLIST_REFRESH_INTERVAL = int(os.getenv('JWT_BLACKLIST_REFRESH_INTERVAL', 5))
+
 # Configuration DRF
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': (
-        'rest_framework_simplejwt.authentication.JWTAuthentication',
+        'rest_framework_simplejwt.authentication.JWTStatelessUserAuthentication',
     ),
     'DEFAULT_PERMISSION_CLASSES': [
         'rest_framework.permissions.AllowAny',  # Permettre l'accès par défaut
     ],
-    'DEFAULT_PAGINATION_CLASS': 'rest_framework.pagination.PageNumberPagination',
+    'DEFAULT_PAGINATION_CLASS': 'gestion_prep.api.pagination.KeysetCursorPagination',
     'PAGE_SIZE': 10,
     'DEFAULT_FILTER_BACKENDS': [
         'django_filters.rest_framework.DjangoFilterBackend',
@@ -104,6 +113,9 @@ REST_FRAMEWORK = {
     ],
 }
 
+# Taille de page maximale demandable via ?page_size= sur l'API
+API_MAX_PAGE_SIZE = int(os.getenv('API_MAX_PAGE_SIZE', 1000))
+
 # Configuration HTTPS
 SECURE_SSL_REDIRECT = False  
 SECURE_PROXY_SSL_HEADER = ('HTTP_X_FORWARDED_PROTO', 'https')
@@ -117,7 +129,8 @@ LOGIN_REDIRECT_URL = '/'
 LOGOUT_REDIRECT_URL = '/'
 
 AUTHENTICATION_BACKENDS = [
-    'django.contrib.auth.backends.ModelBackend',
+    # ModelBackend chargeant le rôle manager avec l'utilisateur (connexion en une requête)
+    'user_auth.backends.RoleModelBackend',
 ]
 
 ROOT_URLCONF = "config.urls"  
@@ -183,11 +196,45 @@ RATELIMIT_DEFAULT_DECORATORS = [
 ]
 
 # Cache configuration
-CACHES = {
-    'default': {
-        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+# ``default`` porte les réponses de l'API, arbres et facettes : leurs clés
+# incluent les versions des ressources, un cache propre à chaque worker reste
+# donc exact. ``shared`` porte ce qui doit être commun aux workers gunicorn
+# (versions des ressources, statistiques invalidées à l'écriture) : quelques
+# dizaines de clés, sous MAX_ENTRIES, jamais évincées.
+CACHE_MAX_ENTRIES = int(os.getenv('CACHE_MAX_ENTRIES', 20000))
+if os.getenv('REDIS_URL'):
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': os.getenv('REDIS_URL'),
+        },
+        'shared': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': os.getenv('REDIS_URL'),
+            'KEY_PREFIX': 'shared',
+        },
     }
-}
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+            'OPTIONS': {'MAX_ENTRIES': CACHE_MAX_ENTRIES},
+        },
+    }
+    if os.getenv('CACHE_BACKEND') == 'db':
+        # Nécessite : python manage.py createcachetable
+        CACHES['shared'] = {
+            'BACKEND': 'django.core.cache.backends.db.DatabaseCache',
+            'LOCATION': 'django_cache',
+        }
+    else:
+        CACHES['shared'] = {
+            'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+            'LOCATION': os.getenv('CACHE_DIR', os.path.join(tempfile.gettempdir(), 'gestion_prep_cache')),
+        }
+
+# Durée de conservation des réponses de l'API en cache (secondes)
+API_RESPONSE_CACHE_TIMEOUT = int(os.getenv('API_RESPONSE_CACHE_TIMEOUT', 600))
 
 # Email settings
 EMAIL_BACKEND = 'django.core.mail.backends.console.EmailBackend'  
@@ -196,7 +243,11 @@ EMAIL_HOST = 'smtp.gmail.com'
 EMAIL_PORT = 587
 EMAIL_USE_TLS = True
 EMAIL_HOST_USER = os.getenv('EMAIL_HOST_USER', '')  
-EMAIL_HOST_PASSWORD = os.getenv('EMAIL_HOST_PASSWORD', '')  
+EMAIL_HOST_PASSWORD = os.getenv('EMAIL_HOST_PASSWORD', '')
+# Durée de validité des liens de vérification d'email
+EMAIL_VERIFICATION_TOKEN_LIFETIME = timedelta(days=int(os.getenv('EMAIL_VERIFICATION_TOKEN_DAYS', 2)))
+# Tentatives d'envoi d'un email de la file avant abandon (commande send_outbox)
+EMAIL_OUTBOX_MAX_ATTEMPTS = int(os.getenv('EMAIL_OUTBOX_MAX_ATTEMPTS', 5))  
 
 # Static files (CSS, JavaScript, Images)
 STATIC_URL = "static/"
@@ -204,5 +255,15 @@ STATIC_ROOT = BASE_DIR / "staticfiles"
 MEDIA_URL = "media/"
 MEDIA_ROOT = BASE_DIR / "media"
 
+# Envoi des documents par le serveur web après contrôle d'accès :
+# 'x-accel-redirect' (nginx), 'x-sendfile' (Apache, lighttpd) ; vide : servis par Django
+DOCUMENT_SENDFILE_BACKEND = os.getenv('DOCUMENT_SENDFILE_BACKEND') or None
+DOCUMENT_SENDFILE_PREFIX = os.getenv('DOCUMENT_SENDFILE_PREFIX', '/protected-media/')
+# Processus du pool de génération des aperçus (par worker)
+DOCUMENT_PREVIEW_WORKERS = int(os.getenv('DOCUMENT_PREVIEW_WORKERS', 2))
+# Envoi des documents par morceaux (/api/uploads/)
+DOCUMENT_UPLOAD_MAX_SIZE = int(os.getenv('DOCUMENT_UPLOAD_MAX_SIZE', 2 * 1024 ** 3))
+DOCUMENT_UPLOAD_MAX_CHUNK = int(os.getenv('DOCUMENT_UPLOAD_MAX_CHUNK', 16 * 1024 ** 2))
+
 # Default primary key field type
 DEFAULT_AUTO_FIELD = "django.db.models.BigAutoField"
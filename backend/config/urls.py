@@ -1,9 +1,6 @@
 from django.contrib import admin
 from django.urls import path, include
-from django.conf import settings
-from django.conf.urls.static import static
 from django.views.generic import RedirectView
-from django.views.static import serve
 from django.http import HttpResponse
 
 def favicon_view(request):
@@ -23,7 +20,7 @@ urlpatterns = [
     path('api/', include('gestion_prep.api.urls')),
     path('api-auth/', include('rest_framework.urls')),
     path('api/auth/', include('user_auth.urls')),
-    
-    # Media files
-    path('media/<path:path>', serve, {'document_root': settings.MEDIA_ROOT}),
-] + static(settings.MEDIA_URL, document_root=settings.MEDIA_ROOT)
+
+    # Les documents ne sont pas servis publiquement depuis MEDIA_ROOT :
+    # voir /api/documents/<id>/download/
+]
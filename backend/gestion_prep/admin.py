@@ -25,6 +25,7 @@ from .forms import (
     MouvementMaterielForm, DocumentForm, ArticleForm,
     LigneMouvementForm, LigneMouvementInlineFormSet
 )
+from .previews import available_previews, preview_version
 
 T = TypeVar('T', bound=Model)
 
@@ -411,7 +412,20 @@ class LigneMouvementAdmin(admin.ModelAdmin):
 class DocumentInline(admin.TabularInline):
     model = Document
     extra = 1
-    fields = ['fichier', 'remarque']
+    fields = ['apercu', 'fichier', 'remarque']
+    readonly_fields = ['apercu']
+
+    @admin.display(description='Aperçu')
+    def apercu(self, obj: Document) -> str:
+        # Vignette générée en arrière-plan : rien tant qu'elle n'existe pas
+        if not obj.pk or 'thumbnail' not in available_previews(obj.fichier.name):
+            return '-'
+        version = preview_version(obj.fichier.name)
+        return format_html(
+            '<a href="{}?inline=1"><img src="{}?v={}" alt="{}" style="max-height: 64px"></a>',
+            reverse('document-download', args=[obj.pk]),
+            reverse('document-thumbnail', args=[obj.pk]), version, obj.filename,
+        )
 
     def get_queryset(self, request: AuthenticatedHttpRequest) -> "QuerySet[Any]":
         return super().get_queryset(request).filter(article__isnull=False)
@@ -449,7 +463,7 @@ class DocumentAdmin(CustomModelAdmin):
     form = DocumentForm
     list_display = ('get_fichier_display', 'get_parent_display', 'remarque', 'uploaded_by', 'date_upload')
     list_filter = ('date_upload', 'uploaded_by')
-    search_fields = ('fichier', 'remarque')
+    search_fields = ('nom_fichier', 'remarque')
     autocomplete_fields = ['article', 'uploaded_by']
 
     @admin.display(description='Fichier')
@@ -457,8 +471,9 @@ class DocumentAdmin(CustomModelAdmin):
         if obj.fichier:
             try:
                 if obj.fichier.storage.exists(obj.fichier.name):
-                    return format_html('<a href="{}">{}</a>', obj.fichier.url, obj.fichier.name)
-                return f"{obj.fichier.name} (fichier manquant)"
+                    url = reverse('document-download', args=[obj.pk])
+                    return format_html('<a href="{}?inline=1">{}</a>', url, obj.filename)
+                return f"{obj.filename} (fichier manquant)"
             except Exception:
                 return f"{obj.fichier.name} (erreur d'accès)"
         return "(sans fichier)"
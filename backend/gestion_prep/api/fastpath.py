@@ -0,0 +1,80 @@
+from decimal import Decimal
+
+from django.core.exceptions import FieldDoesNotExist
+from rest_framework import fields as drf_fields
+from rest_framework.relations import PrimaryKeyRelatedField
+from rest_framework.serializers import BaseSerializer
+from rest_framework.settings import api_settings
+
+# Champs DRF dont to_representation() renvoie la valeur de la base telle quelle
+IDENTITY_FIELDS = (
+    drf_fields.CharField,
+    drf_fields.IntegerField,
+    drf_fields.BooleanField,
+    drf_fields.ChoiceField,
+    PrimaryKeyRelatedField,
+)
+
+
+def _decimal_converter(field):
+    """Équivalent de ``DecimalField.to_representation`` pour une valeur déjà au bon format."""
+    coerce_to_string = getattr(field, 'coerce_to_string', api_settings.COERCE_DECIMAL_TO_STRING)
+    if not coerce_to_string or field.localize or field.normalize_output:
+        return field.to_representation
+    exponent = -field.decimal_places if field.decimal_places is not None else None
+
+    def convert(value):
+        if not isinstance(value, Decimal) or value.as_tuple().exponent != exponent:
+            return field.to_representation(value)
+        return f'{value:f}'
+    return convert
+
+
+class RowEncoder:
+    """
+    Encodeur précompilé des lignes ``values()`` d'un queryset.
+
+    Produit, pour chaque ligne, le même dictionnaire que le serializer dont il
+    est issu, sans instancier de modèle ni appeler un champ DRF par valeur :
+    seuls les décimaux (et les champs sans équivalent direct) sont convertis.
+    """
+
+    def __init__(self, columns, converters):
+        self.columns = columns
+        self.plan = [(name, converters.get(name)) for name in columns]
+
+    def __call__(self, row):
+        return {
+            name: convert(row[name]) if convert is not None and row[name] is not None else row[name]
+            for name, convert in self.plan
+        }
+
+
+def compile_row_encoder(serializer):
+    """
+    Compile un :class:`RowEncoder` pour ``serializer``, ou ``None`` si l'un de
+    ses champs n'est pas une colonne simple du modèle (serializer imbriqué,
+    champ calculé, source composée, relation multiple).
+    """
+    model = serializer.Meta.model
+    columns = []
+    converters = {}
+    for name, field in serializer.fields.items():
+        if field.write_only:
+            continue
+        if isinstance(field, BaseSerializer) or field.source != name:
+            return None
+        try:
+            model_field = model._meta.get_field(name)
+        except FieldDoesNotExist:
+            return None
+        if not model_field.concrete or model_field.many_to_many:
+            return None
+        if model_field.is_relation and not isinstance(field, PrimaryKeyRelatedField):
+            return None
+        columns.append(name)
+        if isinstance(field, drf_fields.DecimalField):
+            converters[name] = _decimal_converter(field)
+        elif not isinstance(field, IDENTITY_FIELDS):
+            converters[name] = field.to_representation
+    return RowEncoder(columns, converters)
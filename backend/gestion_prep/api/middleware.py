@@ -0,0 +1,81 @@
+import gzip
+from typing import Optional
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.utils.cache import patch_vary_headers
+
+try:
+    import brotli
+except ImportError:  # Dépendance optionnelle : repli sur gzip
+    brotli = None
+
+# En dessous de cette taille, la compression coûte plus qu'elle ne rapporte
+MIN_COMPRESS_LENGTH = 1024
+COMPRESSIBLE_TYPES = ('application/json',)
+
+
+def select_encoding(request) -> Optional[str]:
+    """Encodage retenu pour la réponse à ``request`` : ``br``, ``gzip`` ou ``None``."""
+    accepted = set()
+    for item in request.META.get('HTTP_ACCEPT_ENCODING', '').split(','):
+        coding, _, params = item.strip().partition(';')
+        if params.strip().replace(' ', '') in ('q=0', 'q=0.0'):
+            continue
+        accepted.add(coding.strip().lower())
+    if brotli is not None and 'br' in accepted:
+        return 'br'
+    if 'gzip' in accepted:
+        return 'gzip'
+    return None
+
+
+class CompressionMiddleware:
+    """
+    Compresse en brotli (si disponible) ou gzip les réponses JSON volumineuses.
+
+    Les ETag ne sont pas affaiblis comme le ferait ``GZipMiddleware`` : ceux
+    émis par l'API intègrent déjà l'encodage négocié (voir
+    ``ConditionalGetMixin``) et identifient donc la représentation exacte.
+    Compatible WSGI et ASGI : les vues asynchrones ne repassent pas par un
+    thread.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        return self.compress(request, self.get_response(request))
+
+    async def __acall__(self, request):
+        return self.compress(request, await self.get_response(request))
+
+    def compress(self, request, response):
+        if response.streaming or response.has_header('Content-Encoding'):
+            return response
+        if not response.get('Content-Type', '').startswith(COMPRESSIBLE_TYPES):
+            return response
+
+        patch_vary_headers(response, ('Accept-Encoding',))
+        if len(response.content) < MIN_COMPRESS_LENGTH:
+            return response
+
+        encoding = select_encoding(request)
+        if encoding == 'br':
+            content = brotli.compress(response.content)
+        elif encoding == 'gzip':
+            content = gzip.compress(response.content, compresslevel=6, mtime=0)
+        else:
+            return response
+
+        if len(content) >= len(response.content):
+            return response
+        response.content = content
+        response['Content-Length'] = str(len(content))
+        response['Content-Encoding'] = encoding
+        return response
@@ -0,0 +1,230 @@
+import hashlib
+
+from django.conf import settings
+from django.core.cache import cache
+from django.http import HttpResponse
+from django.utils.cache import get_conditional_response, patch_vary_headers
+from django.utils.http import http_date, quote_etag
+from rest_framework.permissions import SAFE_METHODS, AllowAny
+from rest_framework.response import Response
+from user_auth.roles import is_manager
+
+from gestion_prep.versions import get_versions, model_version_name
+from .middleware import select_encoding
+from .fastpath import compile_row_encoder
+from .optimizer import plan_queryset
+
+
+class ConditionalGetMixin:
+    """
+    ETag/Last-Modified fondés sur la version de la ressource.
+
+    La version du modèle (avancée par les signaux à chaque écriture) suffit à
+    calculer l'ETag : une requête conditionnelle valide reçoit un 304 avant
+    toute requête SQL ou sérialisation.
+    """
+
+    def get_resource_models(self):
+        """Modèles dont dépend le contenu de la réponse."""
+        return [self.get_queryset().model]
+
+    def get_resource_versions(self):
+        if not hasattr(self, '_resource_versions'):
+            names = sorted({model_version_name(model) for model in self.get_resource_models()})
+            versions = get_versions(names)
+            self._resource_versions = [versions[name] for name in names]
+        return self._resource_versions
+
+    def get_cache_scope(self, request) -> str:
+        """
+        Périmètre de partage d'une réponse : ``public`` si la vue est ouverte
+        à tous, sinon l'utilisateur authentifié et ses claims de rôle. Les vues
+        filtrées par département ou par rôle ne resservent donc pas une réponse
+        calculée avant un changement de rôle ou de département.
+        """
+        if all(issubclass(permission, AllowAny) for permission in self.permission_classes):
+            return 'public'
+        user = request.user
+        if not user.is_authenticated:
+            return 'anon'
+        if not hasattr(self, '_cache_scope'):
+            self._cache_scope = 'user:{}:{}:{:d}{:d}{:d}'.format(
+                user.pk, getattr(user, 'department', ''),
+                is_manager(user), user.is_staff, user.is_superuser,
+            )
+        return self._cache_scope
+
+    def get_etag(self, request, versions) -> str:
+        parts = [
+            ','.join(str(version) for version in versions),
+            self.get_cache_scope(request),
+            # Les réponses contiennent des adresses absolues (hôte et schéma)
+            request.scheme,
+            request.get_host(),
+            request.get_full_path(),
+            request.META.get('HTTP_ACCEPT', ''),
+            select_encoding(request) or 'identity',
+        ]
+        return quote_etag(hashlib.sha1('|'.join(parts).encode()).hexdigest())
+
+    def conditional_response(self, handler, request, *args, **kwargs):
+        versions = self.get_resource_versions()
+        etag = self.get_etag(request, versions)
+        last_modified = max(versions) // 1000
+
+        # Validation sur l'ETag seulement : Last-Modified, à la seconde près,
+        # ne distingue pas deux écritures dans la même seconde.
+        response = get_conditional_response(request, etag=etag)
+        if response is None:
+            response = handler(request, *args, **kwargs)
+            if response.status_code != 200:
+                return response
+        response['ETag'] = etag
+        response['Last-Modified'] = http_date(last_modified)
+        patch_vary_headers(response, ('Accept', 'Accept-Encoding'))
+        if self.get_cache_scope(request) != 'public':
+            patch_vary_headers(response, ('Authorization',))
+        return response
+
+    def list(self, request, *args, **kwargs):
+        return self.conditional_response(super().list, request, *args, **kwargs)
+
+    def retrieve(self, request, *args, **kwargs):
+        return self.conditional_response(super().retrieve, request, *args, **kwargs)
+
+
+class CachedResponseMixin:
+    """
+    Cache des réponses de liste et de détail.
+
+    La clé combine les versions des modèles lus (avancées par les signaux
+    ``post_save``/``post_delete``), le périmètre utilisateur, l'URL complète
+    (schéma et hôte compris) et l'en-tête Accept : une écriture rend les
+    entrées concernées inaccessibles sans invalidation explicite. À utiliser
+    après ``ConditionalGetMixin`` dans l'ordre d'héritage, dont il reprend
+    les versions et le périmètre.
+    """
+    response_cache_timeout = getattr(settings, 'API_RESPONSE_CACHE_TIMEOUT', 600)
+
+    def get_response_cache_key(self, request) -> str:
+        parts = [
+            ','.join(str(version) for version in self.get_resource_versions()),
+            self.get_cache_scope(request),
+            # Les réponses contiennent des adresses absolues (hôte et schéma)
+            request.scheme,
+            request.get_host(),
+            request.get_full_path(),
+            request.META.get('HTTP_ACCEPT', ''),
+        ]
+        return 'gestion_prep:response:' + hashlib.sha1('|'.join(parts).encode()).hexdigest()
+
+    def cached_response(self, handler, request, *args, **kwargs):
+        key = self.get_response_cache_key(request)
+        cached = cache.get(key)
+        if cached is not None:
+            content, content_type = cached
+            return HttpResponse(content, content_type=content_type)
+
+        response = handler(request, *args, **kwargs)
+        if isinstance(response, Response) and response.status_code == 200:
+            response.add_post_render_callback(
+                lambda rendered: cache.set(
+                    key, (rendered.content, rendered['Content-Type']), self.response_cache_timeout
+                )
+            )
+        return response
+
+    def list(self, request, *args, **kwargs):
+        return self.cached_response(super().list, request, *args, **kwargs)
+
+    def retrieve(self, request, *args, **kwargs):
+        return self.cached_response(super().retrieve, request, *args, **kwargs)
+
+
+class SparseFieldsetMixin:
+    """
+    ``?fields=`` et ``?expand=`` sur les lectures.
+
+    Les options sont transmises au serializer (dérivé de
+    ``DynamicFieldsModelSerializer``) ; combiné à ``QueryOptimizerMixin``, le
+    queryset ne lit alors que les colonnes et relations demandées.
+    """
+
+    def _query_list(self, param):
+        value = self.request.query_params.get(param, '')
+        names = [name.strip() for name in value.split(',') if name.strip()]
+        return names or None
+
+    def get_sparse_options(self):
+        request = getattr(self, 'request', None)
+        if request is None or request.method not in SAFE_METHODS:
+            return {}
+        return {'fields': self._query_list('fields'), 'expand': self._query_list('expand') or []}
+
+    def get_serializer(self, *args, **kwargs):
+        for key, value in self.get_sparse_options().items():
+            kwargs.setdefault(key, value)
+        return super().get_serializer(*args, **kwargs)
+
+
+class QueryOptimizerMixin:
+    """
+    ``select_related``/``prefetch_related``/``only`` déduits du serializer.
+
+    Les champs déclarés (serializers imbriqués, sources pointées, relations)
+    sont parcourus à chaque lecture : ajouter un champ ne peut plus
+    réintroduire une requête par ligne.
+    """
+
+    def get_query_plan(self):
+        if not hasattr(self, '_query_plan'):
+            self._query_plan = plan_queryset(super().get_queryset().model, self.get_serializer())
+        return self._query_plan
+
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        request = getattr(self, 'request', None)
+        if request is None or request.method not in SAFE_METHODS:
+            return queryset
+        # Champs d'ordre conservés pour la pagination par curseur
+        return self.get_query_plan().apply(queryset, keep=getattr(self, 'ordering_fields', None) or ())
+
+    def get_resource_models(self):
+        request = getattr(self, 'request', None)
+        if request is None or request.method not in SAFE_METHODS:
+            return super().get_resource_models()
+        return list(self.get_query_plan().models)
+
+
+class ValuesListMixin:
+    """
+    Chemin rapide pour les listes : ``values()`` et encodeur précompilé.
+
+    Activé par ``values_list_enabled`` lorsque le serializer (après
+    ``?fields=``/``?expand=``) ne comporte que des colonnes du modèle ; la
+    sortie est identique à celle du serializer. Sinon, la liste classique
+    est utilisée.
+    """
+    values_list_enabled = False
+
+    def list(self, request, *args, **kwargs):
+        if not self.values_list_enabled:
+            return super().list(request, *args, **kwargs)
+        return self.list_response(self.filter_queryset(self.get_queryset()))
+
+    def list_response(self, queryset):
+        """Page (ou liste complète) de ``queryset``, par le chemin rapide si possible."""
+        encoder = compile_row_encoder(self.get_serializer()) if self.values_list_enabled else None
+        if encoder is None:
+            page = self.paginate_queryset(queryset)
+            if page is not None:
+                return self.get_paginated_response(self.get_serializer(page, many=True).data)
+            return Response(self.get_serializer(queryset, many=True).data)
+
+        # Champs d'ordre conservés pour la pagination par curseur
+        keep = [name for name in getattr(self, 'ordering_fields', None) or () if name not in encoder.columns]
+        queryset = queryset.values(*encoder.columns, *keep)
+        page = self.paginate_queryset(queryset)
+        if page is not None:
+            return self.get_paginated_response([encoder(row) for row in page])
+        return Response([encoder(row) for row in queryset])
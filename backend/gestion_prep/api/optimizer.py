@@ -0,0 +1,110 @@
+from django.core.exceptions import FieldDoesNotExist
+from django.db.models import Prefetch
+from rest_framework.relations import ManyRelatedField, RelatedField
+from rest_framework.serializers import BaseSerializer, ListSerializer
+
+
+class QueryPlan:
+    """
+    Jointures, préchargements et colonnes nécessaires à un serializer.
+
+    ``models`` recense tous les modèles lus, ce qui permet aux vues de
+    construire un ETag qui change dès que l'un d'eux est modifié.
+    """
+
+    def __init__(self, model):
+        self.model = model
+        self.select_related = set()
+        self.prefetch = {}
+        self.only = set()
+        self.models = {model}
+
+    def apply(self, queryset, keep=()):
+        if self.select_related:
+            queryset = queryset.select_related(*sorted(self.select_related))
+        if self.prefetch:
+            queryset = queryset.prefetch_related(*self.prefetch.values())
+        if self.only:
+            queryset = queryset.only(*sorted(self.only | set(keep)))
+        return queryset
+
+
+def _all_columns(plan, model, prefix):
+    plan.only.update(prefix + field.name for field in model._meta.concrete_fields)
+
+
+def _unwrap(serializer):
+    return serializer.child if isinstance(serializer, ListSerializer) else serializer
+
+
+def _walk_serializer(plan, model, serializer, prefix):
+    plan.models.add(model)
+    for field in _unwrap(serializer).fields.values():
+        if field.write_only:
+            continue
+        if field.source == '*':
+            # SerializerMethodField ou source='*' : l'objet entier est lu
+            _all_columns(plan, model, prefix)
+            if isinstance(field, BaseSerializer):
+                _walk_serializer(plan, model, field, prefix)
+            continue
+        _walk_source(plan, model, field, field.source_attrs, prefix)
+
+
+def _walk_source(plan, model, field, attrs, prefix):
+    try:
+        model_field = model._meta.get_field(attrs[0])
+    except FieldDoesNotExist:
+        # Propriété ou méthode du modèle : dépendances inconnues
+        _all_columns(plan, model, prefix)
+        return
+
+    path = prefix + attrs[0]
+    if not model_field.is_relation:
+        if model_field.concrete:
+            plan.only.add(path)
+        return
+
+    last = len(attrs) == 1
+    related = model_field.related_model
+    if model_field.many_to_one or model_field.one_to_one:
+        if model_field.concrete:
+            plan.only.add(path)
+        if last and isinstance(field, RelatedField) and field.use_pk_only_optimization():
+            return
+        plan.select_related.add(path)
+        plan.models.add(related)
+        if not last:
+            _walk_source(plan, related, field, attrs[1:], path + '__')
+        elif isinstance(field, BaseSerializer):
+            _walk_serializer(plan, related, field, path + '__')
+        else:
+            _all_columns(plan, related, path + '__')
+        return
+
+    # Relation multiple : préchargement par une requête optimisée à part
+    child = QueryPlan(related)
+    if model_field.one_to_many:
+        child.only.add(model_field.field.name)
+    if not last:
+        _walk_source(child, related, field, attrs[1:], '')
+    elif isinstance(field, BaseSerializer):
+        _walk_serializer(child, related, field, '')
+    elif isinstance(field, ManyRelatedField) and field.child_relation.use_pk_only_optimization():
+        child.only.add(related._meta.pk.name)
+    else:
+        _all_columns(child, related, '')
+    plan.prefetch[path] = Prefetch(path, queryset=child.apply(related._default_manager.all()))
+    plan.models |= child.models
+
+
+def plan_queryset(model, serializer) -> QueryPlan:
+    """Parcourt les champs (imbriqués, sources pointées) d'un serializer."""
+    plan = QueryPlan(model)
+    _walk_serializer(plan, model, serializer, '')
+    return plan
+
+
+def optimize_queryset(queryset, serializer, keep=()):
+    """Applique ``select_related``/``prefetch_related``/``only`` requis par ``serializer``."""
+    return plan_queryset(queryset.model, serializer).apply(queryset, keep)
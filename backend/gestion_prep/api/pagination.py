@@ -0,0 +1,15 @@
+from django.conf import settings
+from rest_framework.pagination import CursorPagination
+
+
+class KeysetCursorPagination(CursorPagination):
+    """
+    Pagination par curseur (keyset) sur une colonne indexée.
+
+    Chaque page est obtenue par un ``WHERE id > <curseur>`` sur l'index de la
+    clé primaire, sans ``COUNT(*)`` ni ``OFFSET`` : parcourir toute une table
+    reste linéaire en nombre de lignes.
+    """
+    ordering = 'id'
+    page_size_query_param = 'page_size'
+    max_page_size = getattr(settings, 'API_MAX_PAGE_SIZE', 1000)
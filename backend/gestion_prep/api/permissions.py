@@ -0,0 +1,13 @@
+from django.db.models import Q
+from user_auth.roles import is_manager
+
+
+def visible_documents(user, queryset):
+    """
+    Documents de ``queryset`` accessibles à ``user`` : ceux qu'il a envoyés
+    et ceux de son département ; tous pour un manager ou l'équipe
+    d'administration. Les autres sont introuvables (404), comme inexistants.
+    """
+    if user.is_staff or user.is_superuser or is_manager(user):
+        return queryset
+    return queryset.filter(Q(uploaded_by_id=user.pk) | Q(uploaded_by__department=user.department))
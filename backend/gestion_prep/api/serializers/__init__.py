@@ -5,6 +5,12 @@ from .models import (
     TrainSerializer,
     EquipementSerializer,
     ArticleSerializer,
+    StockSerializer,
+    CategorieArticleSerializer,
+    TypePlatinageSerializer,
+    ArticleBulkSerializer,
+    DocumentSerializer,
+    UploadSessionSerializer,
 )
 
 __all__ = [
@@ -14,4 +20,10 @@ __all__ = [
     'TrainSerializer',
     'EquipementSerializer',
     'ArticleSerializer',
+    'StockSerializer',
+    'CategorieArticleSerializer',
+    'TypePlatinageSerializer',
+    'ArticleBulkSerializer',
+    'DocumentSerializer',
+    'UploadSessionSerializer',
 ]
\ No newline at end of file
@@ -0,0 +1,32 @@
+from django.utils.module_loading import import_string
+from rest_framework import serializers
+
+
+class DynamicFieldsModelSerializer(serializers.ModelSerializer):
+    """
+    ModelSerializer acceptant une sélection de champs et des relations dépliées.
+
+    ``fields`` restreint les champs renvoyés ; ``expand`` remplace l'identifiant
+    des relations listées dans ``Meta.expandable_fields`` (nom -> classe de
+    serializer, ou son nom dans le même module) par l'objet sérialisé. Les relations dépliées sont en lecture
+    seule : les vues ne les demandent que pour les lectures.
+    """
+
+    def __init__(self, *args, fields=None, expand=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        expandable = self.get_expandable_fields()
+        for name in expand or ():
+            if name in expandable and (fields is None or name in fields):
+                model_field = self.Meta.model._meta.get_field(name)
+                many = model_field.many_to_many or model_field.one_to_many
+                self.fields[name] = expandable[name](many=many, read_only=True)
+        if fields is not None:
+            for name in set(self.fields) - set(fields):
+                self.fields.pop(name)
+
+    @classmethod
+    def get_expandable_fields(cls):
+        return {
+            name: import_string(f'{cls.__module__}.{serializer}') if isinstance(serializer, str) else serializer
+            for name, serializer in getattr(cls.Meta, 'expandable_fields', {}).items()
+        }
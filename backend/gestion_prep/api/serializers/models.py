@@ -1,27 +1,151 @@
 from rest_framework import serializers
-from gestion_prep.models import Site, Unite, Train, Equipement, Article
+from rest_framework.reverse import reverse
+from gestion_prep.models import (
+    Site, Unite, Train, Equipement, Article, CategorieArticle, TypePlatinage, Stock, Document, UploadSession
+)
+from gestion_prep.previews import available_previews, preview_version
+from .base import DynamicFieldsModelSerializer
 
-class SiteSerializer(serializers.ModelSerializer):
+class SiteSerializer(DynamicFieldsModelSerializer):
     class Meta:
         model = Site
         fields = '__all__'
+        expandable_fields = {'unites': 'UniteSerializer'}
 
-class UniteSerializer(serializers.ModelSerializer):
+class UniteSerializer(DynamicFieldsModelSerializer):
     class Meta:
         model = Unite
         fields = '__all__'
+        expandable_fields = {'site': 'SiteSerializer', 'trains': 'TrainSerializer'}
 
-class TrainSerializer(serializers.ModelSerializer):
+class TrainSerializer(DynamicFieldsModelSerializer):
     class Meta:
         model = Train
         fields = '__all__'
+        expandable_fields = {'unite': 'UniteSerializer', 'equipements': 'EquipementSerializer'}
 
-class EquipementSerializer(serializers.ModelSerializer):
+class EquipementSerializer(DynamicFieldsModelSerializer):
     class Meta:
         model = Equipement
         fields = '__all__'
+        expandable_fields = {'train': 'TrainSerializer'}
 
-class ArticleSerializer(serializers.ModelSerializer):
+class ArticleSerializer(DynamicFieldsModelSerializer):
     class Meta:
         model = Article
         fields = '__all__'
+        expandable_fields = {'stock': 'StockSerializer', 'categorie_article': 'CategorieArticleSerializer'}
+
+class StockSerializer(DynamicFieldsModelSerializer):
+    class Meta:
+        model = Stock
+        fields = '__all__'
+        expandable_fields = {'site': 'SiteSerializer'}
+
+class CategorieArticleSerializer(DynamicFieldsModelSerializer):
+    class Meta:
+        model = CategorieArticle
+        fields = '__all__'
+
+class TypePlatinageSerializer(DynamicFieldsModelSerializer):
+    class Meta:
+        model = TypePlatinage
+        fields = '__all__'
+
+class DocumentSerializer(DynamicFieldsModelSerializer):
+    """
+    Document et adresses de téléchargement ; ``thumbnail_url`` et
+    ``preview_url`` valent ``null`` tant que les aperçus ne sont pas générés.
+    """
+    download_url = serializers.SerializerMethodField()
+    thumbnail_url = serializers.SerializerMethodField()
+    preview_url = serializers.SerializerMethodField()
+
+    class Meta:
+        model = Document
+        fields = [
+            'id', 'nom_fichier', 'remarque', 'article', 'equipement', 'uploaded_by', 'date_upload',
+            'download_url', 'thumbnail_url', 'preview_url',
+        ]
+        expandable_fields = {'article': 'ArticleSerializer', 'equipement': 'EquipementSerializer'}
+
+    def _url(self, name, obj, **query):
+        url = reverse(name, args=[obj.pk], request=self.context.get('request'))
+        return url + ''.join(f'?{key}={value}' for key, value in query.items())
+
+    def get_download_url(self, obj):
+        return self._url('document-download', obj)
+
+    def _preview_url(self, obj, kind):
+        if kind not in available_previews(obj.fichier.name):
+            return None
+        return self._url(f'document-{kind}', obj, v=preview_version(obj.fichier.name))
+
+    def get_thumbnail_url(self, obj):
+        return self._preview_url(obj, 'thumbnail')
+
+    def get_preview_url(self, obj):
+        return self._preview_url(obj, 'preview')
+
+class UploadSessionSerializer(serializers.ModelSerializer):
+    """Envoi par morceaux : annonce du fichier, puis état (``recu``) pour la reprise."""
+
+    class Meta:
+        model = UploadSession
+        fields = [
+            'id', 'nom_fichier', 'taille', 'sha256', 'remarque', 'article', 'equipement',
+            'recu', 'date_expiration', 'document',
+        ]
+        read_only_fields = ['id', 'recu', 'date_expiration', 'document']
+
+    def validate_taille(self, value):
+        max_size = self.context['max_size']
+        if value < 0 or value > max_size:
+            raise serializers.ValidationError(f'La taille doit être comprise entre 0 et {max_size} octets.')
+        return value
+
+    def validate_sha256(self, value):
+        if value and (len(value) != 64 or any(c not in '0123456789abcdef' for c in value.lower())):
+            raise serializers.ValidationError('Empreinte SHA-256 hexadécimale attendue.')
+        return value.lower()
+
+    def validate(self, attrs):
+        if bool(attrs.get('article')) == bool(attrs.get('equipement')):
+            raise serializers.ValidationError(
+                'Un document doit être associé soit à un article, soit à un équipement.'
+            )
+        return attrs
+
+class ArticleBulkSerializer(serializers.ModelSerializer):
+    """
+    Validation d'une ligne d'import en masse d'articles.
+
+    ``stock`` et ``categorie_article`` sont résolus dans les dictionnaires
+    préchargés passés en contexte (``stocks``, ``categories``) plutôt que par
+    une requête par ligne. L'unicité ``(code_article, stock)`` n'est pas
+    vérifiée ici : elle sert de clé à l'upsert. ``quantite_stock`` ne sert
+    qu'à la création (``quantite_initiale`` par défaut).
+    """
+    stock = serializers.IntegerField()
+    categorie_article = serializers.IntegerField()
+    quantite_stock = serializers.DecimalField(max_digits=10, decimal_places=2, min_value=0, required=False)
+
+    class Meta:
+        model = Article
+        exclude = ['id']
+        validators = []
+
+    def validate(self, attrs):
+        errors = {}
+        stock = self.context['stocks'].get(attrs['stock'])
+        if stock is None:
+            errors['stock'] = f"Stock {attrs['stock']} introuvable."
+        categorie = self.context['categories'].get(attrs['categorie_article'])
+        if categorie is None:
+            errors['categorie_article'] = f"Catégorie {attrs['categorie_article']} introuvable."
+        if errors:
+            raise serializers.ValidationError(errors)
+        attrs['stock'] = stock
+        attrs['categorie_article'] = categorie
+        attrs.setdefault('quantite_stock', attrs['quantite_initiale'])
+        return attrs
@@ -1,4 +1,5 @@
-from django.urls import path
+from django.urls import path, include
+from rest_framework.routers import SimpleRouter
 from rest_framework_simplejwt.views import (
     TokenObtainPairView,
     TokenRefreshView,
@@ -6,11 +7,53 @@ from rest_framework_simplejwt.views import (
 from .views import (
     api_root,
     UserMeView,
+    SiteViewSet,
+    UniteViewSet,
+    TrainViewSet,
+    EquipementViewSet,
+    ArticleViewSet,
+    CategorieArticleViewSet,
+    TypePlatinageViewSet,
+    hierarchy_tree,
+    mouvement_feed,
+    dashboard,
+    stock_report,
+    sync_changes,
+    batch_requests,
+    document_download,
+    document_preview,
+    DocumentViewSet,
+    upload_sessions,
+    upload_session,
+    finalize_upload,
 )
 
+router = SimpleRouter()
+router.register(r'sites', SiteViewSet)
+router.register(r'unites', UniteViewSet)
+router.register(r'trains', TrainViewSet)
+router.register(r'equipements', EquipementViewSet)
+router.register(r'articles', ArticleViewSet)
+router.register(r'categories', CategorieArticleViewSet)
+router.register(r'types-platinage', TypePlatinageViewSet)
+router.register(r'documents', DocumentViewSet)
+
 urlpatterns = [
     path('', api_root, name='api-root'),
     path('token/', TokenObtainPairView.as_view(), name='token_obtain_pair'),
     path('token/refresh/', TokenRefreshView.as_view(), name='token_refresh'),
     path('users/me/', UserMeView.as_view(), name='user-me'),
-]
\ No newline at end of file
+    path('hierarchy/', hierarchy_tree, name='hierarchy'),
+    path('mouvements/feed/', mouvement_feed, name='mouvement-feed'),
+    path('dashboard/', dashboard, name='dashboard'),
+    path('reports/stocks/', stock_report, name='stock-report'),
+    path('sync/', sync_changes, name='sync'),
+    path('batch/', batch_requests, name='batch'),
+    path('documents/<int:pk>/download/', document_download, name='document-download'),
+    path('documents/<int:pk>/thumbnail/', document_preview, {'kind': 'thumbnail'}, name='document-thumbnail'),
+    path('documents/<int:pk>/preview/', document_preview, {'kind': 'preview'}, name='document-preview'),
+    path('uploads/', upload_sessions, name='uploads'),
+    path('uploads/<uuid:pk>/', upload_session, name='upload-session'),
+    path('uploads/<uuid:pk>/finalize/', finalize_upload, name='upload-finalize'),
+    path('', include(router.urls)),
+]
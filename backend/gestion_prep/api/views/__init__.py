@@ -1,17 +1,60 @@
-from rest_framework import viewsets
-from rest_framework.decorators import api_view
+from django.core.exceptions import ValidationError
+from rest_framework import status
+from rest_framework.decorators import api_view, action
 from rest_framework.response import Response
 from rest_framework.reverse import reverse
 from rest_framework.permissions import IsAuthenticated, AllowAny
-from gestion_prep.models import Site, Unite, Train, Equipement, Article
+from gestion_prep.models import (
+    Site, Unite, Train, Equipement, Article, CategorieArticle, TypePlatinage, Stock, Document
+)
+from gestion_prep.bulk import upsert_articles
+from gestion_prep.facets import ARTICLE_FACETS, filter_articles, get_article_facets, search_articles
 from ..serializers import (
     SiteSerializer,
     UniteSerializer,
     TrainSerializer,
     EquipementSerializer,
-    ArticleSerializer
+    ArticleSerializer,
+    CategorieArticleSerializer,
+    TypePlatinageSerializer,
+    ArticleBulkSerializer,
+    DocumentSerializer,
 )
+from ..permissions import visible_documents
+from .base import OptimizedModelViewSet
 from .auth import UserMeView
+from .hierarchy import hierarchy_tree
+from .feeds import mouvement_feed
+from .dashboard import dashboard, stock_report
+from .sync import sync_changes
+from .batch import batch_requests
+from .documents import document_download, document_preview
+from .uploads import finalize_upload, upload_session, upload_sessions
+
+def _referenced_ids(rows, field):
+    """Identifiants entiers référencés par ``field`` dans les lignes d'un import."""
+    ids = set()
+    for row in rows:
+        try:
+            ids.add(int(row.get(field)))
+        except (AttributeError, TypeError, ValueError):
+            continue
+    return ids
+
+def _facet_filters(params):
+    """Filtres de facettes de la requête, valeurs séparées par des virgules."""
+    filters = {}
+    for name in ARTICLE_FACETS:
+        values = [value.strip() for value in params.get(name, '').split(',') if value.strip()]
+        if not values:
+            continue
+        if name == 'sous_seuil':
+            filters[name] = {value in ('1', 'true') for value in values}
+        elif name == 'type_stock':
+            filters[name] = set(values)
+        else:
+            filters[name] = {int(value) for value in values}
+    return filters
 
 @api_view(['GET'])
 def api_root(request, format=None):
@@ -22,39 +65,175 @@ def api_root(request, format=None):
         'trains': reverse('train-list', request=request, format=format),
         'equipements': reverse('equipement-list', request=request, format=format),
         'articles': reverse('article-list', request=request, format=format),
+        'categories': reverse('categoriearticle-list', request=request, format=format),
+        'types-platinage': reverse('typeplatinage-list', request=request, format=format),
+        'hierarchy': reverse('hierarchy', request=request, format=format),
+        'mouvements-feed': reverse('mouvement-feed', request=request, format=format),
+        'dashboard': reverse('dashboard', request=request, format=format),
+        'stock-report': reverse('stock-report', request=request, format=format),
+        'sync': reverse('sync', request=request, format=format),
+        'batch': reverse('batch', request=request, format=format),
+        'documents': reverse('document-list', request=request, format=format),
+        'uploads': reverse('uploads', request=request, format=format),
     })
 
-class SiteViewSet(viewsets.ModelViewSet):
+class SiteViewSet(OptimizedModelViewSet):
     queryset = Site.objects.all()
     serializer_class = SiteSerializer
     permission_classes = [AllowAny]
+    ordering_fields = ['id', 'nom']
 
-class UniteViewSet(viewsets.ModelViewSet):
+class UniteViewSet(OptimizedModelViewSet):
     queryset = Unite.objects.all()
     serializer_class = UniteSerializer
     permission_classes = [AllowAny]
+    ordering_fields = ['id']
 
-class TrainViewSet(viewsets.ModelViewSet):
+class TrainViewSet(OptimizedModelViewSet):
     queryset = Train.objects.all()
     serializer_class = TrainSerializer
     permission_classes = [AllowAny]
+    ordering_fields = ['id']
 
-class EquipementViewSet(viewsets.ModelViewSet):
+class EquipementViewSet(OptimizedModelViewSet):
     queryset = Equipement.objects.all()
     serializer_class = EquipementSerializer
     permission_classes = [AllowAny]
+    ordering_fields = ['id', 'tag']
 
-class ArticleViewSet(viewsets.ModelViewSet):
+class ArticleViewSet(OptimizedModelViewSet):
     queryset = Article.objects.all()
     serializer_class = ArticleSerializer
     permission_classes = [AllowAny]
+    ordering_fields = ['id', 'code_article']
+    values_list_enabled = True
+    bulk_max_rows = 5000
+
+    @action(detail=False, methods=['post'], url_path='bulk')
+    def bulk_upsert(self, request):
+        """
+        Crée ou met à jour une liste d'articles, clé ``(code_article, stock)``.
+
+        Les stocks et catégories référencés sont chargés en deux requêtes ;
+        chaque ligne passe par le serializer puis ``Article.full_clean()``, et
+        les lignes valides sont écrites par ``bulk_create(update_conflicts=True)``.
+        Les lignes invalides sont renvoyées avec leur index sans bloquer les autres.
+        """
+        rows = request.data
+        if not isinstance(rows, list):
+            return Response({'error': 'Une liste d\'articles est attendue'},
+                            status=status.HTTP_400_BAD_REQUEST)
+        if len(rows) > self.bulk_max_rows:
+            return Response({'error': f'Au plus {self.bulk_max_rows} articles par requête'},
+                            status=status.HTTP_400_BAD_REQUEST)
+
+        context = {
+            'stocks': Stock.objects.in_bulk(_referenced_ids(rows, 'stock')),
+            'categories': CategorieArticle.objects.in_bulk(_referenced_ids(rows, 'categorie_article')),
+        }
+        articles = []
+        errors = []
+        seen = {}
+        for index, row in enumerate(rows):
+            serializer = ArticleBulkSerializer(data=row, context=context)
+            if not serializer.is_valid():
+                errors.append({'index': index, 'errors': serializer.errors})
+                continue
+            data = serializer.validated_data
+            key = (data['code_article'], data['stock'].pk)
+            if key in seen:
+                errors.append({'index': index, 'errors': {
+                    'code_article': [f'Doublon de la ligne {seen[key]} pour ce stock.']
+                }})
+                continue
+            article = Article(**data)
+            try:
+                # Clés étrangères déjà résolues, unicité servant de clé à l'upsert
+                article.full_clean(exclude=['stock', 'categorie_article'],
+                                   validate_unique=False, validate_constraints=False)
+            except ValidationError as e:
+                errors.append({'index': index, 'errors': e.message_dict})
+                continue
+            seen[key] = index
+            articles.append(article)
+
+        saved = upsert_articles(articles)
+        return Response({
+            'saved': len(saved),
+            'ids': [article.pk for article in saved],
+            'errors': errors,
+        }, status=status.HTTP_200_OK if saved or not errors else status.HTTP_400_BAD_REQUEST)
+
+    @action(detail=False, methods=['get'], url_path='search')
+    def search(self, request):
+        """
+        Recherche à facettes : page d'articles et nombres par facette.
+
+        ``?q=`` cherche dans le code et la description ; ``categorie``,
+        ``stock``, ``site``, ``type_stock`` et ``sous_seuil`` filtrent (valeurs
+        séparées par des virgules). Les facettes sont calculées en une requête
+        groupée et gardées en cache quelques secondes.
+        """
+        search = request.query_params.get('q', '').strip()
+        try:
+            filters = _facet_filters(request.query_params)
+        except ValueError:
+            return Response({'error': 'Identifiant de facette invalide'},
+                            status=status.HTTP_400_BAD_REQUEST)
+
+        queryset = filter_articles(search_articles(search, self.get_queryset()), filters)
+        response = self.list_response(self.filter_queryset(queryset))
+        response.data['facets'] = get_article_facets(search, filters)
+        return response
+
+class CategorieArticleViewSet(OptimizedModelViewSet):
+    queryset = CategorieArticle.objects.all()
+    serializer_class = CategorieArticleSerializer
+    permission_classes = [AllowAny]
+    ordering_fields = ['id', 'nom']
+
+class TypePlatinageViewSet(OptimizedModelViewSet):
+    queryset = TypePlatinage.objects.all()
+    serializer_class = TypePlatinageSerializer
+    permission_classes = [AllowAny]
+    ordering_fields = ['id', 'nom']
+
+class DocumentViewSet(OptimizedModelViewSet):
+    """
+    Documents d'un article ou d'un équipement (``?article=``, ``?equipement=``),
+    en lecture : l'envoi des fichiers passe par ``/api/uploads/`` ou l'administration.
+    """
+    queryset = Document.objects.all()
+    serializer_class = DocumentSerializer
+    permission_classes = [IsAuthenticated]
+    http_method_names = ['get', 'head', 'options']
+    filterset_fields = ['article', 'equipement']
+    ordering_fields = ['id', 'date_upload']
+
+    def get_queryset(self):
+        return visible_documents(self.request.user, super().get_queryset())
 
 __all__ = [
     'api_root',
+    'OptimizedModelViewSet',
     'SiteViewSet',
     'UniteViewSet',
     'TrainViewSet',
     'EquipementViewSet',
     'ArticleViewSet',
+    'CategorieArticleViewSet',
+    'TypePlatinageViewSet',
     'UserMeView',
+    'hierarchy_tree',
+    'mouvement_feed',
+    'dashboard',
+    'stock_report',
+    'sync_changes',
+    'batch_requests',
+    'document_download',
+    'document_preview',
+    'DocumentViewSet',
+    'upload_sessions',
+    'upload_session',
+    'finalize_upload',
 ]
\ No newline at end of file
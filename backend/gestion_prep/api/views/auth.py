@@ -1,6 +1,6 @@
 from rest_framework import generics
 from rest_framework.permissions import IsAuthenticated
-from django.contrib.auth.models import User
+from user_auth.tokens import load_user
 from ..serializers.user import UserSerializer
 
 class UserMeView(generics.RetrieveAPIView):
@@ -8,4 +8,4 @@ class UserMeView(generics.RetrieveAPIView):
     permission_classes = [IsAuthenticated]
 
     def get_object(self):
-        return self.request.user
+        return load_user(self.request.user)
@@ -0,0 +1,16 @@
+from rest_framework import viewsets
+from ..mixins import (
+    CachedResponseMixin, ConditionalGetMixin, QueryOptimizerMixin, SparseFieldsetMixin,
+    ValuesListMixin,
+)
+
+
+class OptimizedModelViewSet(QueryOptimizerMixin, SparseFieldsetMixin, ConditionalGetMixin,
+                            CachedResponseMixin, ValuesListMixin, viewsets.ModelViewSet):
+    """
+    ModelViewSet de base de l'API gestion_prep.
+
+    Lectures optimisées d'après le serializer, ``?fields=``/``?expand=``,
+    GET conditionnels (ETag) et cache des réponses sur les listes et les
+    détails ; ``values_list_enabled`` active le chemin rapide des listes.
+    """
@@ -0,0 +1,169 @@
+import io
+import json
+import logging
+
+from asgiref.sync import async_to_sync, iscoroutinefunction
+from django.conf import settings
+from django.core.exceptions import PermissionDenied
+from django.core.handlers.wsgi import WSGIRequest
+from django.db import connection, transaction
+from django.http import Http404
+from django.urls import Resolver404, resolve
+from rest_framework import status
+from rest_framework.decorators import api_view, permission_classes
+from rest_framework.permissions import AllowAny
+from rest_framework.response import Response
+
+logger = logging.getLogger(__name__)
+
+BATCH_MAX_REQUESTS = getattr(settings, 'API_BATCH_MAX_REQUESTS', 20)
+BATCH_METHODS = ('GET', 'HEAD', 'OPTIONS', 'POST', 'PUT', 'PATCH', 'DELETE')
+SAFE_BATCH_METHODS = ('GET', 'HEAD', 'OPTIONS')
+
+# En-têtes propres à la requête englobante, non transmis aux sous-requêtes
+PARENT_ONLY_META = (
+    'CONTENT_LENGTH', 'CONTENT_TYPE', 'QUERY_STRING', 'PATH_INFO',
+    'HTTP_IF_NONE_MATCH', 'HTTP_IF_MODIFIED_SINCE', 'HTTP_ACCEPT_ENCODING',
+)
+# En-têtes que les sous-requêtes ne peuvent pas redéfinir : l'authentification est partagée
+SHARED_HEADERS = ('HTTP_AUTHORIZATION', 'HTTP_COOKIE', 'HTTP_HOST')
+
+
+class BatchError(Exception):
+    def __init__(self, status_code, message):
+        super().__init__(message)
+        self.status_code = status_code
+
+
+def _build_request(request, item):
+    """Sous-requête ``item`` construite à partir de la requête ``request``."""
+    if not isinstance(item, dict) or not isinstance(item.get('url'), str):
+        raise BatchError(status.HTTP_400_BAD_REQUEST, 'Chaque requête doit préciser une url')
+    method = str(item.get('method', 'GET')).upper()
+    if method not in BATCH_METHODS:
+        raise BatchError(status.HTTP_405_METHOD_NOT_ALLOWED, f'Méthode non prise en charge : {method}')
+    path, _, query = item['url'].partition('?')
+    if not path.startswith('/api/'):
+        raise BatchError(status.HTTP_400_BAD_REQUEST, 'Seules les routes /api/ sont acceptées')
+
+    environ = {key: value for key, value in request.META.items() if key not in PARENT_ONLY_META}
+    environ['HTTP_ACCEPT'] = 'application/json'
+    for name, value in (item.get('headers') or {}).items():
+        key = 'HTTP_' + name.upper().replace('-', '_')
+        if key not in SHARED_HEADERS:
+            environ[key] = str(value)
+    body = b''
+    if item.get('body') is not None:
+        body = json.dumps(item['body']).encode()
+        environ['CONTENT_TYPE'] = 'application/json'
+    environ.update({
+        'REQUEST_METHOD': method,
+        'PATH_INFO': path,
+        'QUERY_STRING': query,
+        'CONTENT_LENGTH': str(len(body)),
+        'wsgi.input': io.BytesIO(body),
+        'wsgi.url_scheme': request.scheme,
+    })
+    sub_request = WSGIRequest(environ)
+    # Utilisateur déjà authentifié par la requête englobante
+    sub_request.user = request.user
+    sub_request._force_auth_user = request.user if request.user.is_authenticated else None
+    sub_request._force_auth_token = request.auth
+    return sub_request
+
+
+def _run(request, item):
+    sub_request = _build_request(request, item)
+    try:
+        match = resolve(sub_request.path_info)
+    except Resolver404:
+        raise BatchError(status.HTTP_404_NOT_FOUND, 'Route introuvable')
+    if match.func is batch_requests:
+        raise BatchError(status.HTTP_400_BAD_REQUEST, 'Les lots ne peuvent pas être imbriqués')
+
+    view = match.func
+    if iscoroutinefunction(view):
+        # L'ORM asynchrone (thread_sensitive) revient dans ce thread : la vue
+        # lit sur la connexion, et dans la transaction, du lot
+        view = async_to_sync(view)
+    try:
+        response = view(sub_request, *match.args, **match.kwargs)
+    except Http404:
+        raise BatchError(status.HTTP_404_NOT_FOUND, 'Ressource introuvable')
+    except PermissionDenied:
+        raise BatchError(status.HTTP_403_FORBIDDEN, 'Accès refusé')
+    if response.streaming:
+        raise BatchError(status.HTTP_400_BAD_REQUEST, 'Les réponses en flux ne sont pas prises en charge')
+    if hasattr(response, 'render'):
+        response.render()
+
+    content_type = response.get('Content-Type', '')
+    if content_type.startswith('application/json') and response.content:
+        body = json.loads(response.content)
+    else:
+        body = response.content.decode(response.charset, errors='replace')
+    headers = {
+        name: response[name]
+        for name in ('Content-Type', 'ETag', 'Last-Modified', 'Location')
+        if response.has_header(name)
+    }
+    return {'status': response.status_code, 'headers': headers, 'body': body}
+
+
+@api_view(['POST'])
+@permission_classes([AllowAny])
+def batch_requests(request):
+    """
+    Exécute plusieurs appels à l'API en un seul aller-retour.
+
+    Corps : ``{"requests": [{"method", "url", "headers", "body"}, ...]}``.
+    Les sous-requêtes sont traitées dans l'ordre, dans ce processus et sur
+    la même connexion, avec l'authentification de la requête englobante ;
+    chacune a sa propre réponse (``status``, ``headers``, ``body``).
+    ``"read_only": true`` les exécute dans une seule transaction en lecture
+    seule (instantané cohérent sous PostgreSQL), réservée aux lectures ; les
+    vues asynchrones y lisent par l'ORM asynchrone, sur la même connexion.
+    """
+    items = request.data.get('requests') if isinstance(request.data, dict) else None
+    if not isinstance(items, list) or not items:
+        return Response({'error': 'Une liste "requests" non vide est attendue'},
+                        status=status.HTTP_400_BAD_REQUEST)
+    if len(items) > BATCH_MAX_REQUESTS:
+        return Response({'error': f'Au plus {BATCH_MAX_REQUESTS} requêtes par lot'},
+                        status=status.HTTP_400_BAD_REQUEST)
+
+    read_only = bool(request.data.get('read_only'))
+    if read_only and any(
+        str(item.get('method', 'GET')).upper() not in SAFE_BATCH_METHODS
+        for item in items if isinstance(item, dict)
+    ):
+        return Response({'error': 'Un lot en lecture seule ne peut contenir que des lectures'},
+                        status=status.HTTP_400_BAD_REQUEST)
+
+    def run_all():
+        responses = []
+        for item in items:
+            try:
+                # Point de sauvegarde : une erreur SQL n'invalide pas la transaction du lot
+                with transaction.atomic(savepoint=read_only):
+                    responses.append(_run(request, item))
+            except BatchError as e:
+                responses.append({'status': e.status_code, 'headers': {}, 'body': {'error': str(e)}})
+            except Exception:
+                # Méthode et url seulement : le corps peut contenir un mot de passe
+                logger.exception('Erreur dans une sous-requête du lot : %s %s',
+                                 str(item.get('method', 'GET')).upper(), item.get('url'))
+                responses.append({'status': status.HTTP_500_INTERNAL_SERVER_ERROR, 'headers': {},
+                                  'body': {'error': 'Erreur interne'}})
+        return responses
+
+    if not read_only:
+        return Response({'responses': run_all()})
+
+    with transaction.atomic():
+        if connection.vendor == 'postgresql':
+            with connection.cursor() as cursor:
+                cursor.execute('SET TRANSACTION ISOLATION LEVEL REPEATABLE READ READ ONLY')
+        responses = run_all()
+        transaction.set_rollback(True)
+    return Response({'responses': responses})
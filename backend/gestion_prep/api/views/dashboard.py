@@ -0,0 +1,65 @@
+from functools import wraps
+
+from asgiref.sync import sync_to_async
+from django.http import JsonResponse
+from django.views.decorators.http import require_GET
+from rest_framework import exceptions
+from rest_framework.settings import api_settings
+from gestion_prep.dashboard import get_dashboard, get_stock_report
+
+
+def _authenticate(request):
+    """
+    Authentifie ``request`` avec les classes DRF configurées (JWT) : renvoie
+    l'utilisateur, ou lève ``AuthenticationFailed`` (jeton invalide ou
+    expiré) / ``NotAuthenticated`` (aucun identifiant).
+    """
+    for authentication_class in api_settings.DEFAULT_AUTHENTICATION_CLASSES:
+        result = authentication_class().authenticate(request)
+        if result is not None:
+            return result[0]
+    raise exceptions.NotAuthenticated('Authentification requise')
+
+
+def _unauthorized(request, exc):
+    """401 avec ``WWW-Authenticate``, comme une vue DRF."""
+    response = JsonResponse({'error': str(exc.detail)}, status=401)
+    authenticators = api_settings.DEFAULT_AUTHENTICATION_CLASSES
+    if authenticators:
+        header = authenticators[0]().authenticate_header(request)
+        if header:
+            response['WWW-Authenticate'] = header
+    return response
+
+
+def authenticated(view):
+    """Vue asynchrone réservée aux requêtes authentifiées."""
+    @wraps(view)
+    async def wrapper(request, *args, **kwargs):
+        try:
+            await sync_to_async(_authenticate)(request)
+        except (exceptions.AuthenticationFailed, exceptions.NotAuthenticated) as exc:
+            return _unauthorized(request, exc)
+        return await view(request, *args, **kwargs)
+    return wrapper
+
+
+@require_GET
+@authenticated
+async def dashboard(request):
+    """
+    Tableau de bord : totaux de stock, valeur par devise, prêts en cours,
+    BMM en brouillon et derniers historiques.
+
+    Vue asynchrone sur l'ORM asynchrone (``aaggregate``, ``acount``,
+    ``async for``) : servie en ASGI, elle ne mobilise pas de worker pendant
+    l'attente de la base.
+    """
+    return JsonResponse(await get_dashboard())
+
+
+@require_GET
+@authenticated
+async def stock_report(request):
+    """Rapport : articles par stock et mouvements validés par mois et par type."""
+    return JsonResponse(await get_stock_report())
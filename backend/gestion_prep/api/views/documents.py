@@ -0,0 +1,190 @@
+import mimetypes
+import os
+import re
+from urllib.parse import quote
+
+from django.conf import settings
+from django.http import FileResponse, HttpResponse, JsonResponse, StreamingHttpResponse
+from django.shortcuts import get_object_or_404
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import content_disposition_header, http_date, parse_http_date_safe
+from django.views.decorators.http import require_http_methods
+from gestion_prep.models import Document
+from gestion_prep.previews import available_previews, preview_version
+from gestion_prep.storage import BLOB_DIR
+from ..permissions import visible_documents
+from .dashboard import _authenticate
+
+# 'x-accel-redirect' (nginx), 'x-sendfile' (Apache, lighttpd) ou None (servi par Django)
+SENDFILE_BACKEND = getattr(settings, 'DOCUMENT_SENDFILE_BACKEND', None)
+# Emplacement interne nginx correspondant à MEDIA_ROOT
+SENDFILE_PREFIX = getattr(settings, 'DOCUMENT_SENDFILE_PREFIX', '/protected-media/')
+RANGE_CHUNK_SIZE = 64 * 1024
+
+RANGE_RE = re.compile(r'^bytes=(\d*)-(\d*)$')
+
+
+def _etag(name: str, stat: os.stat_result) -> str:
+    """ETag fort : l'empreinte du contenu pour un fichier adressé par contenu."""
+    if name.startswith(f'{BLOB_DIR}/'):
+        return '"%s"' % os.path.splitext(os.path.basename(name))[0]
+    return '"%x-%x"' % (int(stat.st_mtime), stat.st_size)
+
+
+def _byte_range(header: str, size: int):
+    """
+    Intervalle ``(début, fin incluse)`` demandé par ``Range``, ``None`` pour
+    le fichier entier (en-tête absent ou plusieurs intervalles), ou
+    ``ValueError`` si l'intervalle est hors du fichier.
+    """
+    match = RANGE_RE.match(header.strip())
+    if not match:
+        return None
+    start, end = match.groups()
+    if not start and not end:
+        return None
+    if not start:
+        # bytes=-N : les N derniers octets (aucun dans un fichier vide)
+        length = int(end)
+        if length == 0 or size == 0:
+            raise ValueError(header)
+        return max(size - length, 0), size - 1
+    start = int(start)
+    end = min(int(end), size - 1) if end else size - 1
+    if start >= size or start > end:
+        raise ValueError(header)
+    return start, end
+
+
+def _read_range(path: str, start: int, length: int):
+    with open(path, 'rb') as f:
+        f.seek(start)
+        while length > 0:
+            chunk = f.read(min(RANGE_CHUNK_SIZE, length))
+            if not chunk:
+                break
+            length -= len(chunk)
+            yield chunk
+
+
+def _if_range_matches(request, etag: str, last_modified: float) -> bool:
+    """``If-Range`` absent ou encore valide : l'intervalle demandé peut être servi."""
+    if_range = request.headers.get('If-Range')
+    if not if_range:
+        return True
+    if if_range.startswith('"'):
+        return if_range == etag
+    since = parse_http_date_safe(if_range)
+    return since is not None and int(last_modified) <= since
+
+
+def _get_document(request, pk):
+    """Document ``pk`` s'il est accessible à l'utilisateur, sinon la réponse d'erreur."""
+    user = request.user if request.user.is_authenticated else _authenticate(request)
+    if user is None or not user.is_authenticated:
+        return JsonResponse({'error': 'Authentification requise'}, status=401)
+    documents = visible_documents(user, Document.objects.only('fichier', 'nom_fichier'))
+    return get_object_or_404(documents, pk=pk)
+
+
+@require_http_methods(['GET', 'HEAD'])
+def document_download(request, pk):
+    """
+    Téléchargement protégé d'un document (utilisateur authentifié par JWT
+    ou par la session de l'administration, ayant accès au document : voir
+    :func:`visible_documents`).
+
+    Après contrôle, l'envoi des octets est confié au serveur web frontal
+    (``X-Accel-Redirect`` ou ``X-Sendfile``) si ``DOCUMENT_SENDFILE_BACKEND``
+    est défini ; sinon Django sert le fichier, avec reprise (``Range``,
+    ``If-Range``) et revalidation (``ETag``). ``?inline=1`` affiche le
+    document dans le navigateur au lieu de le télécharger.
+    """
+    document = _get_document(request, pk)
+    if isinstance(document, JsonResponse):
+        return document
+    name = document.fichier.name
+    storage = document.fichier.storage
+    if not name or not storage.exists(name):
+        return JsonResponse({'error': 'Fichier introuvable'}, status=404)
+
+    return _send_file(request, storage, name, document.filename,
+                      as_attachment=request.GET.get('inline') != '1')
+
+
+@require_http_methods(['GET', 'HEAD'])
+def document_preview(request, pk, kind):
+    """
+    Vignette (``thumbnail``) ou aperçu de la première page (``preview``)
+    d'un document, en JPEG. Les aperçus sont générés en arrière-plan après
+    l'envoi du fichier : 404 tant qu'ils ne sont pas prêts, jamais de rendu
+    pendant la requête. Avec ``?v=`` (adresses fournies par l'API), la
+    réponse est mise en cache par le navigateur sans revalidation.
+    """
+    document = _get_document(request, pk)
+    if isinstance(document, JsonResponse):
+        return document
+    name = available_previews(document.fichier.name).get(kind)
+    if name is None:
+        return JsonResponse({'error': 'Aperçu indisponible'}, status=404)
+
+    stem = os.path.splitext(document.filename)[0]
+    version = request.GET.get('v')
+    return _send_file(request, document.fichier.storage, name, f'{stem}-{kind}.jpg',
+                      as_attachment=False,
+                      immutable=bool(version) and version == preview_version(document.fichier.name))
+
+
+def _send_file(request, storage, name, filename, as_attachment, immutable=False):
+    """Envoi de ``name`` (stockage ``storage``), délégué au serveur web si configuré."""
+    path = storage.path(name)
+    stat = os.stat(path)
+    etag = _etag(name, stat)
+    not_modified = get_conditional_response(request, etag=etag, last_modified=int(stat.st_mtime))
+    if not_modified is not None:
+        return not_modified
+
+    content_type = mimetypes.guess_type(filename)[0] or 'application/octet-stream'
+    if SENDFILE_BACKEND == 'x-accel-redirect':
+        # nginx sert le fichier (et les requêtes Range) depuis un emplacement "internal"
+        response = HttpResponse(content_type=content_type)
+        response['X-Accel-Redirect'] = SENDFILE_PREFIX.rstrip('/') + '/' + quote(name)
+    elif SENDFILE_BACKEND == 'x-sendfile':
+        response = HttpResponse(content_type=content_type)
+        response['X-Sendfile'] = path
+    else:
+        response = _file_response(request, path, stat, etag, content_type)
+
+    response['Content-Disposition'] = content_disposition_header(as_attachment, filename)
+    response['ETag'] = etag
+    response['Last-Modified'] = http_date(stat.st_mtime)
+    if immutable:
+        # Adresse versionnée par le contenu : ne change jamais
+        patch_cache_control(response, private=True, max_age=365 * 24 * 3600, immutable=True)
+    else:
+        # Le fichier d'un document peut être remplacé : revalidation à chaque accès
+        patch_cache_control(response, private=True, no_cache=True)
+    return response
+
+
+def _file_response(request, path, stat, etag, content_type):
+    size = stat.st_size
+    byte_range = None
+    if 'Range' in request.headers and _if_range_matches(request, etag, stat.st_mtime):
+        try:
+            byte_range = _byte_range(request.headers['Range'], size)
+        except ValueError:
+            response = HttpResponse(status=416)
+            response['Content-Range'] = f'bytes */{size}'
+            return response
+
+    if byte_range is None:
+        response = FileResponse(open(path, 'rb'), content_type=content_type)
+    else:
+        start, end = byte_range
+        response = StreamingHttpResponse(_read_range(path, start, end - start + 1),
+                                         status=206, content_type=content_type)
+        response['Content-Range'] = f'bytes {start}-{end}/{size}'
+        response['Content-Length'] = str(end - start + 1)
+    response['Accept-Ranges'] = 'bytes'
+    return response
@@ -0,0 +1,144 @@
+import base64
+import csv
+import io
+import json
+from datetime import datetime, time
+
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models import Q
+from django.db.models.functions import Coalesce
+from django.http import StreamingHttpResponse
+from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
+from rest_framework import status
+from rest_framework.decorators import api_view, permission_classes
+from rest_framework.permissions import IsAuthenticated
+from rest_framework.response import Response
+from gestion_prep.models import LigneMouvement, MouvementMateriel
+
+FEED_CHUNK_SIZE = 2000
+
+# Colonnes du flux : nom exporté -> chemin ORM
+FEED_COLUMNS = {
+    'id': 'id',
+    'numero_bmm': 'mouvement__numero_bmm',
+    'type_mouvement': 'mouvement__type_mouvement',
+    'statut': 'mouvement__statut',
+    'date_creation': 'mouvement__date_creation',
+    'date_validation': 'mouvement__date_validation',
+    'departement_service': 'mouvement__departement_service',
+    'emetteur_recepteur': 'mouvement__emetteur_recepteur',
+    'equipement': 'mouvement__equipement__tag',
+    'code_article': 'article__code_article',
+    'unite_mesure': 'article__unite_mesure',
+    'stock': 'article__stock_id',
+    'site': 'article__stock__site_id',
+    'quantite': 'quantite',
+    'stock_avant': 'stock_avant',
+    'stock_apres': 'stock_apres',
+}
+
+
+def encode_cursor(date: datetime, ligne_id: int) -> str:
+    return base64.urlsafe_b64encode(f'{date.isoformat()}|{ligne_id}'.encode()).decode()
+
+
+def decode_cursor(token: str):
+    """``(date, id de ligne)`` de la dernière ligne reçue."""
+    date, _, ligne_id = base64.urlsafe_b64decode(token.encode()).decode().partition('|')
+    parsed = parse_datetime(date)
+    if parsed is None:
+        raise ValueError(token)
+    return parsed, int(ligne_id)
+
+
+def _parse_bound(value: str, end_of_day: bool) -> datetime:
+    parsed = parse_datetime(value)
+    if parsed is None:
+        day = parse_date(value)
+        if day is None:
+            raise ValueError(value)
+        parsed = datetime.combine(day, time.max if end_of_day else time.min)
+    if timezone.is_naive(parsed):
+        parsed = timezone.make_aware(parsed)
+    return parsed
+
+
+def _ndjson(rows):
+    for row, cursor in rows:
+        row['cursor'] = cursor
+        yield json.dumps(row, cls=DjangoJSONEncoder, ensure_ascii=False) + '\n'
+
+
+def _csv(rows):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(list(FEED_COLUMNS) + ['cursor'])
+    for row, cursor in rows:
+        writer.writerow([
+            value.isoformat() if isinstance(value, datetime) else value
+            for value in row.values()
+        ] + [cursor])
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def mouvement_feed(request):
+    """
+    Flux continu des lignes de mouvement, en NDJSON (défaut) ou CSV.
+
+    Filtres : ``statut`` (défaut ``VALIDE``), ``site``, ``date_min`` et
+    ``date_max`` (date de validation, ou de création hors BMM validés).
+    Chaque ligne porte un ``cursor`` ; le repasser en ``?cursor=`` reprend le
+    flux juste après. Les lignes sont lues par ``iterator()`` (curseur
+    serveur sous PostgreSQL) dans l'ordre (date, identifiant de ligne) : ni
+    OFFSET, ni résultat complet en mémoire. La date de validation fait
+    partie du curseur : un BMM validé après le passage du consommateur est
+    émis à la reprise suivante, quel que soit l'identifiant de ses lignes.
+    """
+    params = request.query_params
+    output = params.get('output', 'ndjson')
+    if output not in ('ndjson', 'csv'):
+        return Response({'error': 'output doit valoir ndjson ou csv'},
+                        status=status.HTTP_400_BAD_REQUEST)
+
+    statut = params.get('statut', MouvementMateriel.STATUT_VALIDE)
+    if statut not in dict(MouvementMateriel.STATUT_CHOICES):
+        return Response({'error': f'Statut inconnu : {statut}'},
+                        status=status.HTTP_400_BAD_REQUEST)
+    date_field = ('mouvement__date_validation' if statut == MouvementMateriel.STATUT_VALIDE
+                  else 'mouvement__date_creation')
+
+    # Clé du curseur : date de validation (à défaut de création), puis ligne
+    queryset = LigneMouvement.objects.filter(mouvement__statut=statut).annotate(
+        date_curseur=Coalesce(date_field, 'mouvement__date_creation'),
+    )
+    try:
+        if 'site' in params:
+            queryset = queryset.filter(article__stock__site_id=int(params['site']))
+        if 'date_min' in params:
+            queryset = queryset.filter(**{f'{date_field}__gte': _parse_bound(params['date_min'], False)})
+        if 'date_max' in params:
+            queryset = queryset.filter(**{f'{date_field}__lte': _parse_bound(params['date_max'], True)})
+        if 'cursor' in params:
+            date, ligne_id = decode_cursor(params['cursor'])
+            queryset = queryset.filter(Q(date_curseur__gt=date) | Q(date_curseur=date, id__gt=ligne_id))
+    except (ValueError, UnicodeDecodeError):
+        return Response({'error': 'Paramètre de filtre ou curseur invalide'},
+                        status=status.HTTP_400_BAD_REQUEST)
+
+    rows = (
+        ({name: row[path] for name, path in FEED_COLUMNS.items()},
+         encode_cursor(row['date_curseur'], row['id']))
+        for row in queryset.order_by('date_curseur', 'id')
+        .values(*FEED_COLUMNS.values(), 'date_curseur').iterator(chunk_size=FEED_CHUNK_SIZE)
+    )
+    if output == 'csv':
+        response = StreamingHttpResponse(_csv(rows), content_type='text/csv; charset=utf-8')
+        response['Content-Disposition'] = 'attachment; filename="mouvements.csv"'
+    else:
+        response = StreamingHttpResponse(_ndjson(rows), content_type='application/x-ndjson')
+    return response
@@ -0,0 +1,37 @@
+from rest_framework import status
+from rest_framework.decorators import api_view, permission_classes
+from rest_framework.permissions import AllowAny
+from rest_framework.response import Response
+from gestion_prep.hierarchy import get_hierarchy, HierarchyNodeNotFound, NODE_TYPES
+
+
+@api_view(['GET'])
+@permission_classes([AllowAny])
+def hierarchy_tree(request):
+    """
+    Arborescence Site → Unité → Train → Équipement en un seul appel.
+
+    ``?site=<id>`` (ou ``unite``, ``train``, ``equipement``) renvoie le
+    sous-arbre de ce nœud ; ``?counts=1`` ajoute le nombre de documents et
+    de platinages de chaque nœud.
+    """
+    roots = [node_type for node_type in NODE_TYPES if node_type in request.query_params]
+    if len(roots) > 1:
+        return Response({'error': 'Un seul nœud racine peut être demandé'},
+                        status=status.HTTP_400_BAD_REQUEST)
+
+    root_type = roots[0] if roots else None
+    root_id = None
+    if root_type:
+        try:
+            root_id = int(request.query_params[root_type])
+        except ValueError:
+            return Response({'error': 'Identifiant invalide'},
+                            status=status.HTTP_400_BAD_REQUEST)
+
+    with_counts = request.query_params.get('counts') in ('1', 'true')
+    try:
+        tree = get_hierarchy(root_type, root_id, with_counts)
+    except HierarchyNodeNotFound:
+        return Response({'error': 'Nœud introuvable'}, status=status.HTTP_404_NOT_FOUND)
+    return Response(tree)
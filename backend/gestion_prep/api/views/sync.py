@@ -0,0 +1,131 @@
+from django.conf import settings
+from django.db.models import Q
+from rest_framework import status
+from rest_framework.decorators import api_view, permission_classes
+from rest_framework.permissions import AllowAny
+from rest_framework.response import Response
+from gestion_prep.models import (
+    ChangeLog, Site, Unite, Train, Equipement, CategorieArticle, Stock, Article, TypePlatinage
+)
+from gestion_prep.changelog import sync_horizon
+from gestion_prep.versions import model_version_name
+from ..fastpath import compile_row_encoder
+from ..serializers import (
+    SiteSerializer,
+    UniteSerializer,
+    TrainSerializer,
+    EquipementSerializer,
+    CategorieArticleSerializer,
+    StockSerializer,
+    ArticleSerializer,
+    TypePlatinageSerializer,
+)
+
+SYNC_MAX_CHANGES = getattr(settings, 'API_SYNC_MAX_CHANGES', 5000)
+
+# Ressource exposée -> (modèle, serializer), parents avant enfants
+SYNC_RESOURCES = {
+    'sites': (Site, SiteSerializer),
+    'unites': (Unite, UniteSerializer),
+    'trains': (Train, TrainSerializer),
+    'equipements': (Equipement, EquipementSerializer),
+    'categories': (CategorieArticle, CategorieArticleSerializer),
+    'stocks': (Stock, StockSerializer),
+    'articles': (Article, ArticleSerializer),
+    'types-platinage': (TypePlatinage, TypePlatinageSerializer),
+}
+
+
+def _current_rows(model, serializer_class, ids):
+    """Représentation API des objets ``ids`` encore présents."""
+    queryset = model.objects.filter(pk__in=ids).order_by('pk')
+    encoder = compile_row_encoder(serializer_class())
+    if encoder is not None:
+        return [encoder(row) for row in queryset.values(*encoder.columns)]
+    return serializer_class(queryset, many=True).data
+
+
+def _parse_token(value):
+    """
+    Jeton ``<transaction>.<identifiant>`` -> couple d'entiers ; un entier
+    seul (jeton antérieur) vaut ``(0, identifiant)``.
+    """
+    if not value:
+        return 0, 0
+    transaction_id, _, entry_id = value.rpartition('.')
+    key = (int(transaction_id or 0), int(entry_id))
+    if min(key) < 0:
+        raise ValueError(value)
+    return key
+
+
+@api_view(['GET'])
+@permission_classes([AllowAny])
+def sync_changes(request):
+    """
+    Synchronisation différentielle du référentiel.
+
+    ``?since=<jeton>`` renvoie les objets créés ou modifiés (``upserts``) et
+    les identifiants supprimés (``deletes``) depuis ce jeton, par ressource ;
+    sans jeton, tout le référentiel. Le ``token`` de la réponse est à
+    repasser à l'appel suivant, immédiatement tant que ``has_more`` est vrai.
+    ``?resources=articles,stocks`` limite la synchronisation à ces ressources.
+
+    Le jeton ne dépasse jamais une transaction encore en cours
+    (:func:`~gestion_prep.changelog.sync_horizon`) : les entrées d'une
+    transaction validée tardivement sont servies à l'appel qui suit sa
+    validation, jamais sautées.
+    """
+    params = request.query_params
+    try:
+        since = _parse_token(params.get('since'))
+        limit = min(int(params.get('limit') or SYNC_MAX_CHANGES), SYNC_MAX_CHANGES)
+        if limit < 1:
+            raise ValueError
+    except ValueError:
+        return Response({'error': 'since doit être un jeton renvoyé par la synchronisation, '
+                                  'limit un entier positif'},
+                        status=status.HTTP_400_BAD_REQUEST)
+
+    names = [name.strip() for name in params.get('resources', '').split(',') if name.strip()]
+    unknown = [name for name in names if name not in SYNC_RESOURCES]
+    if unknown:
+        return Response({'error': f'Ressources inconnues : {", ".join(unknown)}'},
+                        status=status.HTTP_400_BAD_REQUEST)
+    resources = {name: SYNC_RESOURCES[name] for name in names or SYNC_RESOURCES}
+    by_label = {model_version_name(model): name for name, (model, _) in resources.items()}
+
+    journal = (ChangeLog.objects.filter(resource__in=by_label)
+               .filter(Q(transaction_id__gt=since[0]) | Q(transaction_id=since[0], id__gt=since[1]))
+               .order_by('transaction_id', 'id')
+               .values_list('transaction_id', 'id', 'resource', 'object_id', 'action'))
+    horizon = sync_horizon()
+    if horizon is not None:
+        journal = journal.filter(transaction_id__lt=horizon)
+    entries = list(journal[:limit + 1])
+    has_more = len(entries) > limit
+    entries = entries[:limit]
+
+    # Seule la dernière action sur un objet compte
+    latest = {}
+    for _, _, resource, object_id, action in entries:
+        latest[(resource, object_id)] = action
+
+    changes = {}
+    for label, name in by_label.items():
+        model, serializer_class = resources[name]
+        upserted = [oid for (resource, oid), action in latest.items()
+                    if resource == label and action == ChangeLog.ACTION_UPSERT]
+        deleted = {oid for (resource, oid), action in latest.items()
+                   if resource == label and action == ChangeLog.ACTION_DELETE}
+        rows = _current_rows(model, serializer_class, upserted) if upserted else []
+        # Supprimé depuis, au-delà de cette page : tombstone immédiat
+        deleted.update(set(upserted) - {row['id'] for row in rows})
+        if rows or deleted:
+            changes[name] = {'upserts': rows, 'deletes': sorted(deleted)}
+
+    return Response({
+        'token': '{}.{}'.format(*(entries[-1][:2] if entries else since)),
+        'has_more': has_more,
+        'changes': changes,
+    })
@@ -0,0 +1,120 @@
+from django.db import transaction
+from rest_framework import status
+from rest_framework.decorators import api_view, permission_classes
+from rest_framework.permissions import IsAuthenticated
+from rest_framework.response import Response
+from rest_framework.reverse import reverse
+from gestion_prep.models import UploadSession
+from gestion_prep.uploads import (
+    UPLOAD_MAX_CHUNK, UPLOAD_MAX_SIZE, UploadError, abort, append_chunk, finalize, new_expiration,
+    receive_chunk,
+)
+from ..serializers import DocumentSerializer, UploadSessionSerializer
+
+
+def _session_response(session, status_code=status.HTTP_200_OK):
+    response = Response(UploadSessionSerializer(session).data, status=status_code)
+    response['Upload-Offset'] = str(session.recu)
+    response['Upload-Length'] = str(session.taille)
+    return response
+
+
+def _error(e: UploadError, session=None):
+    body = {'error': str(e)}
+    if session is not None:
+        body['recu'] = session.recu
+    return Response(body, status=e.status_code)
+
+
+@api_view(['POST'])
+@permission_classes([IsAuthenticated])
+def upload_sessions(request):
+    """
+    Ouvre un envoi par morceaux : ``nom_fichier``, ``taille``, ``article``
+    ou ``equipement``, et facultativement ``remarque`` et ``sha256`` (vérifié
+    à la finalisation).
+
+    Les morceaux s'envoient ensuite par ``PUT /api/uploads/<id>/`` (corps
+    brut, en-tête ``Upload-Offset``), dans l'ordre ; ``GET`` donne la
+    position à laquelle reprendre après une coupure, et
+    ``POST /api/uploads/<id>/finalize/`` crée le document.
+    """
+    serializer = UploadSessionSerializer(data=request.data, context={'max_size': UPLOAD_MAX_SIZE})
+    serializer.is_valid(raise_exception=True)
+    session = serializer.save(uploaded_by_id=request.user.pk, date_expiration=new_expiration())
+    response = _session_response(session, status.HTTP_201_CREATED)
+    response['Location'] = reverse('upload-session', args=[session.id], request=request)
+    response['Upload-Max-Chunk'] = str(UPLOAD_MAX_CHUNK)
+    return response
+
+
+def _get_session(request, pk, lock=False):
+    queryset = UploadSession.objects.filter(pk=pk, uploaded_by_id=request.user.pk)
+    if lock:
+        queryset = queryset.select_for_update()
+    return queryset.first()
+
+
+@api_view(['GET', 'HEAD', 'PUT', 'DELETE'])
+@permission_classes([IsAuthenticated])
+def upload_session(request, pk):
+    """
+    État de l'envoi (``GET``), écriture d'un morceau (``PUT``) ou abandon
+    (``DELETE``).
+
+    ``PUT`` : corps brut (``application/octet-stream``) écrit directement
+    sur le disque à la position ``Upload-Offset``, qui doit valoir ``recu`` ;
+    ``X-Chunk-SHA256`` (facultatif) fait vérifier le morceau. La réponse
+    donne la nouvelle position dans ``Upload-Offset``.
+    """
+    if request.method == 'DELETE':
+        with transaction.atomic():
+            session = _get_session(request, pk, lock=True)
+            if session is None:
+                return Response({'error': 'Envoi introuvable'}, status=status.HTTP_404_NOT_FOUND)
+            if session.termine:
+                return Response({'error': 'Envoi déjà finalisé'}, status=status.HTTP_409_CONFLICT)
+            abort(session)
+        return Response(status=status.HTTP_204_NO_CONTENT)
+
+    session = _get_session(request, pk)
+    if session is None:
+        return Response({'error': 'Envoi introuvable'}, status=status.HTTP_404_NOT_FOUND)
+    if request.method in ('GET', 'HEAD'):
+        return _session_response(session)
+
+    try:
+        offset = int(request.headers['Upload-Offset'])
+        length = int(request.headers.get('Content-Length') or 0)
+    except (KeyError, ValueError):
+        return Response({'error': 'En-têtes Upload-Offset et Content-Length entiers attendus'},
+                        status=status.HTTP_400_BAD_REQUEST)
+    try:
+        # Le corps n'est pas analysé par DRF : lu par blocs depuis la connexion,
+        # sans transaction ni verrou ouverts pendant le transfert
+        tmp_path = receive_chunk(session, offset, request.stream, length,
+                                 request.headers.get('X-Chunk-SHA256', ''))
+        with transaction.atomic():
+            # Deux morceaux concurrents ne s'écrivent pas à la même position
+            session = _get_session(request, pk, lock=True)
+            append_chunk(session, offset, tmp_path)
+    except UploadError as e:
+        return _error(e, session)
+    return _session_response(session)
+
+
+@api_view(['POST'])
+@permission_classes([IsAuthenticated])
+def finalize_upload(request, pk):
+    """Vérifie le fichier reçu et crée le document ; sans effet si déjà fait."""
+    with transaction.atomic():
+        session = _get_session(request, pk, lock=True)
+        if session is None:
+            return Response({'error': 'Envoi introuvable'}, status=status.HTTP_404_NOT_FOUND)
+        created = not session.termine
+        try:
+            document = finalize(session)
+        except UploadError as e:
+            return _error(e, session)
+    return Response(DocumentSerializer(document, context={'request': request}).data,
+                    status=status.HTTP_201_CREATED if created else status.HTTP_200_OK)
@@ -0,0 +1,41 @@
+from typing import List, Sequence
+
+from django.db import transaction
+
+from .changelog import record_changes
+from .models import Article
+from .versions import bump_version, model_version_name
+
+# Clé naturelle d'un article, déclarée par Article.Meta.unique_together
+ARTICLE_UNIQUE_FIELDS = ['code_article', 'stock']
+# Tenus par les mouvements de matériel : écrits à la création seulement
+ARTICLE_MOVEMENT_FIELDS = ['quantite_stock']
+ARTICLE_UPDATE_FIELDS = [
+    field.name for field in Article._meta.concrete_fields
+    if not field.primary_key and field.name not in ARTICLE_UNIQUE_FIELDS + ARTICLE_MOVEMENT_FIELDS
+]
+
+
+def upsert_articles(articles: Sequence[Article], batch_size: int = 1000) -> List[Article]:
+    """
+    Crée ou met à jour ``articles`` selon leur clé ``(code_article, stock)``.
+
+    Un ``INSERT ... ON CONFLICT DO UPDATE`` par lot de ``batch_size`` ; un
+    article existant garde sa ``quantite_stock``, tenue par les mouvements.
+    Les lignes doivent avoir été validées (``full_clean``). Comme
+    ``bulk_create`` n'émet pas de signaux, la version des articles est avancée
+    et les lignes journalisées ici (ETag, caches et synchronisation de l'API).
+    """
+    if not articles:
+        return []
+    with transaction.atomic():
+        saved = Article.objects.bulk_create(
+            articles,
+            batch_size=batch_size,
+            update_conflicts=True,
+            unique_fields=ARTICLE_UNIQUE_FIELDS,
+            update_fields=ARTICLE_UPDATE_FIELDS,
+        )
+        record_changes(Article, [article.pk for article in saved])
+        bump_version(model_version_name(Article))
+    return saved
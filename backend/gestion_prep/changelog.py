@@ -0,0 +1,69 @@
+from typing import Iterable, Optional
+
+from django.db import connections, router
+from django.db.models import BigIntegerField, Exists, Func, OuterRef, Q
+
+from .models import (
+    ChangeLog, Site, Unite, Train, Equipement, CategorieArticle, Stock, Article, TypePlatinage
+)
+from .versions import model_version_name
+
+# Modèles journalisés, parents avant enfants
+SYNCED_MODELS = [Site, Unite, Train, Equipement, CategorieArticle, Stock, Article, TypePlatinage]
+
+
+def _current_transaction_id(connection):
+    """
+    Identifiant de la transaction en cours (``xid8`` de PostgreSQL 13+,
+    croissant et sans rebouclage), 0 sur les autres bases.
+    """
+    if connection.vendor == 'postgresql':
+        return Func(template='pg_current_xact_id()::text::bigint', output_field=BigIntegerField())
+    return 0
+
+
+def record_changes(model, object_ids: Iterable[int], action: str = ChangeLog.ACTION_UPSERT) -> None:
+    """
+    Journalise ``action`` pour les objets ``object_ids`` de ``model``.
+
+    Les entrées sont écrites dans la transaction de la modification : elles
+    n'existent que si celle-ci est validée.
+    """
+    resource = model_version_name(model)
+    transaction_id = _current_transaction_id(connections[router.db_for_write(ChangeLog)])
+    ChangeLog.objects.bulk_create(
+        [ChangeLog(transaction_id=transaction_id, resource=resource, object_id=object_id, action=action)
+         for object_id in object_ids],
+        batch_size=1000,
+    )
+
+
+def sync_horizon(using: Optional[str] = None) -> Optional[int]:
+    """
+    Plus petit identifiant de transaction encore en cours (PostgreSQL) :
+    les entrées de transactions antérieures sont toutes validées ou
+    annulées, aucune ne peut plus apparaître sous ce seuil. ``None`` sur les
+    autres bases, où les entrées sont validées dans l'ordre.
+    """
+    connection = connections[using or router.db_for_read(ChangeLog)]
+    if connection.vendor != 'postgresql':
+        return None
+    with connection.cursor() as cursor:
+        cursor.execute('SELECT pg_snapshot_xmin(pg_current_snapshot())::text::bigint')
+        return cursor.fetchone()[0]
+
+
+def compact_changelog() -> int:
+    """
+    Supprime les entrées suivies d'une entrée plus récente sur le même
+    objet : seule la dernière action compte pour la synchronisation, le
+    journal ne garde donc qu'une entrée par objet. Renvoie le nombre
+    d'entrées supprimées.
+    """
+    newer = ChangeLog.objects.filter(
+        Q(transaction_id__gt=OuterRef('transaction_id'))
+        | Q(transaction_id=OuterRef('transaction_id'), id__gt=OuterRef('id')),
+        resource=OuterRef('resource'), object_id=OuterRef('object_id'),
+    )
+    deleted, _ = ChangeLog.objects.filter(Exists(newer)).delete()
+    return deleted
@@ -0,0 +1,108 @@
+import asyncio
+from datetime import timedelta
+from decimal import Decimal
+from typing import Any, Awaitable, Dict
+
+from django.db.models import Count, DecimalField, ExpressionWrapper, F, Q, Sum
+from django.db.models.functions import TruncMonth
+from django.utils import timezone
+
+from .models import Article, HistoriqueMouvement, MouvementMateriel
+
+RECENT_HISTORY_LIMIT = 10
+REPORT_MONTHS = 12
+# Valeurs monétaires rendues avec deux décimales, quelle que soit la base
+CENTS = Decimal('0.01')
+
+
+async def gather(queries: Dict[str, Awaitable[Any]]) -> Dict[str, Any]:
+    """Attend les requêtes ``queries`` (ORM asynchrone) : ``{nom: résultat}``."""
+    results = await asyncio.gather(*queries.values())
+    return dict(zip(queries, results))
+
+
+async def stock_totals() -> Dict[str, Any]:
+    return await Article.objects.aaggregate(
+        articles=Count('id'),
+        sous_seuil=Count('id', filter=Q(quantite_stock__lte=F('seuil_alerte'))),
+        en_rupture=Count('id', filter=Q(quantite_stock=0)),
+    )
+
+
+async def stock_value():
+    """Valeur du stock (prix × quantité) par devise, à deux décimales."""
+    valeur = ExpressionWrapper(
+        F('prix') * F('quantite_stock'), output_field=DecimalField(max_digits=20, decimal_places=2)
+    )
+    rows = (Article.objects.filter(prix__isnull=False).order_by('devise')
+            .values('devise').annotate(valeur=Sum(valeur)))
+    # SQLite rend Decimal('3') pour 3.00 : échelle fixée ici
+    return [{**row, 'valeur': row['valeur'].quantize(CENTS)} async for row in rows]
+
+
+async def open_loans() -> Dict[str, Any]:
+    """Prêts validés non encore retournés, dont ceux en retard."""
+    return await MouvementMateriel.objects.filter(
+        type_mouvement=MouvementMateriel.TYPE_SORTIE_PRET,
+        statut=MouvementMateriel.STATUT_VALIDE,
+        date_retour_effective__isnull=True,
+    ).aaggregate(
+        en_cours=Count('id'),
+        en_retard=Count('id', filter=Q(date_retour_prevue__lt=timezone.now())),
+    )
+
+
+async def draft_count() -> int:
+    return await MouvementMateriel.objects.filter(statut=MouvementMateriel.STATUT_BROUILLON).acount()
+
+
+async def recent_history(limit: int = RECENT_HISTORY_LIMIT):
+    rows = HistoriqueMouvement.objects.order_by('-date_action').values(
+        'id', 'type_action', 'date_action', 'details',
+        numero_bmm=F('mouvement__numero_bmm'),
+        utilisateur_email=F('utilisateur__email'),
+    )[:limit]
+    return [row async for row in rows]
+
+
+async def stock_by_location():
+    """Nombre d'articles (et sous le seuil) par stock."""
+    rows = Article.objects.order_by('stock__site__nom', 'stock__nom').values(
+        'stock_id', stock_nom=F('stock__nom'), site=F('stock__site__nom'),
+    ).annotate(
+        articles=Count('id'),
+        sous_seuil=Count('id', filter=Q(quantite_stock__lte=F('seuil_alerte'))),
+    )
+    return [row async for row in rows]
+
+
+async def monthly_movements(months: int = REPORT_MONTHS):
+    """Mouvements validés par mois et par type sur les ``months`` derniers mois."""
+    since = timezone.now() - timedelta(days=31 * months)
+    rows = (
+        MouvementMateriel.objects.filter(
+            statut=MouvementMateriel.STATUT_VALIDE, date_validation__gte=since
+        ).annotate(mois=TruncMonth('date_validation'))
+        .order_by('mois', 'type_mouvement')
+        .values('mois', 'type_mouvement').annotate(total=Count('id'))
+    )
+    return [row async for row in rows]
+
+
+async def get_dashboard() -> Dict[str, Any]:
+    """Indicateurs du tableau de bord."""
+    return await gather({
+        'stock': stock_totals(),
+        'valeur_stock': stock_value(),
+        'prets': open_loans(),
+        'brouillons': draft_count(),
+        'historique': recent_history(),
+    })
+
+
+async def get_stock_report() -> Dict[str, Any]:
+    """Rapport de stock et d'activité."""
+    return await gather({
+        'stocks': stock_by_location(),
+        'mouvements_par_mois': monthly_movements(),
+    })
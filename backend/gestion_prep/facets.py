@@ -0,0 +1,122 @@
+import hashlib
+import json
+from typing import Any, Dict, Optional
+
+from django.core.cache import cache
+from django.db.models import BooleanField, Count, ExpressionWrapper, F, Q
+
+from .models import Article, CategorieArticle, Site, Stock
+from .versions import get_versions, model_version_name
+
+# Bloc de facettes recalculé au plus toutes les 30 s pour une même recherche
+FACET_CACHE_TIMEOUT = 30
+
+# Facette -> (colonne de regroupement, colonne du libellé)
+ARTICLE_FACETS = {
+    'categorie': ('categorie_article_id', 'categorie_article__nom'),
+    'stock': ('stock_id', 'stock__nom'),
+    'site': ('stock__site_id', 'stock__site__nom'),
+    'type_stock': ('stock__type_stock', None),
+    'sous_seuil': ('sous_seuil', None),
+}
+FACET_LABELS = {
+    'type_stock': dict(Stock.TYPE_STOCK_CHOICES),
+    'sous_seuil': {True: 'Sous le seuil d\'alerte', False: 'Au-dessus du seuil d\'alerte'},
+}
+FACET_MODELS = [Article, Stock, CategorieArticle, Site]
+
+
+def search_articles(search: Optional[str] = None, queryset=None):
+    """Articles dont le code ou la description contient ``search``."""
+    if queryset is None:
+        queryset = Article.objects.all()
+    if search:
+        queryset = queryset.filter(Q(code_article__icontains=search) | Q(description__icontains=search))
+    return queryset
+
+
+def filter_articles(queryset, filters: Dict[str, Any]):
+    """
+    Applique les filtres de facettes : ``{facette: valeurs acceptées}``.
+
+    Les valeurs d'une même facette se combinent en OU, les facettes en ET.
+    """
+    for name, values in filters.items():
+        if not values:
+            continue
+        if name == 'sous_seuil':
+            condition = Q()
+            if True in values:
+                condition |= Q(quantite_stock__lte=F('seuil_alerte'))
+            if False in values:
+                condition |= Q(quantite_stock__gt=F('seuil_alerte'))
+            queryset = queryset.filter(condition)
+        else:
+            queryset = queryset.filter(**{f'{ARTICLE_FACETS[name][0]}__in': values})
+    return queryset
+
+
+def build_article_facets(search: Optional[str], filters: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Nombres d'articles par catégorie, stock, site, type de stock et seuil.
+
+    Une seule requête groupée sur toutes les dimensions à la fois ; chaque
+    facette est ensuite agrégée en mémoire en ignorant son propre filtre,
+    pour que les autres valeurs restent sélectionnables.
+    """
+    columns = [column for column, label in ARTICLE_FACETS.values() if column != 'sous_seuil']
+    columns += [label for column, label in ARTICLE_FACETS.values() if label]
+    rows = (
+        search_articles(search).order_by()
+        .values(*columns, sous_seuil=ExpressionWrapper(
+            Q(quantite_stock__lte=F('seuil_alerte')), output_field=BooleanField()
+        ))
+        .annotate(total=Count('id'))
+    )
+
+    def matches(row, skip=None):
+        return all(
+            not values or row[ARTICLE_FACETS[name][0]] in values
+            for name, values in filters.items() if name != skip
+        )
+
+    facets = {name: {} for name in ARTICLE_FACETS}
+    total = 0
+    for row in rows:
+        if matches(row):
+            total += row['total']
+        for name, (column, label) in ARTICLE_FACETS.items():
+            if not matches(row, skip=name):
+                continue
+            value = row[column]
+            if value not in facets[name]:
+                facets[name][value] = {
+                    'value': value,
+                    'label': row[label] if label else FACET_LABELS[name].get(value, value),
+                    'count': 0,
+                }
+            facets[name][value]['count'] += row['total']
+
+    result = {
+        name: sorted(buckets.values(), key=lambda bucket: (-bucket['count'], str(bucket['label'])))
+        for name, buckets in facets.items()
+    }
+    result['total'] = total
+    return result
+
+
+def get_article_facets(search: Optional[str], filters: Dict[str, Any]) -> Dict[str, Any]:
+    """Version mise en cache de :func:`build_article_facets`."""
+    versions = get_versions(model_version_name(model) for model in FACET_MODELS)
+    query = json.dumps(
+        [search or '', {name: sorted(values, key=str) for name, values in sorted(filters.items())}]
+    )
+    key = 'gestion_prep:facets:{}:{}'.format(
+        '-'.join(str(versions[name]) for name in sorted(versions)),
+        hashlib.sha1(query.encode()).hexdigest(),
+    )
+    facets = cache.get(key)
+    if facets is None:
+        facets = build_article_facets(search, filters)
+        cache.set(key, facets, FACET_CACHE_TIMEOUT)
+    return facets
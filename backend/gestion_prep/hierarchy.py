@@ -0,0 +1,115 @@
+from typing import Any, Dict, List, Optional
+
+from django.core.cache import cache
+from django.db.models import Count
+
+from .models import Site, Unite, Train, Equipement, Document, Platinage
+from .versions import get_versions, model_version_name
+
+HIERARCHY_CACHE_TIMEOUT = 60 * 60
+
+# (type de nœud, modèle, champ parent, clé des enfants, champs exportés)
+LEVELS = [
+    ('site', Site, None, 'unites', ['id', 'nom', 'description']),
+    ('unite', Unite, 'site', 'trains', ['id', 'nom', 'description']),
+    ('train', Train, 'unite', 'equipements', ['id', 'nom', 'description']),
+    ('equipement', Equipement, 'train', None, ['id', 'tag', 'description']),
+]
+NODE_TYPES = [level[0] for level in LEVELS]
+
+# Toute modification de ces modèles invalide l'arborescence en cache
+HIERARCHY_MODELS = [Site, Unite, Train, Equipement, Document, Platinage]
+
+
+class HierarchyNodeNotFound(Exception):
+    """Le nœud racine demandé n'existe pas."""
+
+
+def _lookup_to(level_index: int, root_index: int) -> str:
+    """Chemin ORM depuis le niveau ``level_index`` jusqu'au niveau racine."""
+    parts = [LEVELS[i][2] for i in range(level_index, root_index, -1)]
+    return '__'.join(parts + ['id']) if parts else 'id'
+
+
+def _counts(model, root_index: int, root_id: Optional[int]) -> Dict[int, int]:
+    """Nombre d'objets ``model`` par équipement, limité au sous-arbre."""
+    queryset = model.objects.filter(equipement__isnull=False)
+    if root_id is not None:
+        lookup = _lookup_to(len(LEVELS) - 1, root_index)
+        queryset = queryset.filter(**{f'equipement__{lookup}': root_id})
+    rows = queryset.order_by().values('equipement_id').annotate(total=Count('id'))
+    return {row['equipement_id']: row['total'] for row in rows}
+
+
+def build_hierarchy(root_type: Optional[str] = None, root_id: Optional[int] = None,
+                    with_counts: bool = False) -> Any:
+    """
+    Construit l'arborescence Site → Unité → Train → Équipement.
+
+    Une requête plate par niveau (plus deux agrégats si ``with_counts``),
+    assemblées en mémoire. Sans racine, renvoie la liste des sites ; avec
+    une racine, renvoie le nœud correspondant et tout son sous-arbre.
+    """
+    root_index = NODE_TYPES.index(root_type) if root_type else 0
+
+    levels: List[List[Dict[str, Any]]] = []
+    for index in range(root_index, len(LEVELS)):
+        node_type, model, parent_field, children_key, fields = LEVELS[index]
+        columns = list(fields)
+        if parent_field and index > root_index:
+            columns.append(f'{parent_field}_id')
+        queryset = model.objects.order_by(fields[1]).values(*columns)
+        if root_id is not None:
+            queryset = queryset.filter(**{_lookup_to(index, root_index): root_id})
+        rows = list(queryset)
+        for row in rows:
+            row['type'] = node_type
+            if children_key:
+                row[children_key] = []
+        levels.append(rows)
+
+    if root_id is not None and not levels[0]:
+        raise HierarchyNodeNotFound(f'{root_type} {root_id}')
+
+    if with_counts:
+        documents = _counts(Document, root_index, root_id)
+        platinages = _counts(Platinage, root_index, root_id)
+        for node in levels[-1]:
+            node['documents'] = documents.get(node['id'], 0)
+            node['platinages'] = platinages.get(node['id'], 0)
+
+    # Rattacher chaque niveau à son parent, des feuilles vers la racine
+    for depth in range(len(levels) - 1, 0, -1):
+        index = root_index + depth
+        parent_field = LEVELS[index][2]
+        parent_children_key = LEVELS[index - 1][3]
+        parents = {node['id']: node for node in levels[depth - 1]}
+        if with_counts:
+            for parent in parents.values():
+                parent['documents'] = 0
+                parent['platinages'] = 0
+        for node in levels[depth]:
+            parent = parents[node.pop(f'{parent_field}_id')]
+            parent[parent_children_key].append(node)
+            if with_counts:
+                parent['documents'] += node['documents']
+                parent['platinages'] += node['platinages']
+
+    if root_id is not None:
+        return levels[0][0]
+    return levels[0]
+
+
+def get_hierarchy(root_type: Optional[str] = None, root_id: Optional[int] = None,
+                  with_counts: bool = False) -> Any:
+    """Version mise en cache de :func:`build_hierarchy`."""
+    versions = get_versions(model_version_name(model) for model in HIERARCHY_MODELS)
+    key = 'gestion_prep:hierarchy:{}:{}:{}:{}'.format(
+        '-'.join(str(versions[name]) for name in sorted(versions)),
+        root_type or 'all', root_id or '', int(with_counts)
+    )
+    tree = cache.get(key)
+    if tree is None:
+        tree = build_hierarchy(root_type, root_id, with_counts)
+        cache.set(key, tree, HIERARCHY_CACHE_TIMEOUT)
+    return tree
@@ -0,0 +1,81 @@
+import time
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from gestion_prep.api.fastpath import compile_row_encoder
+from gestion_prep.api.serializers import ArticleSerializer
+from gestion_prep.models import Article, CategorieArticle, Site, Stock
+
+
+class Command(BaseCommand):
+    help = (
+        'Compare la sérialisation des articles par ArticleSerializer et par le chemin '
+        'rapide values() + encodeur précompilé. Les articles de test sont créés dans '
+        'une transaction annulée en fin de mesure.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=5000,
+                            help="Nombre d'articles générés (défaut : 5000)")
+        parser.add_argument('--repeat', type=int, default=5,
+                            help='Nombre de mesures retenues pour chaque chemin (défaut : 5)')
+
+    def handle(self, *args, **options):
+        rows = options['rows']
+        repeat = options['repeat']
+        if rows < 1 or repeat < 1:
+            raise CommandError('--rows et --repeat doivent être positifs')
+
+        with transaction.atomic():
+            self.create_articles(rows)
+            queryset = Article.objects.order_by('id')
+            encoder = compile_row_encoder(ArticleSerializer())
+
+            def serializer_path():
+                return ArticleSerializer(queryset.all(), many=True).data
+
+            def values_path():
+                return [encoder(row) for row in queryset.values(*encoder.columns)]
+
+            if [dict(row) for row in serializer_path()] != values_path():
+                raise CommandError('Le chemin rapide ne produit pas la même sortie que le serializer')
+
+            slow = self.measure(serializer_path, repeat)
+            fast = self.measure(values_path, repeat)
+            transaction.set_rollback(True)
+
+        count = Article.objects.count() + rows
+        self.stdout.write(f'ArticleSerializer : {slow * 1000:.1f} ms ({count / slow:.0f} lignes/s)')
+        self.stdout.write(f'values() + encodeur : {fast * 1000:.1f} ms ({count / fast:.0f} lignes/s)')
+        self.stdout.write(self.style.SUCCESS(f'Accélération : x{slow / fast:.1f} sur {count} articles'))
+
+    def create_articles(self, rows):
+        site = Site.objects.create(nom='Benchmark')
+        stock = Stock.objects.create(nom='Benchmark', emplacement='BENCH', site=site)
+        categorie = CategorieArticle.objects.create(nom='Benchmark')
+        Article.objects.bulk_create([
+            Article(
+                code_article=f'BENCH-{i:06d}',
+                description=f'Article de mesure {i}',
+                prix=Decimal(i % 1000) + Decimal('0.25'),
+                devise='EUR',
+                stock=stock,
+                categorie_article=categorie,
+                unite_mesure='U',
+                quantite_initiale=Decimal(i % 50),
+                quantite_stock=Decimal(i % 50),
+                seuil_alerte=Decimal('5'),
+            )
+            for i in range(rows)
+        ], batch_size=1000)
+
+    def measure(self, func, repeat):
+        """Meilleur temps sur ``repeat`` exécutions."""
+        best = None
+        for _ in range(repeat):
+            started = time.perf_counter()
+            func()
+            elapsed = time.perf_counter() - started
+            best = elapsed if best is None else min(best, elapsed)
+        return best
@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+from gestion_prep.changelog import compact_changelog
+
+
+class Command(BaseCommand):
+    help = ("Ne garde que la dernière entrée du journal des modifications par objet. "
+            "À planifier (cron).")
+
+    def handle(self, *args, **options):
+        count = compact_changelog()
+        self.stdout.write(self.style.SUCCESS(f'{count} entrée(s) du journal supprimée(s)'))
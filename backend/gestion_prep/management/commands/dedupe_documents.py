@@ -0,0 +1,31 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from gestion_prep.models import Document
+from gestion_prep.storage import BLOB_DIR, release_blob
+
+
+class Command(BaseCommand):
+    help = (
+        'Range les fichiers des documents existants (documents/articles/…, '
+        'documents/equipements/…) dans le stockage adressé par le contenu : '
+        'les doublons ne sont plus conservés qu\'une fois.'
+    )
+
+    def handle(self, *args, **options):
+        storage = Document._meta.get_field('fichier').storage
+        moved = missing = 0
+        legacy = Document.objects.exclude(fichier__startswith=f'{BLOB_DIR}/').order_by('id')
+        for document in legacy.iterator(chunk_size=200):
+            old_name = document.fichier.name
+            if not old_name or not storage.exists(old_name):
+                missing += 1
+                continue
+            with transaction.atomic(), storage.open(old_name) as content:
+                new_name = storage.save(old_name, content)
+                Document.objects.filter(pk=document.pk).update(fichier=new_name)
+                release_blob(old_name)
+            moved += 1
+
+        self.stdout.write(self.style.SUCCESS(
+            f'{moved} document(s) rangé(s) par contenu, {missing} fichier(s) introuvable(s)'
+        ))
@@ -0,0 +1,38 @@
+from concurrent.futures import as_completed
+
+from django.core.management.base import BaseCommand
+from gestion_prep.models import Document
+from gestion_prep.previews import PREVIEW_KINDS, available_previews, render_in_pool, supports_previews
+
+
+class Command(BaseCommand):
+    help = (
+        'Génère les vignettes et aperçus manquants des documents existants, '
+        'dans le pool de processus des aperçus.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--force', action='store_true',
+                            help='Régénère aussi les aperçus existants')
+
+    def handle(self, *args, **options):
+        names = (
+            Document.objects.exclude(fichier='').order_by('fichier')
+            .values_list('fichier', flat=True).distinct()
+        )
+        futures = {
+            render_in_pool(name): name for name in names.iterator()
+            if supports_previews(name)
+            and (options['force'] or len(available_previews(name)) < len(PREVIEW_KINDS))
+        }
+
+        done = failed = 0
+        for future in as_completed(futures):
+            try:
+                future.result()
+                done += 1
+            except Exception as e:
+                failed += 1
+                self.stderr.write(f'{futures[future]} : {e}')
+
+        self.stdout.write(self.style.SUCCESS(f'Aperçus générés pour {done} fichier(s), {failed} échec(s)'))
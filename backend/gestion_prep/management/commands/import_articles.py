@@ -0,0 +1,214 @@
+import csv
+import time
+from decimal import Decimal, InvalidOperation
+from pathlib import Path
+
+from django.core.exceptions import ValidationError
+from django.core.management.base import BaseCommand, CommandError
+from gestion_prep.bulk import upsert_articles
+from gestion_prep.models import Article, Stock, CategorieArticle
+
+DEVISES = {code for code, _ in Article._meta.get_field('devise').choices}
+REQUIRED = object()
+
+
+class RowError(Exception):
+    pass
+
+
+class Command(BaseCommand):
+    help = (
+        'Importe des articles et leur stock d\'ouverture depuis un fichier CSV ou XLSX. '
+        'Colonnes : code_article, description, specification, prix, devise, stock, '
+        'type_stock, emplacement, categorie, unite_mesure, quantite_initiale, quantite_stock, '
+        'seuil_alerte'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('fichier', help='Fichier .csv ou .xlsx')
+        parser.add_argument('--chunk-size', type=int, default=1000,
+                            help='Nombre de lignes écrites par lot (défaut : 1000)')
+        parser.add_argument('--start-row', type=int, default=1,
+                            help='Première ligne de données à importer, pour reprendre un import interrompu')
+        parser.add_argument('--dry-run', action='store_true',
+                            help='Valide le fichier sans rien écrire en base')
+        parser.add_argument('--delimiter', default=',', help='Séparateur CSV (défaut : ",")')
+        parser.add_argument('--sheet', help='Feuille XLSX à lire (défaut : la première)')
+
+    def handle(self, *args, **options):
+        path = Path(options['fichier'])
+        if not path.exists():
+            raise CommandError(f'Fichier introuvable : {path}')
+        chunk_size = options['chunk_size']
+        if chunk_size < 1:
+            raise CommandError('--chunk-size doit être positif')
+
+        self.stocks = self.load_stocks()
+        self.categories = dict(CategorieArticle.objects.values_list('nom', 'id'))
+
+        start_row = options['start_row']
+        dry_run = options['dry_run']
+        started = time.monotonic()
+        chunk = {}
+        chunk_start = start_row
+        imported = skipped = errors = 0
+        last_row = start_row - 1
+
+        for row_number, row in self.read_rows(path, options):
+            if row_number < start_row:
+                skipped += 1
+                continue
+            last_row = row_number
+            try:
+                article = self.build_article(row)
+            except RowError as e:
+                errors += 1
+                self.stderr.write(f'Ligne {row_number} ignorée : {e}')
+                continue
+            # Dernière occurrence gagnante : un même lot ne peut viser deux fois la même clé
+            chunk[(article.code_article, article.stock_id)] = article
+
+            if len(chunk) >= chunk_size:
+                imported += self.flush(chunk, dry_run)
+                self.report(chunk_start, row_number, imported, started)
+                chunk = {}
+                chunk_start = row_number + 1
+
+        if chunk:
+            imported += self.flush(chunk, dry_run)
+            self.report(chunk_start, last_row, imported, started)
+
+        elapsed = max(time.monotonic() - started, 1e-6)
+        verb = 'validés' if dry_run else 'importés'
+        self.stdout.write(self.style.SUCCESS(
+            f'{imported} articles {verb} en {elapsed:.1f} s ({imported / elapsed:.0f} lignes/s), '
+            f'{errors} lignes en erreur, {skipped} lignes sautées'
+        ))
+
+    def load_stocks(self):
+        """
+        Index des stocks par (nom, type_stock, emplacement), la clé unique, et
+        par les préfixes (nom, emplacement) et (nom,) lorsque les colonnes
+        type_stock et emplacement sont omises : ``None`` si plusieurs stocks
+        y correspondent.
+        """
+        stocks = {}
+        for stock_id, nom, type_stock, emplacement in Stock.objects.values_list(
+                'id', 'nom', 'type_stock', 'emplacement'):
+            stocks[(nom, type_stock, emplacement)] = stock_id
+            for key in ((nom, None, emplacement), (nom, None, None)):
+                stocks[key] = None if key in stocks else stock_id
+        return stocks
+
+    def read_rows(self, path, options):
+        """Itère sur (numéro de ligne de données, dict) sans charger tout le fichier."""
+        if path.suffix.lower() == '.xlsx':
+            yield from self.read_xlsx(path, options.get('sheet'))
+            return
+        with path.open(newline='', encoding='utf-8-sig') as f:
+            reader = csv.DictReader(f, delimiter=options['delimiter'])
+            for row_number, row in enumerate(reader, start=1):
+                yield row_number, row
+
+    def read_xlsx(self, path, sheet):
+        try:
+            from openpyxl import load_workbook
+        except ImportError:
+            raise CommandError('La lecture des fichiers XLSX nécessite le paquet openpyxl')
+        workbook = load_workbook(path, read_only=True, data_only=True)
+        try:
+            worksheet = workbook[sheet] if sheet else workbook.worksheets[0]
+            rows = worksheet.iter_rows(values_only=True)
+            header = [str(cell).strip() if cell is not None else '' for cell in next(rows, [])]
+            for row_number, values in enumerate(rows, start=1):
+                yield row_number, {
+                    column: '' if value is None else str(value)
+                    for column, value in zip(header, values)
+                }
+        finally:
+            workbook.close()
+
+    def build_article(self, row):
+        def text(column):
+            return (row.get(column) or '').strip()
+
+        def required(column):
+            value = text(column)
+            if not value:
+                raise RowError(f'{column} est obligatoire')
+            return value
+
+        def decimal(column, default=REQUIRED):
+            value = text(column).replace(',', '.')
+            if not value:
+                if default is REQUIRED:
+                    raise RowError(f'{column} est obligatoire')
+                return default
+            try:
+                number = Decimal(value)
+            except InvalidOperation:
+                raise RowError(f'{column} invalide : {value!r}')
+            if not number.is_finite():
+                raise RowError(f'{column} invalide : {value!r}')
+            if number < 0:
+                raise RowError(f'{column} ne peut pas être négatif')
+            return number
+
+        code_article = required('code_article')
+        stock_name = text('stock')
+        stock_key = (stock_name, text('type_stock').upper() or None, text('emplacement') or None)
+        if stock_key[1] and not stock_key[2]:
+            raise RowError('l\'emplacement est obligatoire lorsque type_stock est précisé')
+        stock_id = self.stocks.get(stock_key)
+        if stock_id is None and stock_key in self.stocks:
+            raise RowError(f'stock {stock_name!r} ambigu, préciser l\'emplacement et type_stock')
+        if stock_id is None:
+            raise RowError(f'stock {stock_name!r} introuvable')
+
+        categorie = text('categorie') or text('categorie_article')
+        categorie_id = self.categories.get(categorie)
+        if categorie_id is None:
+            raise RowError(f'catégorie {categorie!r} introuvable')
+
+        prix = decimal('prix', default=None)
+        devise = text('devise').upper() or None
+        if prix is not None and not devise:
+            raise RowError('la devise est obligatoire lorsqu\'un prix est spécifié')
+        if devise and devise not in DEVISES:
+            raise RowError(f'devise {devise!r} inconnue')
+
+        quantite_initiale = decimal('quantite_initiale')
+        article = Article(
+            code_article=code_article,
+            description=required('description'),
+            specification=text('specification') or None,
+            prix=prix,
+            devise=devise,
+            stock_id=stock_id,
+            categorie_article_id=categorie_id,
+            unite_mesure=required('unite_mesure'),
+            quantite_initiale=quantite_initiale,
+            quantite_stock=decimal('quantite_stock', default=quantite_initiale),
+            seuil_alerte=decimal('seuil_alerte', default=Decimal('0')),
+        )
+        try:
+            # Longueurs, chiffres et décimales des colonnes ; les clés
+            # étrangères viennent des index chargés au départ
+            article.clean_fields(exclude=['stock', 'categorie_article'])
+        except ValidationError as e:
+            raise RowError(' ; '.join(
+                f'{field} : {" ".join(messages)}' for field, messages in e.message_dict.items()
+            ))
+        return article
+
+    def flush(self, chunk, dry_run):
+        if not dry_run:
+            upsert_articles(list(chunk.values()), batch_size=len(chunk))
+        return len(chunk)
+
+    def report(self, first_row, last_row, imported, started):
+        elapsed = max(time.monotonic() - started, 1e-6)
+        self.stdout.write(
+            f'Lignes {first_row}-{last_row} traitées, {imported} articles '
+            f'({imported / elapsed:.0f} lignes/s) ; reprise : --start-row {last_row + 1}'
+        )
@@ -0,0 +1,10 @@
+from django.core.management.base import BaseCommand
+from gestion_prep.uploads import prune_expired
+
+
+class Command(BaseCommand):
+    help = 'Supprime les envois par morceaux expirés et leurs fichiers partiels. À planifier (cron).'
+
+    def handle(self, *args, **options):
+        count = prune_expired()
+        self.stdout.write(self.style.SUCCESS(f'{count} envoi(s) abandonné(s) supprimé(s)'))
@@ -0,0 +1,29 @@
+from django.core.management.base import BaseCommand, CommandError
+
+
+class Command(BaseCommand):
+    help = (
+        'Lance l\'application ASGI (config.asgi) avec uvicorn, pour servir les vues '
+        'asynchrones (tableau de bord, rapports) sans thread par requête.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--host', default='127.0.0.1', help='Adresse d\'écoute (défaut : 127.0.0.1)')
+        parser.add_argument('--port', type=int, default=8000, help='Port d\'écoute (défaut : 8000)')
+        parser.add_argument('--workers', type=int, default=1, help='Nombre de processus (défaut : 1)')
+        parser.add_argument('--reload', action='store_true',
+                            help='Redémarre à chaque modification du code (développement)')
+
+    def handle(self, *args, **options):
+        try:
+            import uvicorn
+        except ImportError:
+            raise CommandError('runasgi nécessite le paquet uvicorn (requirements/production.txt)')
+        uvicorn.run(
+            'config.asgi:application',
+            host=options['host'],
+            port=options['port'],
+            workers=options['workers'],
+            reload=options['reload'],
+            lifespan='off',
+        )
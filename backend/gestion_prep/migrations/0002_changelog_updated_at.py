@@ -0,0 +1,86 @@
+# Generated by Django 5.2.18 on 2026-10-19 08:59
+
+from django.db import migrations, models
+
+# Parents avant enfants, comme gestion_prep.changelog.SYNCED_MODELS
+SYNCED_MODELS = ['site', 'unite', 'train', 'equipement', 'categoriearticle', 'stock', 'article', 'typeplatinage']
+
+
+def backfill_changelog(apps, schema_editor):
+    """Journalise les lignes existantes : une synchronisation depuis 0 les reçoit."""
+    ChangeLog = apps.get_model('gestion_prep', 'ChangeLog')
+    for model_name in SYNCED_MODELS:
+        model = apps.get_model('gestion_prep', model_name)
+        entries = []
+        for object_id in model.objects.order_by('pk').values_list('pk', flat=True).iterator(chunk_size=2000):
+            entries.append(ChangeLog(resource=f'gestion_prep.{model_name}', object_id=object_id, action='upsert'))
+            if len(entries) >= 2000:
+                ChangeLog.objects.bulk_create(entries)
+                entries = []
+        ChangeLog.objects.bulk_create(entries)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('gestion_prep', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ChangeLog',
+            fields=[
+                ('id', models.BigAutoField(primary_key=True, serialize=False)),
+                ('resource', models.CharField(max_length=100)),
+                ('object_id', models.BigIntegerField()),
+                ('action', models.CharField(choices=[('upsert', 'Création ou modification'), ('delete', 'Suppression')], max_length=10)),
+                ('date_action', models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                'verbose_name': 'Journal des modifications',
+                'verbose_name_plural': 'Journal des modifications',
+                'ordering': ['id'],
+            },
+        ),
+        migrations.AddField(
+            model_name='article',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True, db_index=True, verbose_name='Modifié le'),
+        ),
+        migrations.AddField(
+            model_name='categoriearticle',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True, db_index=True, verbose_name='Modifié le'),
+        ),
+        migrations.AddField(
+            model_name='equipement',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True, db_index=True, verbose_name='Modifié le'),
+        ),
+        migrations.AddField(
+            model_name='site',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True, db_index=True, verbose_name='Modifié le'),
+        ),
+        migrations.AddField(
+            model_name='stock',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True, db_index=True, verbose_name='Modifié le'),
+        ),
+        migrations.AddField(
+            model_name='train',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True, db_index=True, verbose_name='Modifié le'),
+        ),
+        migrations.AddField(
+            model_name='typeplatinage',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True, db_index=True, verbose_name='Modifié le'),
+        ),
+        migrations.AddField(
+            model_name='unite',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True, db_index=True, verbose_name='Modifié le'),
+        ),
+        migrations.RunPython(backfill_changelog, migrations.RunPython.noop),
+    ]
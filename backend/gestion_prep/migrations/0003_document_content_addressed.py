@@ -0,0 +1,35 @@
+# Generated by Django 5.2.18 on 2026-10-19 09:10
+
+import gestion_prep.models
+import gestion_prep.storage
+from django.db import migrations, models
+
+
+def fill_nom_fichier(apps, schema_editor):
+    """Nom d'origine des documents existants : dernier segment de leur chemin."""
+    Document = apps.get_model('gestion_prep', 'Document')
+    documents = list(Document.objects.only('id', 'fichier'))
+    for document in documents:
+        document.nom_fichier = document.fichier.name.split('/')[-1]
+    Document.objects.bulk_update(documents, ['nom_fichier'], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('gestion_prep', '0002_changelog_updated_at'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='document',
+            name='nom_fichier',
+            field=models.CharField(blank=True, max_length=255, verbose_name="Nom d'origine du fichier"),
+        ),
+        migrations.AlterField(
+            model_name='document',
+            name='fichier',
+            field=models.FileField(db_index=True, max_length=255, storage=gestion_prep.storage.ContentAddressedStorage(), upload_to=gestion_prep.models.document_upload_path, verbose_name='Fichier'),
+        ),
+        migrations.RunPython(fill_nom_fichier, migrations.RunPython.noop),
+    ]
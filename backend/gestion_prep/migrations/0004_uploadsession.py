@@ -0,0 +1,38 @@
+# Generated by Django 5.2.18 on 2026-10-19 09:14
+
+import django.db.models.deletion
+import uuid
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('gestion_prep', '0003_document_content_addressed'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='UploadSession',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('nom_fichier', models.CharField(max_length=255, verbose_name="Nom d'origine du fichier")),
+                ('taille', models.BigIntegerField(verbose_name='Taille (octets)')),
+                ('recu', models.BigIntegerField(default=0, verbose_name='Octets reçus')),
+                ('sha256', models.CharField(blank=True, max_length=64, verbose_name='Empreinte SHA-256 attendue')),
+                ('remarque', models.CharField(blank=True, max_length=255, null=True, verbose_name='Remarque')),
+                ('date_creation', models.DateTimeField(auto_now_add=True)),
+                ('date_expiration', models.DateTimeField(db_index=True)),
+                ('article', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='upload_sessions', to='gestion_prep.article')),
+                ('document', models.OneToOneField(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='upload_session', to='gestion_prep.document')),
+                ('equipement', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='upload_sessions', to='gestion_prep.equipement')),
+                ('uploaded_by', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='upload_sessions', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name': 'Envoi en cours',
+                'verbose_name_plural': 'Envois en cours',
+            },
+        ),
+    ]
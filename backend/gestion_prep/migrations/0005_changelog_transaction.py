@@ -0,0 +1,30 @@
+# Generated by Django 5.2.18 on 2026-10-19 09:44
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('gestion_prep', '0004_uploadsession'),
+    ]
+
+    operations = [
+        migrations.AlterModelOptions(
+            name='changelog',
+            options={'ordering': ['transaction_id', 'id'], 'verbose_name': 'Journal des modifications', 'verbose_name_plural': 'Journal des modifications'},
+        ),
+        migrations.AddField(
+            model_name='changelog',
+            name='transaction_id',
+            field=models.BigIntegerField(default=0, editable=False),
+        ),
+        migrations.AddIndex(
+            model_name='changelog',
+            index=models.Index(fields=['transaction_id', 'id'], name='changelog_sync_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='changelog',
+            index=models.Index(fields=['resource', 'object_id'], name='changelog_object_idx'),
+        ),
+    ]
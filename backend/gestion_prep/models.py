@@ -11,6 +11,10 @@ from django.db.models.fields.related_descriptors import ReverseManyToOneDescript
 from django.db.models.fields.files import FieldFile
 from django.core.validators import MinValueValidator
 from django.db import transaction
+import os
+import uuid
+
+from .storage import BLOB_DIR, content_addressed_storage, release_blob
 
 T = TypeVar('T', bound=models.Model)
 
@@ -23,7 +27,14 @@ class DjangoModel(models.Model):
     class Meta:
         abstract = True
 
-class Site(DjangoModel):
+class TrackedModel(DjangoModel):
+    """Modèle du référentiel dont les modifications sont datées et journalisées."""
+    updated_at = models.DateTimeField(auto_now=True, db_index=True, verbose_name=_('Modifié le'))
+
+    class Meta(DjangoModel.Meta):
+        abstract = True
+
+class Site(TrackedModel):
     """Model representing a site."""
     nom = models.CharField(max_length=100, unique=True)
     description = models.TextField(blank=True, null=True)
@@ -36,7 +47,7 @@ class Site(DjangoModel):
         verbose_name = _('Site')
         verbose_name_plural = _('Sites')
 
-class Unite(DjangoModel):
+class Unite(TrackedModel):
     """Model representing a unit."""
     nom = models.CharField(max_length=100)
     site = models.ForeignKey(
@@ -56,7 +67,7 @@ class Unite(DjangoModel):
         verbose_name_plural = _('Unités')
         unique_together = ['site', 'nom']
 
-class Train(DjangoModel):
+class Train(TrackedModel):
     """Model representing a train."""
     nom = models.CharField(max_length=100)
     unite = models.ForeignKey(
@@ -78,7 +89,7 @@ class Train(DjangoModel):
         verbose_name_plural = _('Trains')
         unique_together = ['unite', 'nom']
 
-class Equipement(DjangoModel):
+class Equipement(TrackedModel):
     """Model representing an equipment."""
     tag = models.CharField(max_length=100, unique=True)
     description = models.TextField()
@@ -108,7 +119,7 @@ class Equipement(DjangoModel):
         verbose_name = _('Equipement')
         verbose_name_plural = _('Equipements')
 
-class CategorieArticle(DjangoModel):
+class CategorieArticle(TrackedModel):
     """Model representing an article category."""
     nom = models.CharField(max_length=100, unique=True)
     description = models.TextField(blank=True, null=True)
@@ -121,7 +132,7 @@ class CategorieArticle(DjangoModel):
         verbose_name_plural = _('Catégories d\'articles')
         ordering = ['nom']
 
-class Stock(DjangoModel):
+class Stock(TrackedModel):
     """Model representing a stock."""
     TYPE_STOCK_CHOICES = [
         ('MAGASIN', 'Magasin'),
@@ -151,7 +162,7 @@ class Stock(DjangoModel):
         verbose_name_plural = _('Stocks')
         unique_together = ['nom', 'type_stock', 'emplacement']
 
-class Article(DjangoModel):
+class Article(TrackedModel):
     """Model representing an article."""
     code_article = models.CharField(max_length=100)
     description = models.TextField()
@@ -255,7 +266,7 @@ class Phase(DjangoModel):
         verbose_name = _('Phase')
         verbose_name_plural = _('Phases')
 
-class TypePlatinage(DjangoModel):
+class TypePlatinage(TrackedModel):
     """Model representing a plating type."""
     nom = models.CharField(max_length=100, unique=True)
     description = models.TextField(blank=True, null=True)
@@ -457,7 +468,7 @@ class MouvementMateriel(models.Model):
                         
                         # Ensuite mettre à jour le stock de l'article
                         article.quantite_stock = nouveau_stock
-                        article.save(update_fields=['quantite_stock'])
+                        article.save(update_fields=['quantite_stock', 'updated_at'])
                         
                         # Vérifier que la mise à jour a bien été effectuée
                         article.refresh_from_db()
@@ -743,7 +754,16 @@ class Document(models.Model):
     """Model representing a document."""
     fichier = models.FileField(
         verbose_name='Fichier',
-        upload_to=document_upload_path  # type: ignore
+        upload_to=document_upload_path,  # type: ignore
+        # Fichiers rangés sous l'empreinte de leur contenu et partagés entre documents
+        storage=content_addressed_storage,
+        max_length=255,
+        db_index=True,
+    )
+    nom_fichier = models.CharField(
+        max_length=255,
+        blank=True,
+        verbose_name=_("Nom d'origine du fichier")
     )
     remarque = models.CharField(
         max_length=255,
@@ -779,7 +799,7 @@ class Document(models.Model):
         verbose_name_plural = _('Documents')
 
     def __str__(self) -> str:
-        filename = self.fichier.name.split('/')[-1]  # Get only the filename without path
+        filename = self.filename
         if self.article:
             return f"{filename} - {self.article.code_article}"
         elif self.equipement:
@@ -802,34 +822,71 @@ class Document(models.Model):
         """Set the uploaded_by field with type safety."""
         self.uploaded_by = user
 
-    def delete(self, *args, **kwargs):
-        if self.fichier:
-            storage = self.fichier.storage
-            file_path = self.fichier.path
-            
-            # Delete the model instance
-            super().delete(*args, **kwargs)
-            
-            # Delete the file after the model instance is deleted
-            if storage.exists(file_path):
-                storage.delete(file_path)
-        else:
-            super().delete(*args, **kwargs)
+    @property
+    def filename(self) -> str:
+        """Nom d'origine du fichier (le nom stocké est l'empreinte du contenu)."""
+        return self.nom_fichier or self.fichier.name.split('/')[-1]
 
     def save(self, *args, **kwargs):
-        if self.pk:  # If this is an update
-            try:
-                old_instance = Document.objects.get(pk=self.pk)
-                if old_instance.fichier and old_instance.fichier != self.fichier:  # If the file has changed
-                    # Delete the old file
-                    storage = old_instance.fichier.storage
-                    file_path = old_instance.fichier.path
-                    if storage.exists(file_path):
-                        storage.delete(file_path)
-            except Document.DoesNotExist:
-                pass
-        
-        super().save(*args, **kwargs)
+        if self.fichier and not self.fichier._committed:
+            # Nouveau fichier : le nom envoyé est conservé pour l'affichage et le téléchargement
+            self.nom_fichier = os.path.basename(self.fichier.name)
+        # Le fichier est rangé (sous verrou, voir lock_blob) dans la transaction
+        # qui enregistre sa référence
+        with transaction.atomic():
+            old_name = None
+            if self.pk:  # If this is an update
+                old_name = Document.objects.filter(pk=self.pk).values_list('fichier', flat=True).first()
+
+            super().save(*args, **kwargs)
+
+            if old_name and old_name != self.fichier.name:
+                # Libère l'ancien fichier s'il n'est plus partagé
+                release_blob(old_name)
+
+class UploadSession(models.Model):
+    """
+    Envoi d'un document en plusieurs morceaux, reprenable après une coupure.
+
+    Les octets reçus sont écrits au fil de l'eau dans un fichier partiel ;
+    ``recu`` est la position à laquelle le morceau suivant est attendu. La
+    finalisation range le fichier dans le stockage adressé par le contenu et
+    crée le ``Document``.
+    """
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    nom_fichier = models.CharField(max_length=255, verbose_name=_("Nom d'origine du fichier"))
+    taille = models.BigIntegerField(verbose_name=_('Taille (octets)'))
+    recu = models.BigIntegerField(default=0, verbose_name=_('Octets reçus'))
+    sha256 = models.CharField(max_length=64, blank=True, verbose_name=_('Empreinte SHA-256 attendue'))
+    remarque = models.CharField(max_length=255, blank=True, null=True, verbose_name=_('Remarque'))
+    article = models.ForeignKey(
+        'Article', on_delete=models.CASCADE, related_name='upload_sessions', null=True, blank=True
+    )
+    equipement = models.ForeignKey(
+        'Equipement', on_delete=models.CASCADE, related_name='upload_sessions', null=True, blank=True
+    )
+    uploaded_by = models.ForeignKey(User, on_delete=models.CASCADE, related_name='upload_sessions')
+    document = models.OneToOneField(
+        Document, on_delete=models.SET_NULL, related_name='upload_session', null=True, blank=True
+    )
+    date_creation = models.DateTimeField(auto_now_add=True)
+    date_expiration = models.DateTimeField(db_index=True)
+
+    class Meta:
+        verbose_name = _('Envoi en cours')
+        verbose_name_plural = _('Envois en cours')
+
+    def __str__(self) -> str:
+        return f"{self.nom_fichier} ({self.recu}/{self.taille})"
+
+    @property
+    def part_name(self) -> str:
+        """Fichier partiel, dans le stockage des documents (même système de fichiers)."""
+        return f'{BLOB_DIR}/tmp/upload-{self.id.hex}.part'
+
+    @property
+    def termine(self) -> bool:
+        return self.document_id is not None
 
 class Platinage(DjangoModel):
     """Model representing a plating."""
@@ -905,3 +962,38 @@ class HistoriqueMouvement(DjangoModel):
         ordering = ['-date_action']
         verbose_name = _('Historique de mouvement')
         verbose_name_plural = _('Historiques de mouvement')
+
+class ChangeLog(models.Model):
+    """
+    Journal des créations, modifications et suppressions du référentiel.
+
+    Les entrées sont ordonnées par (transaction, identifiant), ce couple
+    servant de jeton de synchronisation. ``transaction_id`` est l'identifiant
+    de la transaction qui a écrit l'entrée (PostgreSQL) ; 0 sur SQLite, où
+    les écritures sont sérialisées et les identifiants validés dans l'ordre.
+    """
+    ACTION_UPSERT = 'upsert'
+    ACTION_DELETE = 'delete'
+    ACTION_CHOICES = [
+        (ACTION_UPSERT, _('Création ou modification')),
+        (ACTION_DELETE, _('Suppression')),
+    ]
+
+    id = models.BigAutoField(primary_key=True)
+    transaction_id = models.BigIntegerField(default=0, editable=False)
+    resource = models.CharField(max_length=100)
+    object_id = models.BigIntegerField()
+    action = models.CharField(max_length=10, choices=ACTION_CHOICES)
+    date_action = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self) -> str:
+        return f"{self.id} {self.action} {self.resource}#{self.object_id}"
+
+    class Meta:
+        ordering = ['transaction_id', 'id']
+        indexes = [
+            models.Index(fields=['transaction_id', 'id'], name='changelog_sync_idx'),
+            models.Index(fields=['resource', 'object_id'], name='changelog_object_idx'),
+        ]
+        verbose_name = _('Journal des modifications')
+        verbose_name_plural = _('Journal des modifications')
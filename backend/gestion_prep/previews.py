@@ -0,0 +1,146 @@
+import logging
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from functools import partial
+from typing import Dict, List, Optional
+
+from django.conf import settings
+from django.db import transaction
+
+from .rendering import SUPPORTED_EXTENSIONS, render_previews
+from .storage import BLOB_DIR, derived_name
+from .versions import bump_version, model_version_name
+
+logger = logging.getLogger(__name__)
+
+# Aperçu -> (suffixe du fichier, taille maximale)
+PREVIEW_KINDS = {
+    'thumbnail': ('.thumb.jpg', (256, 256)),
+    'preview': ('.preview.jpg', (1200, 1200)),
+}
+PREVIEW_WORKERS = getattr(settings, 'DOCUMENT_PREVIEW_WORKERS', 2)
+
+_executor: Optional[ProcessPoolExecutor] = None
+_executor_lock = threading.Lock()
+
+
+def _storage():
+    from .models import Document
+    return Document._meta.get_field('fichier').storage
+
+
+def preview_name(name: str, kind: str) -> str:
+    return derived_name(name, PREVIEW_KINDS[kind][0])
+
+
+def preview_names(name: str) -> List[str]:
+    """Noms de tous les aperçus possibles du fichier ``name``."""
+    return [preview_name(name, kind) for kind in PREVIEW_KINDS]
+
+
+def supports_previews(name: str) -> bool:
+    """Aperçus produits pour les fichiers adressés par contenu de type image ou PDF."""
+    return bool(name) and name.startswith(f'{BLOB_DIR}/') and name.lower().endswith(SUPPORTED_EXTENSIONS)
+
+
+def preview_version(name: str) -> str:
+    """Jeton de version des adresses d'aperçu : début de l'empreinte du contenu."""
+    return os.path.basename(name)[:16]
+
+
+def available_previews(name: str) -> Dict[str, str]:
+    """Aperçus déjà générés pour le fichier ``name`` : ``{type: nom}``."""
+    if not supports_previews(name):
+        return {}
+    storage = _storage()
+    names = {kind: preview_name(name, kind) for kind in PREVIEW_KINDS}
+    return {kind: preview for kind, preview in names.items() if storage.exists(preview)}
+
+
+def get_executor() -> ProcessPoolExecutor:
+    """
+    Pool de processus du rendu, créé au premier besoin dans chaque worker.
+
+    ``spawn`` : les processus ne partagent ni les connexions à la base ni
+    les threads du serveur ; ils n'importent que ``gestion_prep.rendering``.
+    """
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ProcessPoolExecutor(
+                max_workers=PREVIEW_WORKERS, mp_context=multiprocessing.get_context('spawn'),
+            )
+        return _executor
+
+
+def _reset_executor(broken: ProcessPoolExecutor) -> None:
+    """Abandonne un pool dont un processus est mort : le suivant sera recréé."""
+    global _executor
+    with _executor_lock:
+        if _executor is broken:
+            _executor = None
+    broken.shutdown(wait=False, cancel_futures=True)
+
+
+def _outputs(name: str):
+    storage = _storage()
+    return [(storage.path(preview_name(name, kind)), size) for kind, (_, size) in PREVIEW_KINDS.items()]
+
+
+def _rendered(name: str, executor: ProcessPoolExecutor, future) -> None:
+    try:
+        future.result()
+    except BrokenProcessPool:
+        logger.error("Processus de rendu arrêté pendant les aperçus de %s", name)
+        _reset_executor(executor)
+        return
+    except Exception:
+        logger.exception("Échec de la génération des aperçus de %s", name)
+        return
+    # Les réponses de l'API en cache référencent désormais les aperçus
+    from .models import Document
+    bump_version(model_version_name(Document))
+
+
+def render_in_pool(name: str):
+    """
+    Confie au pool le rendu des aperçus de ``name`` ; retourne le ``Future``.
+    Un pool inutilisable (processus tué par un plantage du rendu ou faute
+    de mémoire) est remplacé, une fois.
+    """
+    task = (render_previews, _storage().path(name), _outputs(name))
+    executor = get_executor()
+    try:
+        future = executor.submit(*task)
+    except BrokenProcessPool:
+        _reset_executor(executor)
+        executor = get_executor()
+        future = executor.submit(*task)
+    future.add_done_callback(partial(_rendered, name, executor))
+    return future
+
+
+def submit_previews(name: str):
+    """
+    Confie au pool la génération des aperçus manquants de ``name``.
+
+    N'échoue jamais : appelée après le commit d'un document, une erreur
+    ici ferait échouer un enregistrement déjà validé. Les aperçus manqués
+    sont rattrapés par ``generate_previews``.
+    """
+    if not supports_previews(name) or len(available_previews(name)) == len(PREVIEW_KINDS):
+        return None
+    try:
+        return render_in_pool(name)
+    except Exception:
+        logger.exception("Aperçus de %s non programmés", name)
+        return None
+
+
+def schedule_previews(name: str) -> None:
+    """Génère les aperçus de ``name`` en arrière-plan, une fois la transaction validée."""
+    if supports_previews(name):
+        transaction.on_commit(partial(submit_previews, name))
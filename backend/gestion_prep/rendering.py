@@ -0,0 +1,65 @@
+"""
+Rendu des vignettes et aperçus de documents.
+
+Module exécuté dans les processus du pool d'aperçus : il n'importe ni
+Django ni les modèles. Pillow et pypdfium2 sont optionnels ; sans eux,
+aucun aperçu n'est produit.
+"""
+import os
+import tempfile
+from typing import List, Tuple
+
+IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png', '.gif', '.bmp', '.tif', '.tiff', '.webp')
+PDF_EXTENSIONS = ('.pdf',)
+SUPPORTED_EXTENSIONS = IMAGE_EXTENSIONS + PDF_EXTENSIONS
+JPEG_QUALITY = 80
+
+
+def _open_first_page(source: str, max_side: int):
+    """Première page (PDF) ou image ``source``, en image Pillow RGB."""
+    from PIL import Image, ImageOps
+
+    extension = os.path.splitext(source)[1].lower()
+    if extension in PDF_EXTENSIONS:
+        import pypdfium2
+
+        pdf = pypdfium2.PdfDocument(source)
+        try:
+            page = pdf[0]
+            width, height = page.get_size()
+            # Rendu directement à la taille utile, pas à la résolution d'impression
+            image = page.render(scale=max_side / max(width, height, 1)).to_pil()
+        finally:
+            pdf.close()
+    else:
+        image = Image.open(source)
+        # Décodage JPEG réduit : évite de décompresser un scan pleine résolution
+        image.draft('RGB', (max_side, max_side))
+        image = ImageOps.exif_transpose(image)
+    return image.convert('RGB')
+
+
+def render_previews(source: str, outputs: List[Tuple[str, Tuple[int, int]]]) -> List[str]:
+    """
+    Produit les images ``outputs`` (``[(chemin, (largeur, hauteur)), ...]``,
+    JPEG) à partir de ``source``. Retourne les chemins écrits ; liste vide si
+    le type de fichier n'est pas pris en charge.
+    """
+    if os.path.splitext(source)[1].lower() not in SUPPORTED_EXTENSIONS:
+        return []
+    image = _open_first_page(source, max(max(size) for _, size in outputs))
+
+    written = []
+    for path, size in outputs:
+        rendered = image.copy()
+        rendered.thumbnail(size)
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'wb') as tmp:
+                rendered.save(tmp, 'JPEG', quality=JPEG_QUALITY, optimize=True)
+            os.replace(tmp_path, path)
+        finally:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+        written.append(path)
+    return written
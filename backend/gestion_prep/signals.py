@@ -1,40 +1,53 @@
-from django.db.models.signals import pre_delete, post_delete
+from django.db.models.signals import post_delete, post_save
 from django.dispatch import receiver
-from .models import Document, Article, Equipement
-import os
-from django.conf import settings
+from .models import (
+    Document, Article, Equipement, Site, Unite, Train, Platinage,
+    CategorieArticle, Stock, TypePlatinage
+)
+from .changelog import SYNCED_MODELS, record_changes
+from .models import ChangeLog
+from .previews import schedule_previews
+from .storage import release_blob
+from .versions import bump_version, model_version_name
 
-@receiver(pre_delete, sender=Document)
-def delete_document_files(sender, instance, **kwargs):
-    """Supprime le fichier physique associé au document avant la suppression de l'instance"""
+# Modèles dont la version sert aux ETag et aux caches de l'API
+VERSIONED_MODELS = [
+    Site, Unite, Train, Equipement, CategorieArticle, Stock, Article,
+    TypePlatinage, Document, Platinage,
+]
+
+@receiver(post_save, sender=Document)
+def generate_document_previews(sender, instance, **kwargs):
+    """Vignette et aperçu générés en arrière-plan après l'enregistrement."""
+    if instance.fichier:
+        schedule_previews(instance.fichier.name)
+
+@receiver(post_delete, sender=Document)
+def release_document_file(sender, instance, **kwargs):
+    """
+    Libère le fichier du document supprimé (directement ou en cascade avec
+    son article ou son équipement) : il n'est effacé qu'une fois plus aucun
+    document ne le référence.
+    """
     if instance.fichier:
-        file_path = os.path.join(settings.MEDIA_ROOT, str(instance.fichier))
-        if os.path.isfile(file_path):
-            try:
-                os.remove(file_path)
-            except Exception as e:
-                print(f"Erreur lors de la suppression du fichier {file_path}: {str(e)}")
-
-@receiver(pre_delete, sender=Article)
-def delete_article_files(sender, instance, **kwargs):
-    """Supprime tous les fichiers associés à l'article avant sa suppression"""
-    for document in instance.documents.all():
-        if document.fichier:
-            file_path = os.path.join(settings.MEDIA_ROOT, str(document.fichier))
-            if os.path.isfile(file_path):
-                try:
-                    os.remove(file_path)
-                except Exception as e:
-                    print(f"Erreur lors de la suppression du fichier {file_path}: {str(e)}")
-
-@receiver(pre_delete, sender=Equipement)
-def delete_equipement_files(sender, instance, **kwargs):
-    """Supprime tous les fichiers associés à l'équipement avant sa suppression"""
-    for document in instance.documents.all():
-        if document.fichier:
-            file_path = os.path.join(settings.MEDIA_ROOT, str(document.fichier))
-            if os.path.isfile(file_path):
-                try:
-                    os.remove(file_path)
-                except Exception as e:
-                    print(f"Erreur lors de la suppression du fichier {file_path}: {str(e)}")
\ No newline at end of file
+        release_blob(instance.fichier.name)
+
+def bump_model_version(sender, **kwargs):
+    """Avance la version de la ressource dès qu'une de ses lignes change"""
+    bump_version(model_version_name(sender))
+
+for model in VERSIONED_MODELS:
+    post_save.connect(bump_model_version, sender=model, dispatch_uid=f'bump_version_save_{model.__name__}')
+    post_delete.connect(bump_model_version, sender=model, dispatch_uid=f'bump_version_delete_{model.__name__}')
+
+def log_save(sender, instance, **kwargs):
+    """Journalise la création ou la modification pour la synchronisation"""
+    record_changes(sender, [instance.pk], ChangeLog.ACTION_UPSERT)
+
+def log_delete(sender, instance, **kwargs):
+    """Journalise la suppression (tombstone) pour la synchronisation"""
+    record_changes(sender, [instance.pk], ChangeLog.ACTION_DELETE)
+
+for model in SYNCED_MODELS:
+    post_save.connect(log_save, sender=model, dispatch_uid=f'changelog_save_{model.__name__}')
+    post_delete.connect(log_delete, sender=model, dispatch_uid=f'changelog_delete_{model.__name__}')
@@ -0,0 +1,146 @@
+import hashlib
+import os
+import tempfile
+from functools import partial
+
+from django.core.files.storage import FileSystemStorage
+from django.db import DEFAULT_DB_ALIAS, connections, transaction
+from django.utils.deconstruct import deconstructible
+
+BLOB_DIR = 'documents/blobs'
+HASH_CHUNK_SIZE = 64 * 1024
+
+
+def blob_name(digest: str, extension: str = '') -> str:
+    """Nom d'un contenu : ``documents/blobs/ab/cd/abcd….pdf`` (deux niveaux de répertoires)."""
+    return f'{BLOB_DIR}/{digest[:2]}/{digest[2:4]}/{digest}{extension.lower()}'
+
+
+def derived_name(name: str, suffix: str) -> str:
+    """
+    Nom d'un fichier dérivé (aperçu…) rangé à côté de ``name`` :
+    ``<empreinte>.<extension><suffix>``. L'extension est gardée : le même
+    contenu rangé sous deux extensions a des fichiers dérivés distincts.
+    """
+    return name + suffix
+
+
+@deconstructible
+class ContentAddressedStorage(FileSystemStorage):
+    """
+    Stockage adressé par le contenu : un fichier est rangé sous l'empreinte
+    SHA-256 de ses octets (extension conservée), quel que soit son nom.
+
+    Le même contenu envoyé pour plusieurs documents n'est écrit qu'une fois ;
+    les documents partagent alors le même nom de fichier. Le contenu est
+    haché au fil de l'écriture, par blocs, sans être chargé en mémoire.
+    La suppression d'un fichier partagé passe par :func:`release_blob`.
+    """
+
+    def get_available_name(self, name, max_length=None):
+        # Le nom définitif dépend du contenu : pas de suffixe aléatoire
+        return name
+
+    def _save(self, name, content):
+        extension = os.path.splitext(name)[1]
+        tmp_dir = self.path(f'{BLOB_DIR}/tmp')
+        os.makedirs(tmp_dir, exist_ok=True)
+
+        digest = hashlib.sha256()
+        fd, tmp_path = tempfile.mkstemp(dir=tmp_dir)
+        try:
+            with os.fdopen(fd, 'wb') as tmp:
+                if hasattr(content, 'seek'):
+                    content.seek(0)
+                for chunk in content.chunks(HASH_CHUNK_SIZE):
+                    digest.update(chunk)
+                    tmp.write(chunk)
+            return self.store_file(tmp_path, digest.hexdigest(), extension)
+        finally:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+
+    def store_file(self, tmp_path: str, digest: str, extension: str = '') -> str:
+        """
+        Range le fichier local ``tmp_path`` (d'empreinte ``digest``) à son
+        adresse et retourne son nom. Le fichier temporaire est consommé.
+
+        À appeler dans la transaction qui crée le document référençant le
+        fichier : le verrou pris ici empêche :func:`release_blob` de
+        l'effacer avant que cette référence soit validée.
+        """
+        name = blob_name(digest, extension)
+        lock_blob(name)
+        full_path = self.path(name)
+        os.makedirs(os.path.dirname(full_path), exist_ok=True)
+        if self.file_permissions_mode is not None:
+            os.chmod(tmp_path, self.file_permissions_mode)
+        # Remplacement atomique, même si le contenu existe déjà : le fichier
+        # reste présent pour un document en cours de création
+        os.replace(tmp_path, full_path)
+        return name
+
+
+content_addressed_storage = ContentAddressedStorage()
+
+
+def lock_blob(name: str, using=None) -> None:
+    """
+    Verrouille le fichier ``name`` jusqu'à la fin de la transaction en cours :
+    le rangement d'un contenu et la vérification qui précède son effacement
+    ne peuvent pas s'entrelacer.
+
+    PostgreSQL : verrou consultatif de transaction sur le nom. Autres bases :
+    écriture (sans effet) sur les documents de ce nom, qui prend le verrou
+    d'écriture de la base (SQLite) ou de l'entrée d'index (MySQL).
+    """
+    from .models import Document
+
+    connection = connections[using or DEFAULT_DB_ALIAS]
+    if connection.vendor == 'postgresql':
+        key = int.from_bytes(hashlib.sha256(name.encode()).digest()[:8], 'big', signed=True)
+        with connection.cursor() as cursor:
+            cursor.execute('SELECT pg_advisory_xact_lock(%s)', [key])
+    else:
+        Document.objects.using(connection.alias).filter(fichier=name).update(fichier=name)
+
+
+def _delete_if_unreferenced(name: str, using=None) -> None:
+    from .models import Document
+    from .previews import preview_names
+
+    with transaction.atomic(using=using):
+        lock_blob(name, using)
+        if Document.objects.using(using).filter(fichier=name).exists():
+            return
+        storage = Document._meta.get_field('fichier').storage
+        # Seuls les aperçus de ce fichier : le même contenu peut exister
+        # sous une autre extension, pour d'autres documents
+        for derived in [name, *preview_names(name)]:
+            if storage.exists(derived):
+                storage.delete(derived)
+
+
+def release_blob(name: str, using=None) -> None:
+    """
+    Supprime le fichier ``name`` et ses aperçus après le commit, s'il n'est
+    plus référencé par aucun document (le compte se fait sur
+    ``Document.fichier``, indexé).
+
+    Le compte et l'effacement se font sous :func:`lock_blob` : un envoi
+    concurrent du même contenu, rangé mais pas encore validé, est attendu
+    puis compté.
+    """
+    if name:
+        transaction.on_commit(partial(_delete_if_unreferenced, name, using), using=using)
+
+
+def discard_blob(name: str, using=None) -> None:
+    """
+    Supprime tout de suite le fichier ``name`` s'il n'est référencé par
+    aucun document : fichier rangé par :meth:`ContentAddressedStorage.store_file`
+    dont le document n'a pas pu être créé (transaction annulée, aucun commit
+    à attendre).
+    """
+    if name:
+        _delete_if_unreferenced(name, using)
@@ -1,3 +1,1045 @@
-from django.test import TestCase
+import gzip
+import hashlib
+import io
+import json
+import os
+import shutil
+import tempfile
+import unittest
+import uuid
+from datetime import timedelta
+from unittest import mock
 
-# Create your tests here.
+from django.contrib.auth import get_user_model
+from django.contrib.auth.models import Group
+from django.core.cache import caches
+from django.core.files.base import ContentFile
+from django.core.management import call_command
+from django.db import DatabaseError, connection as db_connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework.renderers import JSONRenderer
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.tokens import AccessToken
+from user_auth.roles import MANAGER_GROUP
+
+from . import previews
+from .api import middleware
+from .api.fastpath import compile_row_encoder
+from .api.pagination import KeysetCursorPagination
+from .api.serializers import ArticleSerializer
+from .changelog import compact_changelog
+from .facets import get_article_facets
+from .models import (
+    Article, CategorieArticle, ChangeLog, Document, Equipement, LigneMouvement, MouvementMateriel,
+    Platinage, Site, Stock, Train, TypePlatinage, Unite, UploadSession,
+)
+from .previews import preview_names
+from .storage import blob_name, content_addressed_storage
+from .versions import get_version, model_version_name
+
+
+def create_user(**kwargs):
+    defaults = {
+        'username': 'testeur', 'email': 'testeur@example.com', 'password': 'motdepasse',
+        'employee_id': 'T-0001', 'department': 'preparateur',
+    }
+    defaults.update(kwargs)
+    return get_user_model().objects.create_user(**defaults)
+
+
+# Caches isolés par test : les versions ne survivent pas d'un test à l'autre
+LOCMEM_CACHES = {
+    'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'},
+    'shared': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'shared'},
+}
+
+
+def clear_caches():
+    for alias in LOCMEM_CACHES:
+        caches[alias].clear()
+
+
+def create_article(code='J-1'):
+    site = Site.objects.create(nom=f'Site {code}')
+    stock = Stock.objects.create(nom=f'Magasin {code}', site=site, emplacement='C3')
+    categorie = CategorieArticle.objects.create(nom=f'Catégorie {code}')
+    return Article.objects.create(
+        code_article=code, description='Joint', stock=stock, categorie_article=categorie,
+        unite_mesure='pce', quantite_initiale=100, quantite_stock=100, seuil_alerte=0,
+    )
+
+
+def write_previews(name):
+    """Aperçus factices de ``name``, écrits comme le fait le pool de rendu."""
+    names = preview_names(name)
+    for preview in names:
+        with open(content_addressed_storage.path(preview), 'wb') as f:
+            f.write(b'apercu')
+    return names
+
+
+class MediaRootMixin:
+    """Fichiers des documents écrits dans un répertoire temporaire."""
+    render_previews = False
+
+    def setUp(self):
+        super().setUp()
+        self.media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.media_root, ignore_errors=True)
+        media = override_settings(MEDIA_ROOT=self.media_root)
+        media.enable()
+        self.addCleanup(media.disable)
+        if not self.render_previews:
+            # Pas de rendu des aperçus en arrière-plan pendant les tests
+            schedule = mock.patch('gestion_prep.signals.schedule_previews')
+            schedule.start()
+            self.addCleanup(schedule.stop)
+
+    def create_document(self, filename, content, user=None):
+        return Document.objects.create(
+            fichier=ContentFile(content, name=filename),
+            uploaded_by=user or self.user,
+        )
+
+
+class BlobReleaseTests(MediaRootMixin, TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = create_user()
+
+    def test_same_content_is_stored_once(self):
+        first = self.create_document('a.pdf', b'%PDF contenu')
+        second = self.create_document('b.pdf', b'%PDF contenu')
+        self.assertEqual(first.fichier.name, second.fichier.name)
+        self.assertEqual((first.filename, second.filename), ('a.pdf', 'b.pdf'))
+
+    def test_shared_blob_kept_until_last_reference(self):
+        first = self.create_document('a.pdf', b'partage')
+        second = self.create_document('b.pdf', b'partage')
+        name = first.fichier.name
+
+        with self.captureOnCommitCallbacks(execute=True):
+            first.delete()
+        self.assertTrue(content_addressed_storage.exists(name))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            second.delete()
+        self.assertFalse(content_addressed_storage.exists(name))
+
+    def test_same_content_under_two_extensions(self):
+        pdf = self.create_document('spec.pdf', b'meme contenu')
+        txt = self.create_document('spec.txt', b'meme contenu')
+        self.assertNotEqual(pdf.fichier.name, txt.fichier.name)
+        write_previews(pdf.fichier.name)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            txt.delete()
+
+        self.assertFalse(content_addressed_storage.exists(txt.fichier.name))
+        self.assertTrue(content_addressed_storage.exists(pdf.fichier.name))
+        for name in preview_names(pdf.fichier.name):
+            self.assertTrue(content_addressed_storage.exists(name))
+
+    def test_previews_released_with_blob(self):
+        document = self.create_document('photo.png', b'image')
+        previews = write_previews(document.fichier.name)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            document.delete()
+
+        for name in [document.fichier.name, *previews]:
+            self.assertFalse(content_addressed_storage.exists(name))
+
+    def test_replaced_file_is_released(self):
+        document = self.create_document('v1.pdf', b'version 1')
+        old_name = document.fichier.name
+        document.fichier = ContentFile(b'version 2', name='v2.pdf')
+        with self.captureOnCommitCallbacks(execute=True):
+            document.save()
+        self.assertFalse(content_addressed_storage.exists(old_name))
+        self.assertTrue(content_addressed_storage.exists(document.fichier.name))
+
+
+def png_bytes():
+    from PIL import Image
+
+    buffer = io.BytesIO()
+    Image.new('RGB', (40, 30), 'white').save(buffer, 'PNG')
+    return buffer.getvalue()
+
+
+try:
+    import PIL  # noqa: F401
+    HAS_PILLOW = True
+except ImportError:
+    HAS_PILLOW = False
+
+
+@unittest.skipUnless(HAS_PILLOW, 'Pillow est nécessaire au rendu des aperçus')
+class PreviewPoolTests(MediaRootMixin, TestCase):
+    render_previews = True
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = create_user()
+
+    def setUp(self):
+        super().setUp()
+        self.addCleanup(self.shutdown_executor)
+
+    def shutdown_executor(self):
+        if previews._executor is not None:
+            previews._executor.shutdown(cancel_futures=True)
+            previews._executor = None
+
+    def break_executor(self):
+        """Pool dont un processus meurt, comme lors d'un plantage du rendu."""
+        executor = previews.get_executor()
+        executor.submit(os._exit, 1).exception(timeout=60)
+        return executor
+
+    def test_broken_pool_does_not_fail_save(self):
+        broken = self.break_executor()
+        with self.captureOnCommitCallbacks(execute=True):
+            document = self.create_document('plan.png', png_bytes())
+        self.assertTrue(Document.objects.filter(pk=document.pk).exists())
+        self.assertIsNotNone(previews._executor)
+        self.assertIsNot(previews._executor, broken)
+
+    def test_broken_pool_is_replaced(self):
+        broken = self.break_executor()
+        document = self.create_document('plan.png', png_bytes())
+        future = previews.submit_previews(document.fichier.name)
+        self.assertIsNotNone(future)
+        self.assertIsNot(previews._executor, broken)
+        future.result(timeout=60)
+        self.assertEqual(set(previews.available_previews(document.fichier.name)), set(previews.PREVIEW_KINDS))
+
+    def test_submit_failure_is_logged(self):
+        document = self.create_document('plan.png', b'image')
+        with mock.patch.object(previews, 'get_executor', side_effect=OSError('fork impossible')):
+            with self.assertLogs('gestion_prep.previews', 'ERROR'):
+                self.assertIsNone(previews.submit_previews(document.fichier.name))
+
+    def test_unsupported_files_are_skipped(self):
+        document = self.create_document('notes.txt', b'texte')
+        self.assertIsNone(previews.submit_previews(document.fichier.name))
+        self.assertIsNone(previews._executor)
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class BulkUpsertTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.article = create_article('B-1')
+        cls.stock = cls.article.stock
+        cls.categorie = cls.article.categorie_article
+
+    def row(self, code, **kwargs):
+        row = {
+            'code_article': code, 'description': 'Joint torique', 'stock': self.stock.pk,
+            'categorie_article': self.categorie.pk, 'unite_mesure': 'pce',
+            'quantite_initiale': '10.00', 'seuil_alerte': '2.00',
+        }
+        row.update(kwargs)
+        return row
+
+    def post(self, rows):
+        return APIClient().post(reverse('article-bulk-upsert'), rows, format='json')
+
+    def test_creates_and_updates_on_natural_key(self):
+        version = get_version(model_version_name(Article))
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.post([self.row('B-1', description='Joint neuf'), self.row('B-2')])
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual((response.json()['saved'], response.json()['errors']), (2, []))
+
+        self.assertEqual(Article.objects.get(pk=self.article.pk).description, 'Joint neuf')
+        created = Article.objects.get(code_article='B-2')
+        # Stock d'ouverture : quantité initiale à défaut de quantite_stock
+        self.assertEqual(created.quantite_stock, 10)
+        self.assertEqual(
+            set(ChangeLog.objects.filter(resource=model_version_name(Article))
+                .values_list('object_id', flat=True)),
+            {self.article.pk, created.pk},
+        )
+        self.assertGreater(get_version(model_version_name(Article)), version)
+
+    def test_update_keeps_stock_from_movements(self):
+        Article.objects.filter(pk=self.article.pk).update(quantite_stock=40)
+        response = self.post([self.row('B-1', quantite_initiale='5.00', quantite_stock='999.00')])
+        self.assertEqual(response.status_code, 200)
+        article = Article.objects.get(pk=self.article.pk)
+        self.assertEqual((article.quantite_initiale, article.quantite_stock), (5, 40))
+
+    def test_rows_are_validated_like_the_model(self):
+        response = self.post([
+            self.row('B-3', prix='12.50'),
+            self.row('B-4', seuil_alerte='-1'),
+            self.row('B-5', devise='XXX', prix='1.00'),
+            self.row('B-6'),
+        ])
+        self.assertEqual(response.status_code, 200)
+        body = response.json()
+        self.assertEqual(body['saved'], 1)
+        self.assertEqual([error['index'] for error in body['errors']], [0, 1, 2])
+        self.assertIn('devise', body['errors'][0]['errors'])
+        self.assertFalse(Article.objects.filter(code_article__in=['B-3', 'B-4', 'B-5']).exists())
+
+
+class ImportArticlesTests(TestCase):
+    HEADER = 'code_article,description,stock,type_stock,emplacement,categorie,unite_mesure,quantite_initiale,prix,devise\n'
+
+    @classmethod
+    def setUpTestData(cls):
+        site = Site.objects.create(nom='Site test')
+        cls.magasin = Stock.objects.create(nom='Central', site=site, type_stock='MAGASIN', emplacement='A1')
+        cls.hors_magasin = Stock.objects.create(nom='Central', site=site, type_stock='HORS_MAGASIN', emplacement='A1')
+        cls.annexe = Stock.objects.create(nom='Annexe', site=site, emplacement='B2')
+        CategorieArticle.objects.create(nom='Visserie')
+
+    def run_import(self, rows):
+        fd, path = tempfile.mkstemp(suffix='.csv')
+        self.addCleanup(os.remove, path)
+        with os.fdopen(fd, 'w', encoding='utf-8') as f:
+            f.write(self.HEADER + ''.join(row + '\n' for row in rows))
+        stdout, stderr = io.StringIO(), io.StringIO()
+        call_command('import_articles', path, stdout=stdout, stderr=stderr)
+        return stderr.getvalue()
+
+    def test_valid_rows_are_imported(self):
+        errors = self.run_import([
+            'V-1,Vis,Annexe,,,Visserie,pce,10,"1,50",EUR',
+            'V-2,Vis,Central,MAGASIN,A1,Visserie,pce,5,,',
+        ])
+        self.assertEqual(errors, '')
+        self.assertEqual(Article.objects.get(code_article='V-1').stock, self.annexe)
+        self.assertEqual(Article.objects.get(code_article='V-2').stock, self.magasin)
+
+    def test_stocks_differing_only_by_type_are_ambiguous(self):
+        errors = self.run_import([
+            'V-1,Vis,Central,,A1,Visserie,pce,10,,',
+            'V-2,Vis,Central,HORS_MAGASIN,A1,Visserie,pce,10,,',
+        ])
+        self.assertIn('Ligne 1 ignorée : stock \'Central\' ambigu', errors)
+        self.assertEqual(list(Article.objects.values_list('code_article', 'stock')),
+                         [('V-2', self.hors_magasin.pk)])
+
+    def test_invalid_values_are_reported_per_row(self):
+        errors = self.run_import([
+            'V-1,Vis,Annexe,,,Visserie,pce,NaN,,',
+            'V-2,Vis,Annexe,,,Visserie,pce,1e30,,',
+            'V-3,Vis,Annexe,,,Visserie,pce,1.234,,',
+            f'{"X" * 101},Vis,Annexe,,,Visserie,pce,1,,',
+            'V-5,Vis,Annexe,,,Visserie,pce,-1,,',
+            'V-6,Vis,Annexe,,,Visserie,pce,2,,',
+        ])
+        for row in range(1, 6):
+            self.assertIn(f'Ligne {row} ignorée', errors)
+        self.assertIn('quantite_initiale', errors)
+        self.assertIn('code_article', errors)
+        self.assertEqual(list(Article.objects.values_list('code_article', flat=True)), ['V-6'])
+
+
+class SyncTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+
+    def sync(self, **params):
+        response = self.client.get(reverse('sync'), {'resources': 'sites', **params})
+        self.assertEqual(response.status_code, 200)
+        return response.json()
+
+    def site_ids(self, body):
+        return {row['id'] for row in body['changes'].get('sites', {}).get('upserts', [])}
+
+    def test_pages_until_caught_up(self):
+        sites = [Site.objects.create(nom=f'Site {i}') for i in range(5)]
+        seen, token, calls = set(), '', 0
+        while True:
+            body = self.sync(since=token, limit=2)
+            seen |= self.site_ids(body)
+            token = body['token']
+            calls += 1
+            if not body['has_more']:
+                break
+        self.assertEqual(seen, {site.pk for site in sites})
+        self.assertEqual(calls, 3)
+
+    def test_token_stops_below_transactions_in_flight(self):
+        first, late, last = (Site.objects.create(nom=nom) for nom in ('A', 'B', 'C'))
+        # Journal tel que PostgreSQL l'écrit : B appartient à la transaction
+        # 20, encore en cours quand C (transaction 21) est déjà validée
+        for site, transaction_id in ((first, 10), (late, 20), (last, 21)):
+            ChangeLog.objects.filter(object_id=site.pk).update(transaction_id=transaction_id)
+        hidden = ChangeLog.objects.get(object_id=late.pk)
+        hidden.delete()
+
+        with mock.patch('gestion_prep.api.views.sync.sync_horizon', return_value=20):
+            body = self.sync()
+        self.assertEqual(self.site_ids(body), {first.pk})
+        self.assertTrue(body['token'].startswith('10.'))
+
+        # Transaction 20 validée : B puis C sont servis
+        hidden.save(force_insert=True)
+        with mock.patch('gestion_prep.api.views.sync.sync_horizon', return_value=22):
+            body = self.sync(since=body['token'])
+        self.assertEqual(self.site_ids(body), {late.pk, last.pk})
+
+    def test_integer_token_is_accepted(self):
+        site = Site.objects.create(nom='A')
+        entry = ChangeLog.objects.get(object_id=site.pk)
+        self.assertEqual(self.site_ids(self.sync(since=str(entry.pk - 1))), {site.pk})
+        self.assertEqual(self.site_ids(self.sync(since=str(entry.pk))), set())
+
+    def test_compaction_keeps_latest_entry(self):
+        site = Site.objects.create(nom='A')
+        token = self.sync()['token']
+        site.nom = 'B'
+        site.save()
+        other = Site.objects.create(nom='C')
+        other_id = other.pk
+        other.delete()
+
+        self.assertEqual(compact_changelog(), 2)
+        self.assertEqual(ChangeLog.objects.filter(object_id=site.pk).count(), 1)
+        body = self.sync(since=token)
+        self.assertEqual(self.site_ids(body), {site.pk})
+        self.assertEqual(body['changes']['sites']['deletes'], [other_id])
+
+    def test_deletes_are_tombstoned(self):
+        site = Site.objects.create(nom='Éphémère')
+        token = self.sync()['token']
+        site_id = site.pk
+        site.delete()
+        body = self.sync(since=token)
+        self.assertEqual(body['changes']['sites']['deletes'], [site_id])
+        self.assertEqual(body['changes']['sites']['upserts'], [])
+
+
+class MouvementFeedTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = create_user()
+        cls.article = create_article()
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def create_bmm(self, numero):
+        mouvement = MouvementMateriel.objects.create(
+            type_mouvement=MouvementMateriel.TYPE_ENTREE, description_bmm='Réception',
+            emetteur_recepteur='Fournisseur', departement_service='Magasin', created_by=self.user,
+        )
+        MouvementMateriel.objects.filter(pk=mouvement.pk).update(numero_bmm=numero)
+        # Lignes sans recalcul des stocks : seul l'ordre du flux est testé ici
+        LigneMouvement.objects.bulk_create([LigneMouvement(mouvement=mouvement, article=self.article, quantite=1)])
+        return mouvement
+
+    def validate(self, mouvement, when):
+        MouvementMateriel.objects.filter(pk=mouvement.pk).update(
+            statut=MouvementMateriel.STATUT_VALIDE, date_validation=when,
+        )
+
+    def feed(self, **params):
+        response = self.client.get(reverse('mouvement-feed'), params)
+        self.assertEqual(response.status_code, 200)
+        return [json.loads(line) for line in b''.join(response.streaming_content).splitlines()]
+
+    def test_movement_validated_after_cursor_is_emitted(self):
+        earlier = self.create_bmm('BMM-1')
+        later = self.create_bmm('BMM-2')
+        now = timezone.now()
+        self.validate(later, now - timedelta(hours=1))
+
+        lines = self.feed()
+        self.assertEqual([line['numero_bmm'] for line in lines], ['BMM-2'])
+
+        # BMM-1 (lignes d'identifiant inférieur) validé après le passage du consommateur
+        self.validate(earlier, now)
+        lines = self.feed(cursor=lines[-1]['cursor'])
+        self.assertEqual([line['numero_bmm'] for line in lines], ['BMM-1'])
+        self.assertEqual(self.feed(cursor=lines[-1]['cursor']), [])
+
+    def test_invalid_cursor(self):
+        response = self.client.get(reverse('mouvement-feed'), {'cursor': 'pas-un-curseur'})
+        self.assertEqual(response.status_code, 400)
+
+
+class ChunkedUploadTests(MediaRootMixin, TestCase):
+    CONTENT = b'0123456789' * 100
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = create_user()
+        cls.article = create_article()
+
+    def setUp(self):
+        super().setUp()
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def open_upload(self, content=CONTENT, **extra):
+        response = self.client.post(reverse('uploads'), {
+            'nom_fichier': 'plan.pdf', 'taille': len(content), 'article': self.article.pk, **extra,
+        }, format='json')
+        self.assertEqual(response.status_code, 201)
+        return response.json()['id']
+
+    def put_chunk(self, upload_id, offset, data, **headers):
+        return self.client.put(
+            reverse('upload-session', args=[upload_id]), data=data,
+            content_type='application/octet-stream', HTTP_UPLOAD_OFFSET=str(offset), **headers,
+        )
+
+    def finalize(self, upload_id):
+        return self.client.post(reverse('upload-finalize', args=[upload_id]))
+
+    def upload_dir_files(self):
+        directory = os.path.dirname(content_addressed_storage.path(UploadSession(pk=uuid.uuid4()).part_name))
+        return os.listdir(directory) if os.path.isdir(directory) else []
+
+    def test_resume_and_finalize(self):
+        upload_id = self.open_upload(sha256=hashlib.sha256(self.CONTENT).hexdigest())
+        response = self.put_chunk(upload_id, 0, self.CONTENT[:400])
+        self.assertEqual(response['Upload-Offset'], '400')
+
+        # Reprise après une coupure : la position vient du serveur
+        response = self.client.get(reverse('upload-session', args=[upload_id]))
+        offset = int(response['Upload-Offset'])
+        self.assertEqual(offset, 400)
+        self.put_chunk(upload_id, offset, self.CONTENT[offset:])
+
+        response = self.finalize(upload_id)
+        self.assertEqual(response.status_code, 201)
+        document = Document.objects.get(pk=response.json()['id'])
+        with document.fichier.open('rb') as f:
+            self.assertEqual(f.read(), self.CONTENT)
+        self.assertEqual(document.filename, 'plan.pdf')
+        self.assertEqual(self.finalize(upload_id).status_code, 200)
+
+    def test_rejected_chunks_leave_offset_unchanged(self):
+        upload_id = self.open_upload()
+        self.put_chunk(upload_id, 0, self.CONTENT[:100])
+
+        response = self.put_chunk(upload_id, 0, self.CONTENT[:100])
+        self.assertEqual(response.status_code, 409)
+        response = self.put_chunk(upload_id, 100, self.CONTENT[100:200], HTTP_X_CHUNK_SHA256='0' * 64)
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.json()['recu'], 100)
+        self.assertEqual(UploadSession.objects.get(pk=upload_id).recu, 100)
+        # Aucun morceau temporaire laissé sur le disque
+        self.assertFalse([name for name in self.upload_dir_files() if name.endswith('.chunk')])
+
+    def test_checksum_mismatch_restarts_upload(self):
+        upload_id = self.open_upload(sha256=hashlib.sha256(b'autre contenu').hexdigest())
+        self.put_chunk(upload_id, 0, self.CONTENT)
+        response = self.finalize(upload_id)
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(UploadSession.objects.get(pk=upload_id).recu, 0)
+
+    def test_failed_finalize_releases_blob(self):
+        upload_id = self.open_upload()
+        self.put_chunk(upload_id, 0, self.CONTENT)
+        blob = blob_name(hashlib.sha256(self.CONTENT).hexdigest(), '.pdf')
+
+        with mock.patch.object(Document, 'save', side_effect=DatabaseError('échec')):
+            with self.assertRaises(DatabaseError):
+                self.finalize(upload_id)
+        self.assertFalse(content_addressed_storage.exists(blob))
+        self.assertFalse(UploadSession.objects.get(pk=upload_id).termine)
+
+        # Le fichier partiel est resté en place : la finalisation peut être rejouée
+        response = self.finalize(upload_id)
+        self.assertEqual(response.status_code, 201)
+        self.assertTrue(content_addressed_storage.exists(blob))
+
+
+class DocumentAccessTests(MediaRootMixin, TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = create_user(department='maintenance')
+        cls.colleague = create_user(username='collegue', email='collegue@example.com',
+                                    employee_id='T-0002', department='maintenance')
+        cls.outsider = create_user(username='autre', email='autre@example.com',
+                                   employee_id='T-0003', department='production')
+        cls.manager = create_user(username='chef', email='chef@example.com',
+                                  employee_id='T-0004', department='production')
+        cls.manager.groups.add(Group.objects.get_or_create(name=MANAGER_GROUP)[0])
+
+    def setUp(self):
+        super().setUp()
+        self.document = self.create_document('rapport.pdf', b'0123456789')
+        self.client = APIClient()
+
+    def download(self, user, **headers):
+        self.client.force_login(user)
+        return self.client.get(reverse('document-download', args=[self.document.pk]), **headers)
+
+    def test_download_restricted_to_department_and_managers(self):
+        for user, expected in ((self.user, 200), (self.colleague, 200),
+                               (self.manager, 200), (self.outsider, 404)):
+            with self.subTest(user=user.username):
+                self.assertEqual(self.download(user).status_code, expected)
+
+    def test_document_list_is_filtered(self):
+        self.client.force_authenticate(self.outsider)
+        response = self.client.get(reverse('document-list'))
+        self.assertEqual(response.json()['results'], [])
+        response = self.client.get(reverse('document-detail', args=[self.document.pk]))
+        self.assertEqual(response.status_code, 404)
+
+    def test_byte_ranges(self):
+        response = self.download(self.user, HTTP_RANGE='bytes=-4')
+        self.assertEqual(response.status_code, 206)
+        self.assertEqual(b''.join(response.streaming_content), b'6789')
+        self.assertEqual(response['Content-Range'], 'bytes 6-9/10')
+        self.assertEqual(self.download(self.user, HTTP_RANGE='bytes=10-').status_code, 416)
+
+    def test_suffix_range_on_empty_file(self):
+        self.document = self.create_document('vide.pdf', b'')
+        response = self.download(self.user, HTTP_RANGE='bytes=-5')
+        self.assertEqual(response.status_code, 416)
+        self.assertEqual(response['Content-Range'], 'bytes */0')
+
+
+@override_settings(ALLOWED_HOSTS=['testserver', 'a.example.com', 'b.example.com'], CACHES=LOCMEM_CACHES)
+class ResponseCacheTests(MediaRootMixin, TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = create_user()
+
+    def setUp(self):
+        super().setUp()
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        for nom in ('Nord', 'Sud'):
+            Site.objects.create(nom=nom)
+
+    def next_link(self, host, secure=False):
+        response = self.client.get(reverse('site-list'), {'page_size': 1}, HTTP_HOST=host, secure=secure)
+        self.assertEqual(response.status_code, 200)
+        return response.json()['next']
+
+    def test_absolute_urls_follow_host_and_scheme(self):
+        self.assertTrue(self.next_link('a.example.com').startswith('http://a.example.com/'))
+        self.assertTrue(self.next_link('b.example.com').startswith('http://b.example.com/'))
+        self.assertTrue(self.next_link('a.example.com', secure=True).startswith('https://a.example.com/'))
+
+    def test_role_change_is_not_served_from_cache(self):
+        owner = create_user(username='auteur', email='auteur@example.com',
+                            employee_id='T-0002', department='maintenance')
+        self.create_document('rapport.pdf', b'rapport', user=owner)
+        self.user.department = 'production'
+        self.client.force_authenticate(self.user)
+        response = self.client.get(reverse('document-list'))
+        self.assertEqual(response.json()['results'], [])
+
+        # Mutation vers le département de l'auteur : ni 304 ni liste en cache
+        self.user.department = 'maintenance'
+        self.client.force_authenticate(self.user)
+        response = self.client.get(reverse('document-list'), HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.json()['results']), 1)
+
+
+class DashboardTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = create_user()
+        article = create_article('D-1')
+        Article.objects.filter(pk=article.pk).update(prix='1.50', devise='EUR', quantite_stock=2)
+
+    def get(self, name, token=None):
+        headers = {'HTTP_AUTHORIZATION': f'Bearer {token}'} if token else {}
+        return self.client.get(reverse(name), **headers)
+
+    def test_missing_invalid_or_expired_token_is_rejected(self):
+        expired = AccessToken.for_user(self.user)
+        expired.set_exp(lifetime=-timedelta(seconds=1))
+        for token in (None, 'pas-un-jeton', str(expired)):
+            with self.subTest(token=token):
+                response = self.get('dashboard', token)
+                self.assertEqual(response.status_code, 401)
+                self.assertEqual(response['WWW-Authenticate'], 'Bearer realm="api"')
+
+    def test_dashboard_totals_and_values(self):
+        response = self.get('dashboard', AccessToken.for_user(self.user))
+        self.assertEqual(response.status_code, 200)
+        body = response.json()
+        self.assertEqual(body['stock'], {'articles': 1, 'sous_seuil': 0, 'en_rupture': 0})
+        self.assertEqual(body['valeur_stock'], [{'devise': 'EUR', 'valeur': '3.00'}])
+        self.assertEqual(body['brouillons'], 0)
+
+    def test_stock_report(self):
+        response = self.get('stock-report', AccessToken.for_user(self.user))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([row['articles'] for row in response.json()['stocks']], [1])
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class BatchTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = create_user()
+        create_article('L-1')
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def batch(self, requests, **options):
+        return self.client.post(reverse('batch'), {'requests': requests, **options}, format='json')
+
+    def test_sub_requests_get_their_own_responses(self):
+        response = self.batch([{'url': '/api/sites/'}, {'url': '/api/inconnue/'}])
+        self.assertEqual(response.status_code, 200)
+        first, second = response.json()['responses']
+        self.assertEqual(first['status'], 200)
+        self.assertEqual(len(first['body']['results']), 1)
+        self.assertEqual(second['status'], 404)
+
+    def test_read_only_rejects_writes(self):
+        response = self.batch([{'url': '/api/sites/'}, {'method': 'POST', 'url': '/api/sites/',
+                                                         'body': {'nom': 'Ouest'}}], read_only=True)
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(Site.objects.filter(nom='Ouest').exists())
+
+    def test_batches_cannot_be_nested(self):
+        response = self.batch([{'method': 'POST', 'url': '/api/batch/', 'body': {'requests': []}}])
+        self.assertEqual(response.json()['responses'][0]['status'], 400)
+
+    def test_http404_from_django_view(self):
+        response = self.batch([{'url': reverse('document-download', args=[999999])}])
+        self.assertEqual(response.json()['responses'][0]['status'], 404)
+
+    def test_read_only_async_view_uses_batch_connection(self):
+        tables = []
+
+        def record(execute, sql, params, many, context):
+            tables.append((sql, db_connection.in_atomic_block))
+            return execute(sql, params, many, context)
+
+        token = AccessToken.for_user(self.user)
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {token}')
+        with db_connection.execute_wrapper(record):
+            response = self.batch([{'url': '/api/dashboard/'}], read_only=True)
+        self.assertEqual(response.json()['responses'][0]['status'], 200)
+        # Les agrégats du tableau de bord passent par la connexion du lot
+        self.assertTrue(any('"gestion_prep_article"' in sql and atomic for sql, atomic in tables))
+
+    def test_failure_log_omits_body(self):
+        match = mock.Mock(func=mock.Mock(side_effect=RuntimeError('panne')), args=(), kwargs={})
+        with mock.patch('gestion_prep.api.views.batch.resolve', return_value=match), \
+                self.assertLogs('gestion_prep.api.views.batch', 'ERROR') as logs:
+            response = self.batch([{'method': 'POST', 'url': '/api/auth/login/',
+                                    'body': {'password': 'secret-absolu'}}])
+        self.assertEqual(response.json()['responses'][0]['status'], 500)
+        output = '\n'.join(logs.output)
+        self.assertIn('POST /api/auth/login/', output)
+        self.assertNotIn('secret-absolu', output)
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class ApiRouterTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.sites = [Site.objects.create(nom=f'Site {i}') for i in range(5)]
+
+    def test_root_lists_registered_routes(self):
+        response = APIClient().get(reverse('api-root'))
+        self.assertEqual(response.status_code, 200)
+        for name in ('sites', 'unites', 'trains', 'equipements', 'articles', 'categories', 'types-platinage'):
+            with self.subTest(name=name):
+                self.assertEqual(APIClient().get(response.json()[name]).status_code, 200)
+
+    def test_cursor_pages_cover_the_table_without_count(self):
+        client = APIClient()
+        url, seen, pages = reverse('site-list') + '?page_size=2', [], 0
+        while url:
+            body = client.get(url).json()
+            self.assertNotIn('count', body)
+            seen += [row['id'] for row in body['results']]
+            url, pages = body['next'], pages + 1
+        self.assertEqual(seen, sorted(site.pk for site in self.sites))
+        self.assertEqual(pages, 3)
+
+    def test_page_size_is_capped(self):
+        with mock.patch.object(KeysetCursorPagination, 'max_page_size', 2):
+            response = APIClient().get(reverse('site-list'), {'page_size': 100000})
+        self.assertEqual(len(response.json()['results']), 2)
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class HierarchyTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.site = Site.objects.create(nom='Nord')
+        cls.unite = Unite.objects.create(nom='U1', site=cls.site)
+        cls.train = Train.objects.create(nom='T1', unite=cls.unite)
+        cls.equipement = Equipement.objects.create(tag='P-101', description='Pompe', train=cls.train)
+        Site.objects.create(nom='Sud')
+        article = create_article('H-1')
+        Platinage.objects.create(equipement=cls.equipement, article=article,
+                                 type_platinage=TypePlatinage.objects.create(nom='Joint'), repere='R1')
+
+    def setUp(self):
+        clear_caches()
+
+    def tree(self, **params):
+        return APIClient().get(reverse('hierarchy'), params)
+
+    def test_full_tree_in_one_query_per_level(self):
+        with self.assertNumQueries(4):
+            tree = self.tree().json()
+        self.assertEqual([site['nom'] for site in tree], ['Nord', 'Site H-1', 'Sud'])
+        equipement = tree[0]['unites'][0]['trains'][0]['equipements'][0]
+        self.assertEqual((equipement['tag'], equipement['type']), ('P-101', 'equipement'))
+        self.assertEqual(tree[2]['unites'], [])
+
+    def test_subtree_and_counts(self):
+        node = self.tree(unite=self.unite.pk, counts=1).json()
+        self.assertEqual((node['type'], node['id']), ('unite', self.unite.pk))
+        self.assertEqual((node['platinages'], node['documents']), (1, 0))
+        self.assertEqual(node['trains'][0]['equipements'][0]['platinages'], 1)
+
+    def test_invalid_roots(self):
+        self.assertEqual(self.tree(site=999999).status_code, 404)
+        self.assertEqual(self.tree(site='x').status_code, 400)
+        self.assertEqual(self.tree(site=self.site.pk, train=self.train.pk).status_code, 400)
+
+    def test_cached_tree_follows_writes(self):
+        self.tree()
+        with self.assertNumQueries(0):
+            self.tree()
+        with self.captureOnCommitCallbacks(execute=True):
+            Equipement.objects.create(tag='P-102', description='Pompe', train=self.train)
+        tree = self.tree().json()
+        self.assertEqual(len(tree[0]['unites'][0]['trains'][0]['equipements']), 2)
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class ConditionalGetTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        for i in range(40):
+            Site.objects.create(nom=f'Site {i:02d}', description='Description détaillée du site ' * 3)
+
+    def setUp(self):
+        clear_caches()
+        self.client = APIClient()
+
+    def get(self, **headers):
+        return self.client.get(reverse('site-list'), {'page_size': 100}, **headers)
+
+    def test_not_modified_without_queries(self):
+        etag = self.get()['ETag']
+        with self.assertNumQueries(0):
+            response = self.get(HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+
+    def test_write_changes_etag(self):
+        etag = self.get()['ETag']
+        with self.captureOnCommitCallbacks(execute=True):
+            Site.objects.create(nom='Site neuf')
+        response = self.get(HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+        self.assertEqual(len(response.json()['results']), 41)
+
+    def test_gzip_for_large_json(self):
+        plain = self.get()
+        response = self.get(HTTP_ACCEPT_ENCODING='gzip')
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        self.assertIn('Accept-Encoding', response['Vary'])
+        self.assertEqual(gzip.decompress(response.content), plain.content)
+        # Une représentation par encodage : ETag distincts
+        self.assertNotEqual(response['ETag'], plain['ETag'])
+
+    def test_small_responses_are_not_compressed(self):
+        response = self.client.get(reverse('site-list'), {'page_size': 1}, HTTP_ACCEPT_ENCODING='gzip')
+        self.assertFalse(response.has_header('Content-Encoding'))
+
+    @unittest.skipUnless(middleware.brotli, 'Brotli non installé')
+    def test_brotli_preferred(self):
+        response = self.get(HTTP_ACCEPT_ENCODING='gzip, br')
+        self.assertEqual(response['Content-Encoding'], 'br')
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class SparseFieldsetTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.site = Site.objects.create(nom='Nord', description='Site nord')
+        cls.unite = Unite.objects.create(nom='U1', site=cls.site)
+
+    def setUp(self):
+        clear_caches()
+        self.client = APIClient()
+
+    def rows(self, name, **params):
+        response = self.client.get(reverse(name), params)
+        self.assertEqual(response.status_code, 200)
+        return response.json()['results']
+
+    def test_fields_restricts_output(self):
+        self.assertEqual(self.rows('site-list', fields='id,nom'), [{'id': self.site.pk, 'nom': 'Nord'}])
+
+    def test_expand_forward_and_reverse_relations(self):
+        unite = self.rows('unite-list', expand='site')[0]
+        self.assertEqual(unite['site']['nom'], 'Nord')
+        site = self.rows('site-list', expand='unites', fields='id,unites')[0]
+        self.assertEqual([row['nom'] for row in site['unites']], ['U1'])
+
+    def test_expand_ignored_outside_fields_and_on_writes(self):
+        self.assertEqual(self.rows('unite-list', fields='id,nom', expand='site')[0],
+                         {'id': self.unite.pk, 'nom': 'U1'})
+        response = self.client.post(reverse('unite-list') + '?expand=site',
+                                    {'nom': 'U2', 'site': self.site.pk}, format='json')
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.json()['site'], self.site.pk)
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class QueryOptimizerTests(TestCase):
+    def setUp(self):
+        clear_caches()
+        self.client = APIClient()
+
+    def create_units(self, count):
+        for i in range(count):
+            site = Site.objects.create(nom=f'Site {i}-{uuid.uuid4().hex[:6]}')
+            Unite.objects.create(nom=f'U{i}', site=site)
+            Unite.objects.create(nom=f'V{i}', site=site)
+
+    def count_queries(self, name, **params):
+        clear_caches()
+        with CaptureQueriesContext(db_connection) as queries:
+            response = self.client.get(reverse(name), {'page_size': 100, **params})
+        self.assertEqual(response.status_code, 200)
+        return len(queries)
+
+    def test_query_count_does_not_grow_with_rows(self):
+        self.create_units(1)
+        few = (self.count_queries('unite-list', expand='site'),
+               self.count_queries('site-list', expand='unites'))
+        self.create_units(10)
+        many = (self.count_queries('unite-list', expand='site'),
+                self.count_queries('site-list', expand='unites'))
+        self.assertEqual(few, many)
+        # Jointure pour la relation directe, un préchargement pour l'inverse
+        self.assertEqual(many, (1, 2))
+
+    def test_only_requested_columns_are_read(self):
+        Site.objects.create(nom='Nord', description='Longue description')
+        with CaptureQueriesContext(db_connection) as queries:
+            self.client.get(reverse('site-list'), {'fields': 'id,nom'})
+        self.assertNotIn('"description"', queries[-1]['sql'])
+
+    def test_etag_follows_expanded_models(self):
+        self.create_units(1)
+        site = Site.objects.first()
+        plain = self.client.get(reverse('unite-list'))['ETag']
+        expanded = self.client.get(reverse('unite-list'), {'expand': 'site'})['ETag']
+        with self.captureOnCommitCallbacks(execute=True):
+            site.nom = 'Renommé'
+            site.save()
+        self.assertEqual(self.client.get(reverse('unite-list'))['ETag'], plain)
+        self.assertNotEqual(self.client.get(reverse('unite-list'), {'expand': 'site'})['ETag'], expanded)
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class ValuesFastPathTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        create_article('V-1')
+        article = create_article('V-2')
+        Article.objects.filter(pk=article.pk).update(prix='12.5', devise='EUR', quantite_stock='3.25',
+                                                    specification='Spéc.')
+
+    def setUp(self):
+        clear_caches()
+        self.client = APIClient()
+
+    def serialized(self, **kwargs):
+        data = ArticleSerializer(Article.objects.order_by('id'), many=True, **kwargs).data
+        return json.loads(JSONRenderer().render(data))
+
+    def test_list_matches_serializer_without_model_instances(self):
+        with mock.patch.object(Article, 'from_db', side_effect=AssertionError('instance créée')):
+            response = self.client.get(reverse('article-list'))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['results'], self.serialized())
+
+    def test_sparse_fields_match_serializer(self):
+        response = self.client.get(reverse('article-list'), {'fields': 'id,prix,quantite_stock,updated_at'})
+        self.assertEqual(response.json()['results'],
+                         self.serialized(fields=['id', 'prix', 'quantite_stock', 'updated_at']))
+
+    def test_expanded_relations_fall_back_to_serializer(self):
+        self.assertIsNotNone(compile_row_encoder(ArticleSerializer()))
+        self.assertIsNone(compile_row_encoder(ArticleSerializer(expand=['stock'])))
+        response = self.client.get(reverse('article-list'), {'expand': 'stock'})
+        self.assertEqual(response.json()['results'], self.serialized(expand=['stock']))
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class FacetSearchTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.joint = create_article('F-1')
+        cls.vis = create_article('F-2')
+        cls.ecrou = Article.objects.create(
+            code_article='F-3', description='Écrou', stock=cls.joint.stock,
+            categorie_article=cls.joint.categorie_article, unite_mesure='pce',
+            quantite_initiale=5, quantite_stock=5, seuil_alerte=10,
+        )
+
+    def setUp(self):
+        clear_caches()
+        self.client = APIClient()
+
+    def search(self, **params):
+        response = self.client.get(reverse('article-search'), params)
+        self.assertEqual(response.status_code, 200)
+        return response.json()
+
+    def counts(self, facets, name):
+        return {bucket['value']: bucket['count'] for bucket in facets[name]}
+
+    def test_counts_per_facet(self):
+        body = self.search()
+        facets = body['facets']
+        self.assertEqual(facets['total'], 3)
+        self.assertEqual(self.counts(facets, 'stock'), {self.joint.stock_id: 2, self.vis.stock_id: 1})
+        self.assertEqual(self.counts(facets, 'sous_seuil'), {True: 1, False: 2})
+        self.assertEqual(facets['stock'][0]['label'], 'Magasin F-1')
+        self.assertEqual(self.counts(self.search(q='crou')['facets'], 'stock'), {self.joint.stock_id: 1})
+
+    def test_filter_keeps_other_values_of_its_own_facet(self):
+        body = self.search(stock=str(self.vis.stock_id))
+        self.assertEqual([row['code_article'] for row in body['results']], ['F-2'])
+        facets = body['facets']
+        self.assertEqual(facets['total'], 1)
+        # La facette filtrée ignore son propre filtre, les autres le respectent
+        self.assertEqual(self.counts(facets, 'stock'), {self.joint.stock_id: 2, self.vis.stock_id: 1})
+        self.assertEqual(self.counts(facets, 'categorie'), {self.vis.categorie_article_id: 1})
+
+        body = self.search(sous_seuil='true')
+        self.assertEqual([row['code_article'] for row in body['results']], ['F-3'])
+
+    def test_invalid_identifier(self):
+        response = self.client.get(reverse('article-search'), {'categorie': 'abc'})
+        self.assertEqual(response.status_code, 400)
+
+    def test_cached_facets_refreshed_after_commit(self):
+        self.assertEqual(self.search()['facets']['total'], 3)
+        with self.assertNumQueries(0):
+            self.assertEqual(get_article_facets('', {})['total'], 3)
+        with self.captureOnCommitCallbacks(execute=True):
+            create_article('F-4')
+        self.assertEqual(self.search()['facets']['total'], 4)
@@ -0,0 +1,190 @@
+import hashlib
+import os
+import shutil
+import tempfile
+from datetime import timedelta
+from functools import partial
+from typing import Optional
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from .models import Document, UploadSession
+from .storage import discard_blob
+
+UPLOAD_MAX_SIZE = getattr(settings, 'DOCUMENT_UPLOAD_MAX_SIZE', 2 * 1024 ** 3)
+UPLOAD_MAX_CHUNK = getattr(settings, 'DOCUMENT_UPLOAD_MAX_CHUNK', 16 * 1024 ** 2)
+UPLOAD_LIFETIME = getattr(settings, 'DOCUMENT_UPLOAD_LIFETIME', timedelta(days=1))
+READ_SIZE = 64 * 1024
+
+
+class UploadError(Exception):
+    def __init__(self, status_code, message):
+        super().__init__(message)
+        self.status_code = status_code
+
+
+def _storage():
+    return Document._meta.get_field('fichier').storage
+
+
+def new_expiration():
+    return timezone.now() + UPLOAD_LIFETIME
+
+
+def _check_chunk(session: UploadSession, offset: int, length: int) -> None:
+    if session.termine:
+        raise UploadError(409, 'Envoi déjà finalisé')
+    if offset != session.recu:
+        raise UploadError(409, f'Position attendue : {session.recu}')
+    if length > UPLOAD_MAX_CHUNK:
+        raise UploadError(413, f'Au plus {UPLOAD_MAX_CHUNK} octets par morceau')
+    if offset + length > session.taille:
+        raise UploadError(400, 'Le morceau dépasse la taille annoncée')
+
+
+def receive_chunk(session: UploadSession, offset: int, stream, length: int, checksum: str = '') -> str:
+    """
+    Reçoit un morceau, sans verrou : contrôle ``offset`` et ``length``
+    contre l'état lu de l'envoi, puis recopie les ``length`` octets lus dans
+    ``stream`` dans un fichier temporaire, par blocs et hachés au passage.
+    Retourne le chemin de ce fichier, à passer à :func:`append_chunk`.
+
+    Avec ``checksum`` (SHA-256 hexadécimal du morceau), un morceau incomplet
+    ou altéré est rejeté ; sans, les octets reçus avant une coupure sont
+    conservés et l'envoi reprend après eux.
+    """
+    _check_chunk(session, offset, length)
+    directory = os.path.dirname(_storage().path(session.part_name))
+    os.makedirs(directory, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=directory, suffix='.chunk')
+    digest = hashlib.sha256()
+    received = 0
+    with os.fdopen(fd, 'wb') as chunk:
+        try:
+            while received < length:
+                block = stream.read(min(READ_SIZE, length - received))
+                if not block:
+                    break
+                digest.update(block)
+                chunk.write(block)
+                received += len(block)
+        except OSError:
+            # Connexion interrompue : les octets déjà reçus restent valables
+            pass
+    if checksum and (received != length or digest.hexdigest() != checksum.lower()):
+        os.remove(tmp_path)
+        raise UploadError(400, "L'empreinte du morceau ne correspond pas")
+    return tmp_path
+
+
+def append_chunk(session: Optional[UploadSession], offset: int, tmp_path: str) -> int:
+    """
+    Ajoute au fichier partiel le morceau reçu dans ``tmp_path`` (consommé)
+    et retourne la nouvelle position. À appeler sous verrou sur l'envoi :
+    la position est revérifiée, un morceau concurrent a pu passer avant.
+    """
+    try:
+        if session is None:
+            raise UploadError(404, 'Envoi introuvable')
+        received = os.path.getsize(tmp_path)
+        _check_chunk(session, offset, received)
+        path = _storage().path(session.part_name)
+        with open(path, 'r+b' if os.path.exists(path) else 'w+b') as part, open(tmp_path, 'rb') as chunk:
+            part.seek(offset)
+            shutil.copyfileobj(chunk, part, READ_SIZE)
+            # Écarte le reste d'une tentative interrompue
+            part.truncate(offset + received)
+            part.flush()
+            os.fsync(part.fileno())
+    finally:
+        os.remove(tmp_path)
+
+    session.recu = offset + received
+    session.date_expiration = new_expiration()
+    session.save(update_fields=['recu', 'date_expiration'])
+    return session.recu
+
+
+def finalize(session: UploadSession) -> Document:
+    """
+    Contrôle le fichier complet (taille, empreinte annoncée), le range dans
+    le stockage adressé par le contenu et crée le document.
+    """
+    if session.termine:
+        return session.document
+    if session.recu != session.taille:
+        raise UploadError(409, f'Envoi incomplet : {session.recu}/{session.taille} octets')
+
+    storage = _storage()
+    path = storage.path(session.part_name)
+    digest = hashlib.sha256()
+    if session.taille:
+        with open(path, 'rb') as part:
+            for block in iter(lambda: part.read(READ_SIZE), b''):
+                digest.update(block)
+    else:
+        open(path, 'wb').close()
+    if session.sha256 and digest.hexdigest() != session.sha256.lower():
+        # Fichier corrompu : l'envoi repart de zéro
+        os.remove(path)
+        session.recu = 0
+        session.save(update_fields=['recu'])
+        raise UploadError(400, "L'empreinte du fichier ne correspond pas ; envoi à reprendre")
+
+    # Le fichier est rangé par un second lien : le fichier partiel reste en
+    # place, et la finalisation peut être rejouée, si le document n'est pas créé
+    staged = f'{path}.final'
+    if os.path.exists(staged):
+        os.remove(staged)
+    os.link(path, staged)
+    name = None
+    try:
+        with transaction.atomic():
+            # Rangé dans la transaction qui crée le document (voir lock_blob)
+            name = storage.store_file(staged, digest.hexdigest(), os.path.splitext(session.nom_fichier)[1])
+            document = Document(
+                fichier=name,
+                nom_fichier=session.nom_fichier,
+                remarque=session.remarque,
+                article_id=session.article_id,
+                equipement_id=session.equipement_id,
+                uploaded_by_id=session.uploaded_by_id,
+            )
+            document.save()
+            session.document = document
+            session.save(update_fields=['document'])
+    except Exception:
+        # Document non créé : le fichier rangé n'est plus référencé
+        if os.path.exists(staged):
+            os.remove(staged)
+        discard_blob(name)
+        raise
+    transaction.on_commit(partial(_remove_part, path))
+    return document
+
+
+def _remove_part(path: str) -> None:
+    if os.path.exists(path):
+        os.remove(path)
+
+
+def abort(session: UploadSession) -> None:
+    """Abandonne l'envoi et supprime le fichier partiel."""
+    storage = _storage()
+    if storage.exists(session.part_name):
+        storage.delete(session.part_name)
+    session.delete()
+
+
+def prune_expired() -> int:
+    """Supprime les envois non finalisés expirés et leurs fichiers partiels."""
+    expired = UploadSession.objects.filter(document__isnull=True, date_expiration__lte=timezone.now())
+    count = 0
+    for session in expired.iterator():
+        abort(session)
+        count += 1
+    # Envois finalisés : plus rien à garder une fois expirés
+    UploadSession.objects.filter(document__isnull=False, date_expiration__lte=timezone.now()).delete()
+    return count
@@ -0,0 +1,52 @@
+import time
+from typing import Dict, Iterable
+
+from django.core.cache import caches
+from django.db import transaction
+
+VERSION_KEY = 'gestion_prep:version:{}'
+# Cache commun aux workers, sans éviction (voir CACHES)
+VERSION_CACHE = 'shared'
+
+
+def _now_ms() -> int:
+    return int(time.time() * 1000)
+
+
+def model_version_name(model) -> str:
+    """Nom de ressource versionnée d'un modèle (ex. ``gestion_prep.site``)."""
+    return model._meta.label_lower
+
+
+def get_versions(names: Iterable[str]) -> Dict[str, int]:
+    """
+    Versions courantes des ressources ``names``, en un aller-retour au cache.
+
+    Une version est l'horodatage (ms) de la dernière modification connue ;
+    une ressource jamais vue est initialisée à l'instant présent.
+    """
+    cache = caches[VERSION_CACHE]
+    keys = {VERSION_KEY.format(name): name for name in names}
+    found = cache.get_many(list(keys))
+    for key in keys.keys() - found.keys():
+        cache.add(key, _now_ms(), None)
+        found[key] = cache.get(key) or _now_ms()
+    return {name: found[key] for key, name in keys.items()}
+
+
+def get_version(name: str) -> int:
+    return get_versions([name])[name]
+
+
+def bump_version(name: str) -> None:
+    """
+    Avance la version de ``name`` une fois la transaction courante validée.
+
+    Attendre le commit garantit qu'aucune lecture ne peut associer la
+    nouvelle version à des données pas encore visibles.
+    """
+    def _bump():
+        key = VERSION_KEY.format(name)
+        caches[VERSION_CACHE].set(key, max(_now_ms(), get_version(name) + 1), None)
+
+    transaction.on_commit(_bump)
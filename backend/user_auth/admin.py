@@ -1,7 +1,7 @@
 from django.contrib import admin
 from django.contrib.auth.admin import UserAdmin
 from .forms import CustomUserCreationForm, CustomUserChangeForm
-from .models import CustomUser
+from .models import CustomUser, OutgoingEmail
 
 @admin.register(CustomUser)
 class CustomUserAdmin(UserAdmin):
@@ -28,3 +28,9 @@ class CustomUserAdmin(UserAdmin):
     
     search_fields = ('email', 'username', 'first_name', 'last_name', 'employee_id')
     ordering = ('email',)
+
+@admin.register(OutgoingEmail)
+class OutgoingEmailAdmin(admin.ModelAdmin):
+    list_display = ('subject', 'status', 'attempts', 'next_attempt_at', 'sent_at')
+    list_filter = ('status',)
+    readonly_fields = ('created_at', 'sent_at', 'last_error')
@@ -0,0 +1,31 @@
+from django.contrib.auth import get_user_model
+from django.contrib.auth.backends import ModelBackend
+from .roles import manager_exists
+
+UserModel = get_user_model()
+
+
+class RoleModelBackend(ModelBackend):
+    """
+    ``ModelBackend`` qui charge le statut manager avec l'utilisateur : la
+    connexion ne fait qu'une requête. Même contrôle que ``ModelBackend`` :
+    le mot de passe est haché sur tous les chemins (compte inconnu ou
+    inactif compris), sans écart de durée révélant les comptes existants.
+    """
+
+    def authenticate(self, request, username=None, password=None, **kwargs):
+        if username is None:
+            username = kwargs.get(UserModel.USERNAME_FIELD)
+        if username is None or password is None:
+            return None
+        user = (
+            UserModel._default_manager.annotate(is_manager=manager_exists())
+            .filter(**{UserModel.USERNAME_FIELD: username}).first()
+        )
+        if user is None:
+            # Hachage à blanc : même durée qu'un compte existant
+            UserModel().set_password(password)
+            return None
+        if user.check_password(password) and self.user_can_authenticate(user):
+            return user
+        return None
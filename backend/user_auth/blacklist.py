@@ -0,0 +1,65 @@
+import threading
+import time
+
+from django.conf import settings
+from django.db.models import Max
+from rest_framework_simplejwt.token_blacklist.models import BlacklistedToken
+from rest_framework_simplejwt.utils import aware_utcnow
+
+# Délai maximal avant qu'une révocation faite par un autre processus soit vue ici
+BLACKLIST_REFRESH_INTERVAL = getattr(settings, 'JWT_BLACKLIST_REFRESH_INTERVAL', 5)
+# Identifiants relus à chaque rafraîchissement : couvre les insertions validées dans le désordre
+BLACKLIST_ID_OVERLAP = 100
+
+
+class BlacklistCache:
+    """
+    Copie en mémoire des JTI révoqués et non expirés.
+
+    Chargée une fois, puis complétée par des lectures incrémentales
+    (``id > dernier id vu``) au plus toutes les ``BLACKLIST_REFRESH_INTERVAL``
+    secondes : une vérification ne dépend plus de la taille des tables. Les
+    révocations faites par ce processus sont prises en compte immédiatement.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._expires = {}
+        self._last_id = None
+        self._refreshed_at = 0.0
+
+    def _load(self, queryset):
+        for pk, jti, expires_at in queryset.values_list('id', 'token__jti', 'token__expires_at'):
+            self._expires[jti] = expires_at
+            self._last_id = max(self._last_id or 0, pk)
+
+    def refresh(self, force=False):
+        with self._lock:
+            if not force and time.monotonic() - self._refreshed_at < BLACKLIST_REFRESH_INTERVAL:
+                return
+            now = aware_utcnow()
+            if self._last_id is None:
+                self._last_id = BlacklistedToken.objects.aggregate(last=Max('id'))['last'] or 0
+                self._load(BlacklistedToken.objects.filter(token__expires_at__gt=now))
+            else:
+                self._load(BlacklistedToken.objects.filter(id__gt=self._last_id - BLACKLIST_ID_OVERLAP))
+            # Un jeton expiré est refusé de toute façon
+            self._expires = {jti: exp for jti, exp in self._expires.items() if exp > now}
+            self._refreshed_at = time.monotonic()
+
+    def add(self, jti, expires_at):
+        with self._lock:
+            self._expires[jti] = expires_at
+
+    def __contains__(self, jti):
+        self.refresh()
+        return jti in self._expires
+
+    def clear(self):
+        with self._lock:
+            self._expires = {}
+            self._last_id = None
+            self._refreshed_at = 0.0
+
+
+blacklisted_jtis = BlacklistCache()
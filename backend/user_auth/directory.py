@@ -0,0 +1,49 @@
+import csv
+import io
+
+from django.conf import settings
+from django.db.models import Q
+from rest_framework.pagination import CursorPagination
+
+from .models import CustomUser
+from .roles import manager_exists
+
+DIRECTORY_CHUNK_SIZE = 2000
+DIRECTORY_COLUMNS = ['id', 'email', 'username', 'employee_id', 'department', 'email_verified', 'is_manager']
+
+
+class UserDirectoryPagination(CursorPagination):
+    """Pagination par curseur sur l'email (unique et indexé), sans ``COUNT(*)``."""
+    ordering = 'email'
+    page_size = 50
+    page_size_query_param = 'page_size'
+    max_page_size = getattr(settings, 'API_MAX_PAGE_SIZE', 1000)
+
+
+def directory_queryset(search=None, department=None):
+    """
+    Annuaire des utilisateurs, statut manager compris, en une requête.
+
+    ``search`` cherche dans l'email, le matricule et le département.
+    """
+    queryset = CustomUser.objects.all()
+    if department:
+        queryset = queryset.filter(department=department)
+    if search:
+        queryset = queryset.filter(
+            Q(email__icontains=search) | Q(employee_id__icontains=search) | Q(department__icontains=search)
+        )
+    return queryset.annotate(is_manager=manager_exists()).values(*DIRECTORY_COLUMNS)
+
+
+def directory_csv(queryset):
+    """Lignes CSV de l'annuaire, lues par lots sans tout charger en mémoire."""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(DIRECTORY_COLUMNS)
+    yield buffer.getvalue()
+    for row in queryset.order_by('email').iterator(chunk_size=DIRECTORY_CHUNK_SIZE):
+        buffer.seek(0)
+        buffer.truncate()
+        writer.writerow([row[column] for column in DIRECTORY_COLUMNS])
+        yield buffer.getvalue()
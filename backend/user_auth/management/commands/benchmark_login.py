@@ -0,0 +1,71 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext, override_settings
+from rest_framework.test import APIRequestFactory
+from user_auth.models import CustomUser
+from user_auth.views import login_user
+
+WRITE_PREFIXES = ('INSERT', 'UPDATE', 'DELETE')
+
+
+class Command(BaseCommand):
+    help = (
+        'Mesure le débit de POST /api/auth/login/ et le nombre de requêtes SQL par '
+        'connexion. Le compte de test est créé dans une transaction annulée en fin de mesure.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--logins', type=int, default=200,
+                            help='Nombre de connexions mesurées (défaut : 200)')
+        parser.add_argument('--department', default='IT',
+                            help='Département du compte de test (défaut : IT)')
+        parser.add_argument('--real-hasher', action='store_true',
+                            help='Garde le hachage configuré (PBKDF2) au lieu de MD5 : '
+                                 'le débit mesure alors surtout le hachage')
+
+    def handle(self, *args, **options):
+        logins = options['logins']
+        if logins < 1:
+            raise CommandError('--logins doit être positif')
+
+        if options['real_hasher']:
+            self.run(logins, options['department'])
+        else:
+            # Hachage rapide : isole le coût base de données de la connexion
+            with override_settings(PASSWORD_HASHERS=['django.contrib.auth.hashers.MD5PasswordHasher']):
+                self.run(logins, options['department'])
+
+    def run(self, logins, department):
+        factory = APIRequestFactory()
+        credentials = {'email': 'benchmark-login@example.com', 'password': 'benchmark-password'}
+
+        with transaction.atomic():
+            CustomUser.objects.create_user(
+                username='benchmark-login', employee_id='BENCH00001',
+                department=department, **credentials,
+            )
+
+            def login():
+                response = login_user(factory.post('/api/auth/login/', credentials, format='json'))
+                if response.status_code != 200:
+                    raise CommandError(f'Connexion refusée : {response.data}')
+
+            with CaptureQueriesContext(connection) as queries:
+                login()
+            writes = [q for q in queries.captured_queries if q['sql'].lstrip().upper().startswith(WRITE_PREFIXES)]
+
+            started = time.perf_counter()
+            for _ in range(logins):
+                login()
+            elapsed = time.perf_counter() - started
+            transaction.set_rollback(True)
+
+        self.stdout.write(f'Requêtes SQL par connexion : {len(queries)} (dont {len(writes)} écritures)')
+        for query in queries.captured_queries:
+            self.stdout.write(f'  {query["sql"][:120]}')
+        self.stdout.write(self.style.SUCCESS(
+            f'{logins} connexions en {elapsed:.2f} s : {logins / elapsed:.0f} connexions/s '
+            f'({elapsed / logins * 1000:.2f} ms par connexion)'
+        ))
@@ -0,0 +1,31 @@
+from django.core.management.base import BaseCommand, CommandError
+from rest_framework_simplejwt.token_blacklist.models import OutstandingToken
+from rest_framework_simplejwt.utils import aware_utcnow
+
+
+class Command(BaseCommand):
+    help = (
+        'Supprime par lots les jetons expirés (et leur entrée en liste noire). '
+        'À planifier, par exemple une fois par jour.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000,
+                            help='Jetons supprimés par transaction (défaut : 1000)')
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        if batch_size < 1:
+            raise CommandError('--batch-size doit être positif')
+
+        expired = OutstandingToken.objects.filter(expires_at__lte=aware_utcnow()).order_by('id')
+        deleted = 0
+        while True:
+            # Lots courts : pas de verrou prolongé sur les tables de jetons
+            ids = list(expired.values_list('id', flat=True)[:batch_size])
+            if not ids:
+                break
+            OutstandingToken.objects.filter(id__in=ids).delete()
+            deleted += len(ids)
+
+        self.stdout.write(self.style.SUCCESS(f'{deleted} jeton(s) expiré(s) supprimé(s)'))
@@ -0,0 +1,26 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+from user_auth.models import EmailVerificationToken
+
+
+class Command(BaseCommand):
+    help = "Supprime par lots les jetons de vérification d'email expirés. À planifier (cron)."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000,
+                            help='Jetons supprimés par requête (défaut : 1000)')
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        if batch_size < 1:
+            raise CommandError('--batch-size doit être positif')
+
+        expired = EmailVerificationToken.objects.filter(expires_at__lte=timezone.now()).order_by('id')
+        deleted = 0
+        while True:
+            ids = list(expired.values_list('id', flat=True)[:batch_size])
+            if not ids:
+                break
+            deleted += EmailVerificationToken.objects.filter(id__in=ids).delete()[0]
+
+        self.stdout.write(self.style.SUCCESS(f'{deleted} jeton(s) de vérification expiré(s) supprimé(s)'))
@@ -0,0 +1,39 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from user_auth.outbox import deliver_batch
+
+
+class Command(BaseCommand):
+    help = (
+        "Envoie les emails en file d'attente, par lots sur une même connexion. "
+        'Sans --loop, vide la file puis s\'arrête (adapté à un cron).'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=50,
+                            help='Emails envoyés par connexion (défaut : 50)')
+        parser.add_argument('--loop', action='store_true',
+                            help='Tourne en continu (worker)')
+        parser.add_argument('--interval', type=float, default=5,
+                            help='Attente (s) entre deux passes quand la file est vide (défaut : 5)')
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        if batch_size < 1:
+            raise CommandError('--batch-size doit être positif')
+
+        while True:
+            total_sent = total_failed = 0
+            while True:
+                sent, failed = deliver_batch(batch_size)
+                total_sent += sent
+                total_failed += failed
+                # Lot incomplet : plus rien d'échu pour le moment
+                if sent + failed < batch_size:
+                    break
+            if total_sent or total_failed or not options['loop']:
+                self.stdout.write(f'{total_sent} email(s) envoyé(s), {total_failed} échec(s)')
+            if not options['loop']:
+                return
+            time.sleep(options['interval'])
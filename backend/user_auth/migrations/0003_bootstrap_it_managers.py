@@ -0,0 +1,28 @@
+from django.db import migrations
+
+
+def bootstrap_it_managers(apps, schema_editor):
+    """Attribue une fois pour toutes le rôle manager aux comptes IT existants."""
+    CustomUser = apps.get_model('user_auth', 'CustomUser')
+    Group = apps.get_model('auth', 'Group')
+    users = CustomUser.objects.filter(department='IT')
+    users.filter(email_verified=False).update(email_verified=True)
+    manager_group, _ = Group.objects.get_or_create(name='Manager')
+    Membership = CustomUser.groups.through
+    existing = set(Membership.objects.filter(group=manager_group).values_list('customuser_id', flat=True))
+    Membership.objects.bulk_create([
+        Membership(customuser_id=user_id, group=manager_group)
+        for user_id in users.values_list('id', flat=True) if user_id not in existing
+    ])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('user_auth', '0002_customuser_email_verification_token_and_more'),
+        ('auth', '0012_alter_user_first_name_max_length'),
+    ]
+
+    operations = [
+        migrations.RunPython(bootstrap_it_managers, migrations.RunPython.noop),
+    ]
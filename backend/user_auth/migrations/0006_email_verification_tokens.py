@@ -0,0 +1,53 @@
+# Generated by Django 5.2.18 on 2026-10-19 09:08
+
+import hashlib
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+from django.utils import timezone
+
+
+def copy_pending_tokens(apps, schema_editor):
+    """Reprend, hachés, les jetons en attente : les liens déjà envoyés restent valides."""
+    CustomUser = apps.get_model('user_auth', 'CustomUser')
+    EmailVerificationToken = apps.get_model('user_auth', 'EmailVerificationToken')
+    expires_at = timezone.now() + settings.EMAIL_VERIFICATION_TOKEN_LIFETIME
+    pending = CustomUser.objects.filter(email_verified=False).exclude(email_verification_token='')
+    EmailVerificationToken.objects.bulk_create([
+        EmailVerificationToken(
+            user_id=user_id,
+            token_hash=hashlib.sha256(token.encode()).hexdigest(),
+            expires_at=expires_at,
+        )
+        for user_id, token in pending.values_list('id', 'email_verification_token')
+    ])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('user_auth', '0005_outgoingemail'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='EmailVerificationToken',
+            fields=[
+                ('id', models.BigAutoField(primary_key=True, serialize=False)),
+                ('token_hash', models.CharField(max_length=64, unique=True, verbose_name='token hash')),
+                ('expires_at', models.DateTimeField(db_index=True, verbose_name='expires at')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='created at')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='email_verification_tokens', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name': 'email verification token',
+                'verbose_name_plural': 'email verification tokens',
+            },
+        ),
+        migrations.RunPython(copy_pending_tokens, migrations.RunPython.noop),
+        migrations.RemoveField(
+            model_name='customuser',
+            name='email_verification_token',
+        ),
+    ]
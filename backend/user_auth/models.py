@@ -1,7 +1,10 @@
 from django.contrib.auth.models import AbstractUser
+from django.conf import settings
 from django.db import models
+from django.utils import timezone
 from django.utils.translation import gettext_lazy as _
-import uuid
+import hashlib
+import secrets
 
 class CustomUser(AbstractUser):
     """Custom user model."""
@@ -27,11 +30,6 @@ class CustomUser(AbstractUser):
         _('email verified'),
         default=False,
     )
-    email_verification_token = models.CharField(
-        _('email verification token'),
-        max_length=100,
-        blank=True,
-    )
 
     USERNAME_FIELD = 'email'
     REQUIRED_FIELDS = ['username', 'employee_id', 'department']
@@ -40,6 +38,10 @@ class CustomUser(AbstractUser):
         verbose_name = _('user')
         verbose_name_plural = _('users')
         ordering = ['email']
+        indexes = [
+            # Annuaire d'un département, trié par email
+            models.Index(fields=['department', 'email'], name='user_department_email_idx'),
+        ]
 
     def __str__(self):
         return self.email
@@ -54,17 +56,98 @@ class CustomUser(AbstractUser):
         return self.first_name or self.email.split('@')[0]
 
     def generate_verification_token(self):
-        """Generate a unique token for email verification"""
-        token = str(uuid.uuid4())
-        self.email_verification_token = token
-        self.save()
+        """Issue a new email verification token (replacing any previous one)"""
+        return EmailVerificationToken.objects.issue(self)
+
+    def verify_email(self):
+        """Mark the email as verified and drop pending verification tokens"""
+        self.email_verified = True
+        self.save(update_fields=['email_verified'])
+        EmailVerificationToken.objects.filter(user=self).delete()
+
+
+class OutgoingEmail(models.Model):
+    """Email en attente d'envoi, délivré hors requête par ``send_outbox``."""
+    STATUS_PENDING = 'pending'
+    STATUS_SENDING = 'sending'
+    STATUS_SENT = 'sent'
+    STATUS_FAILED = 'failed'
+    STATUS_CHOICES = [
+        (STATUS_PENDING, _('pending')),
+        (STATUS_SENDING, _('sending')),
+        (STATUS_SENT, _('sent')),
+        (STATUS_FAILED, _('failed')),
+    ]
+
+    id = models.BigAutoField(primary_key=True)
+    subject = models.CharField(_('subject'), max_length=255)
+    body = models.TextField(_('body'))
+    from_email = models.CharField(_('from'), max_length=254, blank=True)
+    recipients = models.JSONField(_('recipients'), default=list)
+    status = models.CharField(_('status'), max_length=10, choices=STATUS_CHOICES, default=STATUS_PENDING)
+    attempts = models.PositiveSmallIntegerField(_('attempts'), default=0)
+    next_attempt_at = models.DateTimeField(_('next attempt'), default=timezone.now)
+    last_error = models.TextField(_('last error'), blank=True)
+    created_at = models.DateTimeField(_('created at'), auto_now_add=True)
+    sent_at = models.DateTimeField(_('sent at'), null=True, blank=True)
+
+    class Meta:
+        verbose_name = _('outgoing email')
+        verbose_name_plural = _('outgoing emails')
+        ordering = ['id']
+        indexes = [
+            # File d'attente : emails à envoyer dont l'échéance est passée
+            models.Index(fields=['status', 'next_attempt_at'], name='outbox_status_next_idx'),
+        ]
+
+    def __str__(self):
+        return f'{self.subject} -> {", ".join(self.recipients)}'
+
+
+def hash_token(token):
+    """Empreinte SHA-256 d'un jeton : seule l'empreinte est stockée."""
+    return hashlib.sha256(token.encode()).hexdigest()
+
+
+class EmailVerificationTokenManager(models.Manager):
+    def issue(self, user):
+        """Crée un jeton pour ``user`` et retourne sa valeur en clair (jamais stockée)."""
+        token = secrets.token_urlsafe(32)
+        self.filter(user=user).delete()
+        self.create(
+            user=user,
+            token_hash=hash_token(token),
+            expires_at=timezone.now() + settings.EMAIL_VERIFICATION_TOKEN_LIFETIME,
+        )
         return token
 
-    def verify_email(self, token):
-        """Verify user's email with the given token"""
-        if self.email_verification_token == token:
-            self.email_verified = True
-            self.email_verification_token = ''
-            self.save()
-            return True
-        return False
+    def get_user(self, token):
+        """Utilisateur du jeton ``token`` s'il est valide, sinon ``None`` (lecture par index)."""
+        entry = (
+            self.select_related('user')
+            .filter(token_hash=hash_token(token), expires_at__gt=timezone.now())
+            .first()
+        )
+        return entry.user if entry else None
+
+
+class EmailVerificationToken(models.Model):
+    """Jeton de vérification d'email, stocké haché et à durée limitée."""
+    id = models.BigAutoField(primary_key=True)
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        related_name='email_verification_tokens',
+    )
+    token_hash = models.CharField(_('token hash'), max_length=64, unique=True)
+    expires_at = models.DateTimeField(_('expires at'), db_index=True)
+    created_at = models.DateTimeField(_('created at'), auto_now_add=True)
+
+    objects = EmailVerificationTokenManager()
+
+    class Meta:
+        verbose_name = _('email verification token')
+        verbose_name_plural = _('email verification tokens')
+
+    def __str__(self):
+        return f'{self.user_id} ({self.expires_at:%Y-%m-%d %H:%M})'
@@ -0,0 +1,123 @@
+import logging
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.mail import EmailMessage, get_connection
+from django.db import transaction
+from django.utils import timezone
+
+from .models import OutgoingEmail
+
+logger = logging.getLogger(__name__)
+
+OUTBOX_MAX_ATTEMPTS = getattr(settings, 'EMAIL_OUTBOX_MAX_ATTEMPTS', 5)
+# Délai avant la n-ième nouvelle tentative : base × 2^(n-1), plafonné
+OUTBOX_RETRY_BASE = timedelta(seconds=30)
+OUTBOX_RETRY_MAX = timedelta(hours=1)
+# Bail d'un lot réservé : passé ce délai (worker arrêté), il est repris
+OUTBOX_LEASE = timedelta(minutes=10)
+
+
+def queue_email(subject, body, recipients, from_email=None):
+    """
+    Met un email en file d'attente au lieu de l'envoyer pendant la requête.
+
+    L'insertion fait partie de la transaction courante : un email n'est
+    jamais envoyé pour une opération annulée.
+    """
+    return OutgoingEmail.objects.create(
+        subject=subject,
+        body=body,
+        from_email=from_email or settings.DEFAULT_FROM_EMAIL,
+        recipients=list(recipients),
+    )
+
+
+def retry_delay(attempts):
+    return min(OUTBOX_RETRY_BASE * 2 ** (attempts - 1), OUTBOX_RETRY_MAX)
+
+
+def claim_batch(batch_size=50):
+    """
+    Réserve jusqu'à ``batch_size`` emails échus, dans une transaction courte.
+
+    Les emails réservés passent à ``sending`` avec un bail de
+    ``OUTBOX_LEASE`` (dans ``next_attempt_at``) : aucun autre worker ne les
+    prend tant que le bail court, et ceux d'un worker arrêté sont repris à
+    son expiration.
+    """
+    now = timezone.now()
+    with transaction.atomic():
+        emails = list(
+            OutgoingEmail.objects.select_for_update(skip_locked=True)
+            .filter(status__in=(OutgoingEmail.STATUS_PENDING, OutgoingEmail.STATUS_SENDING),
+                    next_attempt_at__lte=now)
+            .order_by('next_attempt_at', 'id')[:batch_size]
+        )
+        for email in emails:
+            email.status = OutgoingEmail.STATUS_SENDING
+            email.next_attempt_at = now + OUTBOX_LEASE
+        OutgoingEmail.objects.bulk_update(emails, ['status', 'next_attempt_at'])
+    return emails
+
+
+def deliver_batch(batch_size=50, connection=None):
+    """
+    Envoie jusqu'à ``batch_size`` emails échus sur une seule connexion SMTP.
+
+    Les emails sont réservés (:func:`claim_batch`), puis envoyés hors de
+    toute transaction : un serveur lent ne garde ni verrou ni transaction
+    ouverte. Les résultats sont enregistrés dans une seconde transaction
+    courte. En cas d'échec, l'email est reprogrammé avec un délai
+    croissant, puis marqué en échec après ``OUTBOX_MAX_ATTEMPTS``
+    tentatives. Retourne ``(envoyés, en échec)``.
+    """
+    sent = failed = 0
+    emails = claim_batch(batch_size)
+    if not emails:
+        return sent, failed
+
+    connection = connection or get_connection()
+    try:
+        connection.open()
+    except Exception as e:
+        # Serveur injoignable : tout le lot est reprogrammé
+        logger.warning("Connexion au serveur d'email impossible : %s", e)
+        for email in emails:
+            _failed(email, e)
+        OutgoingEmail.objects.bulk_update(emails, ['status', 'attempts', 'next_attempt_at', 'last_error'])
+        return sent, len(emails)
+
+    try:
+        for email in emails:
+            message = EmailMessage(email.subject, email.body, email.from_email,
+                                   email.recipients, connection=connection)
+            try:
+                message.send()
+            except Exception as e:
+                logger.warning("Échec de l'envoi de l'email %s : %s", email.id, e)
+                _failed(email, e)
+                failed += 1
+            else:
+                email.status = OutgoingEmail.STATUS_SENT
+                email.sent_at = timezone.now()
+                email.attempts += 1
+                email.last_error = ''
+                sent += 1
+    finally:
+        connection.close()
+
+    OutgoingEmail.objects.bulk_update(
+        emails, ['status', 'attempts', 'next_attempt_at', 'last_error', 'sent_at']
+    )
+    return sent, failed
+
+
+def _failed(email, error):
+    email.attempts += 1
+    email.last_error = str(error)
+    if email.attempts >= OUTBOX_MAX_ATTEMPTS:
+        email.status = OutgoingEmail.STATUS_FAILED
+    else:
+        email.status = OutgoingEmail.STATUS_PENDING
+        email.next_attempt_at = timezone.now() + retry_delay(email.attempts)
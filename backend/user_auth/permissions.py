@@ -1,8 +1,10 @@
 from rest_framework import permissions
+from .roles import is_manager
 
 class IsEmailVerified(permissions.BasePermission):
     """
     Permission qui vérifie si l'email de l'utilisateur est vérifié
+    (claim ``email_verified`` du jeton, sans requête)
     """
     def has_permission(self, request, view):
         return request.user.is_authenticated and request.user.email_verified
@@ -17,6 +19,7 @@ class IsSameDepartment(permissions.BasePermission):
 class IsManager(permissions.BasePermission):
     """
     Permission qui vérifie si l'utilisateur est un manager
+    (claim ``is_manager`` du jeton, sans requête)
     """
     def has_permission(self, request, view):
-        return request.user.is_authenticated and request.user.groups.filter(name='Manager').exists()
+        return request.user.is_authenticated and is_manager(request.user)
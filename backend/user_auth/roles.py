@@ -0,0 +1,42 @@
+from django.contrib.auth.models import Group
+from django.db.models import Exists, OuterRef
+
+MANAGER_GROUP = 'Manager'
+
+# Départements dont les membres sont managers et vérifiés d'office
+AUTO_MANAGER_DEPARTMENTS = ('IT',)
+
+
+def manager_exists(user_ref='pk'):
+    """Expression ``Exists`` vraie si l'utilisateur ``user_ref`` est manager."""
+    from .models import CustomUser
+    return Exists(CustomUser.groups.through.objects.filter(
+        customuser_id=OuterRef(user_ref), group__name=MANAGER_GROUP,
+    ))
+
+
+def bootstrap_roles(user):
+    """
+    Rôles attribués d'office selon le département : les membres de l'IT
+    sont managers et leur email est vérifié. Sans effet si c'est déjà le cas.
+    """
+    if user.department not in AUTO_MANAGER_DEPARTMENTS:
+        return
+    if not user.email_verified:
+        type(user).objects.filter(pk=user.pk).update(email_verified=True)
+        user.email_verified = True
+    manager_group, _ = Group.objects.get_or_create(name=MANAGER_GROUP)
+    user.groups.add(manager_group)
+
+
+def is_manager(user) -> bool:
+    """
+    Statut manager de ``user`` : claim du jeton ou annotation
+    :func:`manager_exists` si présents, sinon une requête.
+    """
+    flag = getattr(user, 'is_manager', None)
+    if flag is not None:
+        return bool(flag)
+    if not user.is_authenticated:
+        return False
+    return user.groups.filter(name=MANAGER_GROUP).exists()
@@ -1,10 +1,23 @@
-from django.db.models.signals import post_save
+from django.db.models.signals import m2m_changed, post_delete, post_save
 from django.dispatch import receiver
 from .models import CustomUser
+from .roles import bootstrap_roles
+from .stats import invalidate_department_stats
 
 @receiver(post_save, sender=CustomUser)
-def create_user_profile(sender, instance, created, **kwargs):
-    """Signal to handle user creation events."""
-    if created:
-        # Add any additional setup needed when a user is created
-        pass
+def create_user_profile(sender, instance, created, update_fields=None, **kwargs):
+    """Attribue les rôles d'office à la création ou au changement de département."""
+    if created or update_fields is None or 'department' in update_fields:
+        bootstrap_roles(instance)
+
+@receiver(post_save, sender=CustomUser)
+@receiver(post_delete, sender=CustomUser)
+def user_changed(sender, **kwargs):
+    """Invalide les statistiques des départements."""
+    invalidate_department_stats()
+
+@receiver(m2m_changed, sender=CustomUser.groups.through)
+def groups_changed(sender, action, **kwargs):
+    """Invalide les statistiques des départements quand un rôle change."""
+    if action in ('post_add', 'post_remove', 'post_clear'):
+        invalidate_department_stats()
@@ -0,0 +1,62 @@
+from typing import Any, Dict
+
+from django.core.cache import caches
+from django.db import transaction
+from django.db.models import Count, Q
+
+from .models import CustomUser
+from .roles import manager_exists
+
+DEPARTMENT_STATS_KEY = 'user_auth:department_stats'
+# Invalidé à l'écriture : cache commun aux workers
+DEPARTMENT_STATS_CACHE = 'shared'
+# Filet de sécurité : le cache est invalidé à chaque changement d'utilisateur ou de rôle
+DEPARTMENT_STATS_TIMEOUT = 300
+
+
+def compute_department_stats() -> Dict[str, Dict[str, Any]]:
+    """
+    Effectifs de tous les départements en une requête (``GROUP BY`` avec
+    agrégats conditionnels) : ``{département: {total_users, ...}}``.
+    """
+    rows = CustomUser.objects.order_by('department').values('department').annotate(
+        total_users=Count('id'),
+        verified_users=Count('id', filter=Q(email_verified=True)),
+        managers=Count('id', filter=Q(manager_exists())),
+    )
+    return {
+        row['department']: {
+            'department': row['department'],
+            'total_users': row['total_users'],
+            'verified_users': row['verified_users'],
+            'managers': row['managers'],
+            'unverified_users': row['total_users'] - row['verified_users'],
+        }
+        for row in rows
+    }
+
+
+def get_department_stats() -> Dict[str, Dict[str, Any]]:
+    """Statistiques de tous les départements, depuis le cache si possible."""
+    cache = caches[DEPARTMENT_STATS_CACHE]
+    stats = cache.get(DEPARTMENT_STATS_KEY)
+    if stats is None:
+        stats = compute_department_stats()
+        cache.set(DEPARTMENT_STATS_KEY, stats, DEPARTMENT_STATS_TIMEOUT)
+    return stats
+
+
+def department_stats_for(department: str) -> Dict[str, Any]:
+    """Statistiques d'un département (à zéro s'il n'a aucun membre)."""
+    return get_department_stats().get(department) or {
+        'department': department,
+        'total_users': 0,
+        'verified_users': 0,
+        'managers': 0,
+        'unverified_users': 0,
+    }
+
+
+def invalidate_department_stats() -> None:
+    """Vide le cache une fois la transaction courante validée."""
+    transaction.on_commit(lambda: caches[DEPARTMENT_STATS_CACHE].delete(DEPARTMENT_STATS_KEY))
@@ -1,3 +1,353 @@
-from django.test import TestCase
+from datetime import timedelta
+from unittest import mock
 
-# Create your tests here.
+from django.contrib.auth.hashers import check_password, make_password
+from django.contrib.auth.models import Group
+from django.contrib.auth.signals import user_login_failed
+from django.core import mail
+from django.core.cache import caches
+from django.db import connection as db_connection
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.token_blacklist.models import OutstandingToken
+from rest_framework_simplejwt.tokens import AccessToken, RefreshToken
+
+from .models import CustomUser, EmailVerificationToken, OutgoingEmail
+from .outbox import claim_batch, deliver_batch, queue_email
+from .roles import MANAGER_GROUP
+from .stats import DEPARTMENT_STATS_CACHE, DEPARTMENT_STATS_KEY, compute_department_stats, get_department_stats
+from .tokens import RoleRefreshToken
+
+# Caches isolés par test : les statistiques ne survivent pas d'un test à l'autre
+LOCMEM_CACHES = {
+    'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'},
+    'shared': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'shared'},
+}
+
+
+class LoginTests(TestCase):
+    PASSWORD = 'motdepasse-solide'
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = CustomUser.objects.create_user(
+            username='actif', email='actif@example.com', password=cls.PASSWORD,
+            employee_id='L-0001', department='maintenance',
+        )
+        cls.inactive = CustomUser.objects.create_user(
+            username='inactif', email='inactif@example.com', password=cls.PASSWORD,
+            employee_id='L-0002', department='maintenance', is_active=False,
+        )
+
+    def setUp(self):
+        self.client = APIClient()
+        self.failures = []
+        handler = lambda sender, credentials, **kwargs: self.failures.append(credentials)  # noqa: E731
+        user_login_failed.connect(handler)
+        self.addCleanup(user_login_failed.disconnect, handler)
+
+    def login(self, email, password):
+        return self.client.post(reverse('login'), {'email': email, 'password': password}, format='json')
+
+    def test_login_reads_once_and_records_outstanding_token(self):
+        # Lecture de l'utilisateur, puis inscription du jeton de rafraîchissement
+        with self.assertNumQueries(2):
+            response = self.login('actif@example.com', self.PASSWORD)
+        self.assertEqual(response.status_code, 200)
+        self.assertFalse(response.json()['user']['is_manager'])
+        self.assertEqual(self.failures, [])
+        refresh = RefreshToken(response.json()['tokens']['refresh'])
+        self.assertTrue(OutstandingToken.objects.filter(user=self.user, jti=refresh['jti']).exists())
+
+    def test_failures_hash_password_and_send_signal(self):
+        cases = (
+            ('actif@example.com', 'mauvais'),
+            ('inactif@example.com', self.PASSWORD),
+            ('inconnu@example.com', self.PASSWORD),
+        )
+        for email, password in cases:
+            with self.subTest(email=email):
+                # Le hacheur tourne sur tous les chemins : pas d'écart de durée
+                with mock.patch('django.contrib.auth.base_user.make_password',
+                                wraps=make_password) as make, \
+                        mock.patch('django.contrib.auth.base_user.check_password',
+                                   wraps=check_password) as check:
+                    response = self.login(email, password)
+                self.assertEqual(response.status_code, 401)
+                self.assertEqual(make.call_count + check.call_count, 1)
+        self.assertEqual([failure['email'] for failure in self.failures], [email for email, _ in cases])
+
+
+class TokenBlacklistTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        CustomUser.objects.create_user(
+            username='jeton', email='jeton@example.com', password='motdepasse-solide',
+            employee_id='L-0101', department='maintenance',
+        )
+
+    def test_refresh_token_rejected_after_logout(self):
+        client = APIClient()
+        tokens = client.post(reverse('login'), {'email': 'jeton@example.com', 'password': 'motdepasse-solide'},
+                             format='json').json()['tokens']
+        response = client.post(reverse('token_refresh'), {'refresh': tokens['refresh']}, format='json')
+        self.assertEqual(response.status_code, 200)
+        refresh = response.json().get('refresh', tokens['refresh'])
+
+        client.credentials(HTTP_AUTHORIZATION=f"Bearer {tokens['access']}")
+        self.assertEqual(client.post(reverse('logout'), {'refresh': refresh}, format='json').status_code, 200)
+        response = client.post(reverse('token_refresh'), {'refresh': refresh}, format='json')
+        self.assertEqual(response.status_code, 401)
+
+
+class OutboxTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        CustomUser.objects.create_user(
+            username='oubli', email='oubli@example.com', password='motdepasse-solide',
+            employee_id='L-0201', department='maintenance',
+        )
+
+    def request_reset(self):
+        response = APIClient().post(reverse('password_reset_request'), {'email': 'oubli@example.com'},
+                                    format='json')
+        self.assertEqual(response.status_code, 200)
+
+    def test_reset_email_is_queued_then_delivered(self):
+        self.request_reset()
+        self.assertEqual(mail.outbox, [])
+        self.assertEqual(deliver_batch(), (1, 0))
+        self.assertEqual(mail.outbox[0].to, ['oubli@example.com'])
+        self.assertEqual(OutgoingEmail.objects.get().status, OutgoingEmail.STATUS_SENT)
+        # Rien de plus à envoyer
+        self.assertEqual(deliver_batch(), (0, 0))
+
+    def test_failed_delivery_is_rescheduled(self):
+        self.request_reset()
+        connection = mock.Mock()
+        connection.open.side_effect = OSError('serveur injoignable')
+        with self.assertLogs('user_auth.outbox', 'WARNING'):
+            self.assertEqual(deliver_batch(connection=connection), (0, 1))
+        email = OutgoingEmail.objects.get()
+        self.assertEqual((email.status, email.attempts), (OutgoingEmail.STATUS_PENDING, 1))
+        self.assertGreater(email.next_attempt_at, timezone.now())
+        # Pas encore échu : pas de nouvelle tentative
+        self.assertEqual(deliver_batch(), (0, 0))
+
+
+    def test_expired_lease_is_claimed_again(self):
+        self.request_reset()
+        self.assertEqual(len(claim_batch()), 1)
+        # Bail en cours : l'email n'est pas repris par un autre worker
+        self.assertEqual(claim_batch(), [])
+
+        OutgoingEmail.objects.update(next_attempt_at=timezone.now() - timedelta(seconds=1))
+        self.assertEqual(deliver_batch(), (1, 0))
+        self.assertEqual(OutgoingEmail.objects.get().status, OutgoingEmail.STATUS_SENT)
+
+
+class OutboxDeliveryTransactionTests(TransactionTestCase):
+    def test_send_outside_transaction(self):
+        queue_email('Sujet', 'Corps', ['lent@example.com'])
+        states = []
+
+        def send_messages(messages):
+            # Le lot est déjà réservé et validé : ni verrou ni transaction ouverte
+            states.append((db_connection.in_atomic_block, OutgoingEmail.objects.get().status))
+            return len(messages)
+
+        connection = mock.Mock()
+        connection.send_messages.side_effect = send_messages
+        self.assertEqual(deliver_batch(connection=connection), (1, 0))
+        self.assertEqual(states, [(False, OutgoingEmail.STATUS_SENDING)])
+        self.assertEqual(OutgoingEmail.objects.get().status, OutgoingEmail.STATUS_SENT)
+
+
+class EmailVerificationTokenTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = CustomUser.objects.create_user(
+            username='nouveau', email='nouveau@example.com', password='motdepasse-solide',
+            employee_id='L-0301', department='maintenance',
+        )
+
+    def test_token_stored_hashed_and_verifies_email(self):
+        token = EmailVerificationToken.objects.issue(self.user)
+        self.assertFalse(EmailVerificationToken.objects.filter(token_hash=token).exists())
+
+        response = APIClient().get(reverse('verify_email', args=[token]))
+        self.assertEqual(response.status_code, 200)
+        self.user.refresh_from_db()
+        self.assertTrue(self.user.email_verified)
+
+    def test_expired_or_replaced_tokens_are_rejected(self):
+        expired = EmailVerificationToken.objects.issue(self.user)
+        EmailVerificationToken.objects.update(expires_at=timezone.now() - timedelta(seconds=1))
+        self.assertIsNone(EmailVerificationToken.objects.get_user(expired))
+
+        replaced = EmailVerificationToken.objects.issue(self.user)
+        current = EmailVerificationToken.objects.issue(self.user)
+        self.assertIsNone(EmailVerificationToken.objects.get_user(replaced))
+        self.assertEqual(EmailVerificationToken.objects.get_user(current), self.user)
+
+
+class DirectoryTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.manager = CustomUser.objects.create_user(
+            username='chef', email='chef@example.com', password='motdepasse-solide',
+            employee_id='L-0401', department='maintenance', email_verified=True,
+        )
+        cls.manager.groups.add(Group.objects.get_or_create(name=MANAGER_GROUP)[0])
+        CustomUser.objects.create_user(
+            username='agent', email='agent@example.com', password='motdepasse-solide',
+            employee_id='L-0402', department='production',
+        )
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.manager)
+
+    def test_page_keeps_role_and_verified_labels(self):
+        response = self.client.get(reverse('list_all_users'), {'page_size': 1})
+        self.assertEqual(response.status_code, 200)
+        body = response.json()
+        self.assertIsNotNone(body['next'])
+        row = body['results'][0]
+        self.assertEqual((row['email'], row['role'], row['verified']), ('agent@example.com', 'Employee', 'Non'))
+
+    def test_legacy_output(self):
+        response = self.client.get(reverse('list_all_users'), {'output': 'legacy'})
+        self.assertEqual(response.json(), {'total_users': 2, 'users': [
+            {'email': 'chef@example.com', 'department': 'maintenance', 'role': 'Manager', 'verified': 'Oui'},
+            {'email': 'agent@example.com', 'department': 'production', 'role': 'Employee', 'verified': 'Non'},
+        ]})
+        response = self.client.get(reverse('department_users'), {'output': 'legacy'})
+        self.assertEqual([row['email'] for row in response.json()], ['chef@example.com'])
+
+    def test_csv_export(self):
+        response = self.client.get(reverse('list_all_users'), {'output': 'csv', 'search': 'agent'})
+        lines = b''.join(response.streaming_content).decode().splitlines()
+        self.assertEqual(len(lines), 2)
+        self.assertIn('agent@example.com', lines[1])
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class RoleClaimPermissionTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.manager = CustomUser.objects.create_user(
+            username='responsable', email='responsable@example.com', password='motdepasse-solide',
+            employee_id='L-0501', department='maintenance', email_verified=True,
+        )
+        cls.manager.groups.add(Group.objects.get_or_create(name=MANAGER_GROUP)[0])
+        cls.employee = CustomUser.objects.create_user(
+            username='employe', email='employe@example.com', password='motdepasse-solide',
+            employee_id='L-0502', department='maintenance', email_verified=True,
+        )
+
+    def setUp(self):
+        for alias in LOCMEM_CACHES:
+            caches[alias].clear()
+
+    def client_for(self, user):
+        client = APIClient()
+        client.credentials(HTTP_AUTHORIZATION=f'Bearer {RoleRefreshToken.for_user(user).access_token}')
+        return client
+
+    def test_claims_carried_by_access_token(self):
+        access = AccessToken(str(RoleRefreshToken.for_user(self.manager).access_token))
+        self.assertEqual(
+            (access['email'], access['department'], access['email_verified'], access['is_manager']),
+            ('responsable@example.com', 'maintenance', True, True),
+        )
+
+    def test_permissions_checked_without_queries(self):
+        manager = self.client_for(self.manager)
+        self.assertEqual(manager.get(reverse('department_stats')).status_code, 200)
+        # Statistiques en cache : authentification et permissions sans requête
+        with self.assertNumQueries(0):
+            self.assertEqual(manager.get(reverse('department_stats')).status_code, 200)
+        employee = self.client_for(self.employee)
+        with self.assertNumQueries(0):
+            response = employee.get(reverse('department_stats'))
+        self.assertEqual(response.status_code, 403)
+
+    def test_unverified_manager_is_refused(self):
+        CustomUser.objects.filter(pk=self.manager.pk).update(email_verified=False)
+        self.manager.refresh_from_db()
+        client = self.client_for(self.manager)
+        self.assertEqual(client.get(reverse('department_stats')).status_code, 403)
+        # IsManager seul : la vérification de l'email n'est pas exigée
+        self.assertEqual(client.get(reverse('all_department_stats')).status_code, 200)
+
+    def test_refresh_reads_claims_from_database(self):
+        refresh = RoleRefreshToken.for_user(self.employee)
+        self.employee.groups.add(Group.objects.get(name=MANAGER_GROUP))
+        client = APIClient()
+        client.credentials(HTTP_AUTHORIZATION=f'Bearer {refresh.access_token}')
+        # Le jeton d'accès déjà émis garde ses claims jusqu'à expiration
+        self.assertEqual(client.get(reverse('department_stats')).status_code, 403)
+
+        response = APIClient().post(reverse('token_refresh'), {'refresh': str(refresh)}, format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(AccessToken(response.json()['access'])['is_manager'])
+        client.credentials(HTTP_AUTHORIZATION=f"Bearer {response.json()['access']}")
+        self.assertEqual(client.get(reverse('department_stats')).status_code, 200)
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class DepartmentStatsTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.manager = CustomUser.objects.create_user(
+            username='cheffe', email='cheffe@example.com', password='motdepasse-solide',
+            employee_id='L-0601', department='maintenance', email_verified=True,
+        )
+        cls.manager.groups.add(Group.objects.get_or_create(name=MANAGER_GROUP)[0])
+        cls.employee = CustomUser.objects.create_user(
+            username='ouvrier', email='ouvrier@example.com', password='motdepasse-solide',
+            employee_id='L-0602', department='maintenance',
+        )
+        CustomUser.objects.create_user(
+            username='monteur', email='monteur@example.com', password='motdepasse-solide',
+            employee_id='L-0603', department='production',
+        )
+
+    def setUp(self):
+        for alias in LOCMEM_CACHES:
+            caches[alias].clear()
+
+    def test_all_departments_in_one_query(self):
+        with self.assertNumQueries(1):
+            stats = compute_department_stats()
+        self.assertEqual(stats['maintenance'], {
+            'department': 'maintenance', 'total_users': 2, 'verified_users': 1,
+            'managers': 1, 'unverified_users': 1,
+        })
+        self.assertEqual(stats['production']['total_users'], 1)
+
+    def test_cached_in_shared_cache(self):
+        stats = get_department_stats()
+        self.assertEqual(caches[DEPARTMENT_STATS_CACHE].get(DEPARTMENT_STATS_KEY), stats)
+        with self.assertNumQueries(0):
+            self.assertEqual(get_department_stats(), stats)
+
+    def test_invalidated_after_user_and_role_changes(self):
+        get_department_stats()
+        with self.captureOnCommitCallbacks(execute=True):
+            CustomUser.objects.create_user(
+                username='apprenti', email='apprenti@example.com', password='motdepasse-solide',
+                employee_id='L-0604', department='maintenance',
+            )
+        self.assertIsNone(caches[DEPARTMENT_STATS_CACHE].get(DEPARTMENT_STATS_KEY))
+        self.assertEqual(get_department_stats()['maintenance']['total_users'], 3)
+
+        client = APIClient()
+        client.force_authenticate(self.manager)
+        with self.captureOnCommitCallbacks(execute=True):
+            response = client.post(reverse('assign_manager', args=[self.employee.pk]))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(client.get(reverse('department_stats')).json()['managers'], 2)
@@ -0,0 +1,81 @@
+from django.utils.functional import cached_property
+from rest_framework_simplejwt.models import TokenUser
+from django.utils.translation import gettext_lazy as _
+from rest_framework_simplejwt.exceptions import TokenError
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.tokens import RefreshToken
+from rest_framework_simplejwt.utils import datetime_from_epoch
+
+from .blacklist import blacklisted_jtis
+from .roles import is_manager
+
+# Claims de rôle portés par les jetons, recopiés du refresh vers l'access
+ROLE_CLAIMS = ('email', 'department', 'email_verified', 'is_manager', 'is_staff')
+
+
+def set_role_claims(token, user):
+    """Inscrit (ou met à jour) dans ``token`` les claims de rôle de ``user``."""
+    token['email'] = user.email
+    token['department'] = user.department
+    token['email_verified'] = user.email_verified
+    token['is_manager'] = is_manager(user)
+    token['is_staff'] = user.is_staff
+    return token
+
+
+class RoleRefreshToken(RefreshToken):
+    """
+    Jeton de rafraîchissement portant les claims de rôle de l'utilisateur.
+
+    Comme tout ``RefreshToken``, le jeton est inscrit dans
+    ``OutstandingToken`` à sa création (révocation par utilisateur depuis
+    l'admin). La liste noire est vérifiée dans
+    :data:`~user_auth.blacklist.blacklisted_jtis` plutôt que par une requête.
+    """
+
+    @classmethod
+    def for_user(cls, user):
+        return set_role_claims(super().for_user(user), user)
+
+    def check_blacklist(self):
+        if self.payload[api_settings.JTI_CLAIM] in blacklisted_jtis:
+            raise TokenError(_('Token is blacklisted'))
+
+    def blacklist(self):
+        result = super().blacklist()
+        blacklisted_jtis.add(self.payload[api_settings.JTI_CLAIM], datetime_from_epoch(self.payload['exp']))
+        return result
+
+
+class RoleTokenUser(TokenUser):
+    """
+    Utilisateur reconstitué à partir des claims du jeton d'accès.
+
+    Aucune requête n'est faite pour authentifier une requête ni pour
+    vérifier les permissions ; les vues qui modifient le compte chargent
+    l'utilisateur avec :func:`load_user`.
+    """
+
+    @cached_property
+    def email(self) -> str:
+        return self.token.get('email', '')
+
+    @cached_property
+    def department(self) -> str:
+        return self.token.get('department', '')
+
+    @cached_property
+    def email_verified(self) -> bool:
+        return bool(self.token.get('email_verified', False))
+
+    @cached_property
+    def is_manager(self) -> bool:
+        return bool(self.token.get('is_manager', False))
+
+
+def load_user(user):
+    """Instance ``CustomUser`` de ``user``, chargée si c'est un utilisateur de jeton."""
+    if isinstance(user, TokenUser):
+        from .models import CustomUser
+        return CustomUser.objects.get(**{api_settings.USER_ID_FIELD: user.pk})
+    return user
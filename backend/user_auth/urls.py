@@ -40,6 +40,7 @@ urlpatterns = [
     path('department/assign-manager/<int:user_id>/', views.assign_manager_role, name='assign_manager'),
     path('department/remove-manager/<int:user_id>/', views.remove_manager_role, name='remove_manager'),
     path('department/stats/', views.department_stats, name='department_stats'),
+    path('departments/stats/', views.all_department_stats, name='all_department_stats'),
     
     # Admin
     path('users/', views.list_all_users, name='list_all_users'),
@@ -1,16 +1,20 @@
-from django.core.mail import send_mail
+from django.http import StreamingHttpResponse
 from rest_framework import status
 from rest_framework.decorators import api_view, permission_classes
 from rest_framework.permissions import AllowAny, IsAuthenticated
 from rest_framework.response import Response
-from rest_framework_simplejwt.tokens import RefreshToken
-from django.contrib.auth import authenticate
 from django.utils.http import urlsafe_base64_encode, urlsafe_base64_decode
 from django.utils.encoding import force_bytes, force_str
+from django.contrib.auth import authenticate
 from django.contrib.auth.tokens import default_token_generator
 from .serializers import CustomUserSerializer, UserProfileSerializer, UpdateProfileSerializer, ChangePasswordSerializer
-from .models import CustomUser
+from .models import CustomUser, EmailVerificationToken
 from .permissions import IsEmailVerified, IsSameDepartment, IsManager
+from .directory import DIRECTORY_COLUMNS, UserDirectoryPagination, directory_csv, directory_queryset
+from .outbox import queue_email
+from .roles import is_manager
+from .stats import department_stats_for, get_department_stats
+from .tokens import RoleRefreshToken, load_user
 from django.contrib.auth.models import Group
 
 # Create your views here.
@@ -21,15 +25,9 @@ def register_user(request):
     """Register a new user"""
     serializer = CustomUserSerializer(data=request.data)
     if serializer.is_valid():
+        # Les rôles d'office (managers IT) sont attribués par le signal post_save
         user = serializer.save()
         
-        # Si l'utilisateur est du département IT, le rendre manager automatiquement
-        if user.department == 'IT':
-            manager_group, _ = Group.objects.get_or_create(name='Manager')
-            user.groups.add(manager_group)
-            user.email_verified = True  # Auto-vérifier l'email pour les IT
-            user.save()
-        
         # Générer le token de vérification
         token = user.generate_verification_token()
         verification_url = f"http://localhost:3000/verify-email/{token}"
@@ -46,51 +44,38 @@ def register_user(request):
 @permission_classes([AllowAny])
 def verify_email(request, token):
     """Verify user's email with the given token"""
-    try:
-        user = CustomUser.objects.get(email_verification_token=token)
-        if user.verify_email(token):
-            return Response({'message': 'Email verified successfully'})
-        return Response({'error': 'Invalid verification token'}, status=400)
-    except CustomUser.DoesNotExist:
+    user = EmailVerificationToken.objects.get_user(token)
+    if user is None:
         return Response({'error': 'Invalid verification token'}, status=400)
+    user.verify_email()
+    return Response({'message': 'Email verified successfully'})
 
 @api_view(['POST'])
 @permission_classes([AllowAny])
 def login_user(request):
-    """Authenticate a user and return tokens"""
+    """
+    Authenticate a user and return tokens.
+
+    Passe par ``authenticate()`` (``AUTHENTICATION_BACKENDS``, signal
+    ``user_login_failed``). Avec ``RoleModelBackend``, une seule lecture
+    (utilisateur et rôle manager) ; la seule écriture est l'inscription du
+    jeton dans ``OutstandingToken``. Les rôles d'office sont attribués à la
+    création du compte.
+    """
     email = request.data.get('email')
     password = request.data.get('password')
-    
-    try:
-        user = CustomUser.objects.get(email=email)
-    except CustomUser.DoesNotExist:
-        return Response({
-            'error': 'Invalid credentials'
-        }, status=status.HTTP_401_UNAUTHORIZED)
-    except Exception:
-        return Response({
-            'error': 'Server error'
-        }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
-    
-    user = authenticate(username=email, password=password)
-    
+
+    user = authenticate(request, email=email, password=password) if email and password else None
     if user is not None:
-        if user.department == 'IT':
-            user.email_verified = True
-            user.save()
-            
-            manager_group, _ = Group.objects.get_or_create(name='Manager')
-            user.groups.add(manager_group)
-        
-        refresh = RefreshToken.for_user(user)
-        
+        refresh = RoleRefreshToken.for_user(user)
+
         return Response({
             'message': 'Login successful',
             'user': {
                 'email': user.email,
                 'department': user.department,
                 'email_verified': user.email_verified,
-                'is_manager': user.groups.filter(name='Manager').exists()
+                'is_manager': is_manager(user)
             },
             'tokens': {
                 'refresh': str(refresh),
@@ -107,7 +92,7 @@ def login_user(request):
 def logout_user(request):
     try:
         refresh_token = request.data["refresh"]
-        token = RefreshToken(refresh_token)
+        token = RoleRefreshToken(refresh_token)
         token.blacklist()
         return Response({'message': 'Successfully logged out'},
                       status=status.HTTP_200_OK)
@@ -128,13 +113,11 @@ def request_password_reset(request):
         # Construire le lien de réinitialisation
         reset_url = f"http://localhost:3000/reset-password/{uid}/{token}"
         
-        # Envoyer l'email
-        send_mail(
+        # Envoyé hors requête par la commande send_outbox
+        queue_email(
             'Réinitialisation de votre mot de passe',
             f'Cliquez sur ce lien pour réinitialiser votre mot de passe : {reset_url}',
-            'noreply@example.com',
             [email],
-            fail_silently=False,
         )
         
         return Response({'message': 'Password reset email has been sent.'}, 
@@ -190,7 +173,7 @@ def get_profile(request):
     """
     Get the profile of the currently authenticated user
     """
-    serializer = UserProfileSerializer(request.user)
+    serializer = UserProfileSerializer(load_user(request.user))
     return Response(serializer.data)
 
 @api_view(['PUT'])
@@ -199,7 +182,7 @@ def update_profile(request):
     """
     Update the profile of the currently authenticated user
     """
-    serializer = UpdateProfileSerializer(request.user, data=request.data, partial=True)
+    serializer = UpdateProfileSerializer(load_user(request.user), data=request.data, partial=True)
     if serializer.is_valid():
         serializer.save()
         return Response({'message': 'Profile updated successfully'})
@@ -213,7 +196,7 @@ def change_password(request):
     """
     serializer = ChangePasswordSerializer(data=request.data)
     if serializer.is_valid():
-        user = request.user
+        user = load_user(request.user)
         if user.check_password(serializer.data.get('old_password')):
             user.set_password(serializer.data.get('new_password'))
             user.save()
@@ -249,11 +232,14 @@ def resend_verification(request):
 @permission_classes([IsAuthenticated, IsEmailVerified, IsManager])
 def list_department_users(request):
     """
-    Liste tous les utilisateurs du même département que l'utilisateur connecté
+    Liste paginée des utilisateurs du même département que l'utilisateur connecté
+
+    ``?search=`` filtre sur l'email ou le matricule, ``?output=csv`` exporte
+    toute la liste et ``?output=legacy`` renvoie l'ancienne liste non paginée.
     """
-    users = CustomUser.objects.filter(department=request.user.department)
-    serializer = UserProfileSerializer(users, many=True)
-    return Response(serializer.data)
+    users = directory_queryset(request.query_params.get('search'), request.user.department)
+    return _directory_response(request, users, f'utilisateurs-{request.user.department}.csv',
+                               _legacy_department_list)
 
 @api_view(['POST'])
 @permission_classes([IsAuthenticated, IsEmailVerified, IsManager])
@@ -281,21 +267,15 @@ def department_stats(request):
     """
     Obtenir les statistiques du département
     """
-    department = request.user.department
-    total_users = CustomUser.objects.filter(department=department).count()
-    verified_users = CustomUser.objects.filter(department=department, email_verified=True).count()
-    managers = CustomUser.objects.filter(
-        department=department,
-        groups__name='Manager'
-    ).count()
+    return Response(department_stats_for(request.user.department))
 
-    return Response({
-        'department': department,
-        'total_users': total_users,
-        'verified_users': verified_users,
-        'managers': managers,
-        'unverified_users': total_users - verified_users
-    })
+@api_view(['GET'])
+@permission_classes([IsAuthenticated, IsManager])
+def all_department_stats(request):
+    """
+    Statistiques de tous les départements (accessible uniquement aux managers)
+    """
+    return Response({'departments': list(get_department_stats().values())})
 
 @api_view(['POST'])
 @permission_classes([IsAuthenticated, IsEmailVerified, IsManager])
@@ -325,10 +305,9 @@ def verify_token(request):
     """
     Vérifie si le token JWT est valide et renvoie les informations de l'utilisateur
     """
-    user = request.user
     return Response({
-        'user': UserProfileSerializer(user).data,
-        'is_manager': user.groups.filter(name='Manager').exists(),
+        'user': UserProfileSerializer(load_user(request.user)).data,
+        'is_manager': is_manager(request.user),
         'token_valid': True
     })
 
@@ -336,21 +315,53 @@ def verify_token(request):
 @permission_classes([IsAuthenticated, IsManager])
 def list_all_users(request):
     """
-    Liste tous les utilisateurs (accessible uniquement aux managers)
+    Annuaire paginé de tous les utilisateurs (accessible uniquement aux managers)
+
+    ``?search=`` filtre sur l'email, le matricule ou le département,
+    ``?department=`` restreint à un département et ``?output=csv`` exporte
+    tout l'annuaire filtré. ``?output=legacy`` renvoie l'ancienne réponse
+    non paginée ``{total_users, users}``.
+    """
+    users = directory_queryset(request.query_params.get('search'), request.query_params.get('department'))
+    return _directory_response(request, users, 'utilisateurs.csv', _legacy_user_list)
+
+def _role_labels(row):
+    """Libellés de l'ancienne réponse de l'annuaire"""
+    return {
+        'role': 'Manager' if row['is_manager'] else 'Employee',
+        'verified': 'Oui' if row['email_verified'] else 'Non',
+    }
+
+def _legacy_user_list(users):
+    """Ancienne réponse de ``list_all_users`` : tout l'annuaire, sans pagination"""
+    user_list = [
+        {'email': row['email'], 'department': row['department'], **_role_labels(row)}
+        for row in users.order_by('department', 'email')
+    ]
+    return {'total_users': len(user_list), 'users': user_list}
+
+def _legacy_department_list(users):
+    """Ancienne réponse de ``list_department_users`` : profils, sans pagination"""
+    return [
+        {column: row[column] for column in DIRECTORY_COLUMNS if column != 'is_manager'}
+        for row in users.order_by('email')
+    ]
+
+def _directory_response(request, users, filename, legacy):
     """
-    users = CustomUser.objects.all().order_by('department', 'email')
-    user_list = []
-    
-    for user in users:
-        user_data = {
-            'email': user.email,
-            'department': user.department,
-            'role': 'Manager' if user.groups.filter(name='Manager').exists() else 'Employee',
-            'verified': 'Oui' if user.email_verified else 'Non'
-        }
-        user_list.append(user_data)
-    
-    return Response({
-        'total_users': len(user_list),
-        'users': user_list
-    })
+    Page de l'annuaire (curseur sur l'email), export CSV en flux ou, avec
+    ``?output=legacy``, réponse non paginée d'avant la pagination (``legacy``)
+    """
+    output = request.query_params.get('output', 'json')
+    if output == 'csv':
+        response = StreamingHttpResponse(directory_csv(users), content_type='text/csv; charset=utf-8')
+        response['Content-Disposition'] = f'attachment; filename="{filename}"'
+        return response
+    if output == 'legacy':
+        return Response(legacy(users))
+    if output != 'json':
+        return Response({'error': 'output doit valoir json, csv ou legacy'}, status=status.HTTP_400_BAD_REQUEST)
+
+    paginator = UserDirectoryPagination()
+    page = paginator.paginate_queryset(users, request)
+    return paginator.get_paginated_response([dict(row, **_role_labels(row)) for row in page])